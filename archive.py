@@ -0,0 +1,150 @@
+"""
+RFC 5005 のアーカイブ付きフィード（Paged/Archived Feeds）。
+
+FEED_ARCHIVE=1 のとき、各 generator は次の形で出力する:
+  - 購読用 feed（head） : 最新 FEED_ARCHIVE_HEAD 件だけ
+  - アーカイブページ    : <stem>.archive-0001.xml, -0002, ...（1ページ最大 FEED_ARCHIVE_PAGE 件）
+head から押し出された項目は、その実行のうちにアーカイブページとして確定させる
+（1ページ分たまるのを待たないので、ページの件数は実行ごとに押し出された件数になる）。
+アーカイブページは一度書いたら二度と書き換えない（immutable）。
+head には最新アーカイブへの prev-archive、各アーカイブには一つ前への prev-archive と
+head への current を付ける。next-archive は付けない（付けると過去ページの再生成が必要になる。
+RFC 5005 でも任意）。
+
+状態は <feed>.archive.json（アーカイブ済みGUID・ページ数）。状態ファイルが無い・壊れている・
+ディスクのページより古いときは、ディスク上のアーカイブページを読み直して作り直す。
+"""
+from __future__ import annotations
+
+import json
+import os
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple
+
+import feedwriter
+import prevfeed
+from feeditem import FeedItem
+
+DEFAULT_HEAD = 30
+DEFAULT_PAGE = 50
+
+Links = List[Tuple[str, Path]]  # (rel, 対象ファイル)
+WritePage = Callable[[Path, List[FeedItem], Links], None]
+
+
+def enabled() -> bool:
+    return os.getenv("FEED_ARCHIVE", "").strip().lower() in ("1", "true", "yes", "on")
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return max(1, int(os.getenv(name, default)))
+    except ValueError:
+        return default
+
+
+def head_size() -> int:
+    return _env_int("FEED_ARCHIVE_HEAD", DEFAULT_HEAD)
+
+
+def page_size() -> int:
+    return _env_int("FEED_ARCHIVE_PAGE", DEFAULT_PAGE)
+
+
+def state_path(out: Path) -> Path:
+    return out.with_name(out.name + ".archive.json")
+
+
+def page_path(out: Path, n: int) -> Path:
+    return out.with_name(f"{out.stem}.archive-{n:04d}{out.suffix}")
+
+
+def href(path: Path) -> str:
+    """FEED_BASE_URL があれば絶対URL、無ければファイル名（相対参照）。"""
+    base = os.getenv("FEED_BASE_URL", "").strip()
+    return f"{base.rstrip('/')}/{path.name}" if base else path.name
+
+
+def rebuild_state(out: Path) -> Dict[str, Any]:
+    """ディスク上のアーカイブページ（-0001 から連番）を読んで状態を作り直す。"""
+    pages = 0
+    archived: List[str] = []
+    while page_path(out, pages + 1).exists():
+        pages += 1
+        archived.extend(prevfeed.guids(page_path(out, pages)))
+    return {"pages": pages, "archived": archived}
+
+
+def load_state(out: Path) -> Dict[str, Any]:
+    p = state_path(out)
+    try:
+        state = json.loads(p.read_text(encoding="utf-8"))
+        pages = int(state["pages"])
+        state.setdefault("archived", [])
+    except Exception:
+        return rebuild_state(out)
+    if page_path(out, pages + 1).exists():
+        # 状態の保存前に落ちた・古い状態が復元されたなど。ページの方が正しい
+        return rebuild_state(out)
+    return state
+
+
+def save_state(out: Path, state: Dict[str, Any]) -> None:
+    feedwriter.atomic_write(
+        state_path(out), (json.dumps(state, ensure_ascii=False, indent=1) + "\n").encode("utf-8")
+    )
+
+
+def _published_key(item: FeedItem) -> datetime:
+    dt = item.published
+    if dt is None:
+        return datetime.min.replace(tzinfo=timezone.utc)
+    return dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)
+
+
+def paginate(
+    out_path: Any, items: List[FeedItem], write_page: WritePage
+) -> Tuple[List[FeedItem], Links]:
+    """
+    items（新しい順）のうち最新 head_size() 件を head にし、head から押し出された
+    まだアーカイブしていない項目を新しいページとして write_page で書き出す
+    （page_size() 件を超える分は複数ページに分ける）。戻り値は head のエントリとリンク。
+    """
+    out = Path(out_path)
+    n_head = head_size()
+    n_page = page_size()
+    state = load_state(out)
+
+    archived = set(state["archived"])
+    head = items[:n_head]
+    head_guids = {it.guid for it in head}
+
+    # 旧形式の状態にあった保留分も、head に戻っていなければ今回ここで確定させる
+    fallen = [FeedItem.from_dict(d) for d in state.get("pending", []) if d["guid"] not in head_guids]
+    seen = {it.guid for it in fallen}
+    for it in items[n_head:]:
+        g = it.guid
+        if g in archived or g in head_guids or g in seen:
+            continue
+        fallen.append(it)
+        seen.add(g)
+    fallen.sort(key=_published_key, reverse=True)
+
+    pages = int(state["pages"])
+    while fallen:
+        # 古い方から最大1ページ分ずつ確定させる
+        chunk, fallen = fallen[-n_page:], fallen[:-n_page]
+        pages += 1
+        links: Links = [("current", out)]
+        if pages > 1:
+            links.append(("prev-archive", page_path(out, pages - 1)))
+        write_page(page_path(out, pages), chunk, links)
+        archived.update(it.guid for it in chunk)
+
+    save_state(out, {"pages": pages, "archived": sorted(archived)})
+
+    head_links: Links = []
+    if pages:
+        head_links.append(("prev-archive", page_path(out, pages)))
+    return head, head_links
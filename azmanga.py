@@ -1,11 +1,19 @@
+import os
 import re
-from datetime import datetime, timezone, timedelta
-from pathlib import Path
-from urllib.parse import urljoin
-
-import requests
-from bs4 import BeautifulSoup
-from feedgen.feed import FeedGenerator
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from html import escape as html_escape
+
+import feedrender
+import fetch
+import metrics
+import parallel
+import profiling
+import swr
+import timestamps
+import urlrewrite
+from feeditem import FeedItem, FeedMeta
 
 # ========== 設定 ==========
 LIST_URLS = [
@@ -20,40 +28,103 @@ FEED_TITLE = "A-z manga (merged)"
 FEED_LINK = "https://www.a-zmanga.net/"
 OUT_XML = "feed_azmanga.xml"
 
+META = FeedMeta(
+    title=FEED_TITLE,
+    link=FEED_LINK,
+    description="A-z manga の更新情報（複数ページを統合）",
+)
+
 UA = "Mozilla/5.0 (compatible; feedbot/1.0)"
 TIMEOUT = 25
-JST = timezone(timedelta(hours=9))
+JST = timestamps.JST
 
 # 先読み最大件数（安全装置）
 MAX_PREFETCH = 80
 
+# description の容量制限（feed を軽くする）。環境変数は load_options() で実行のたびに読む
+#   AZ_DESC_MAX_LINKS : 先頭画像 + 先頭N個のリンクだけ残した要約にする
+#   AZ_DESC_MAX_BYTES : 要約がこれを超える場合はリンク数をさらに減らす
+#   AZ_FULL_CONTENT   : 1 なら本文全体も content:encoded に入れる
+DESC_MAX_LINKS = 5
+DESC_MAX_BYTES = 4000
 
-def get_html(url: str) -> str:
-    r = requests.get(url, headers={"User-Agent": UA}, timeout=TIMEOUT)
-    r.raise_for_status()
-    return r.text
+_IMG_RE = re.compile(r"<img\b[^>]*>", re.IGNORECASE)
+_A_RE = re.compile(r"<a\b[^>]*>.*?</a>", re.IGNORECASE | re.DOTALL)
+_A_TEXT_RE = re.compile(r"^<a\b[^>]*>|</a>$", re.IGNORECASE)
 
+# 取得の打ち切り（workflow の timeout-minutes: 15 より手前で止める）
+# 起点は build_items() の開始時刻（scheduler はモジュールを使い回すので import 時刻ではない）
+FETCH_DEADLINE = 12 * 60
 
-def abs_url(base: str, href: str) -> str:
-    return urljoin(base, href)
+
+def get_html_many(urls: list[str], t0: float) -> list:
+    """
+    複数URLを並列取得（結果は入力順）。t0 は今回の取得の開始時刻（time.monotonic()）。
+    失敗したものは例外オブジェクトのまま返す（打ち切りは fetch.DeadlineExceeded）。
+    """
+    left = max(0.0, FETCH_DEADLINE - (time.monotonic() - t0))
+    results = fetch.fetch_many(
+        urls, headers={"User-Agent": UA}, timeout=TIMEOUT, deadline=left
+    )
+    return [r if isinstance(r, Exception) else r.text for r in results]
 
 
 def parse_dt_jst(dt_str: str) -> datetime:
-    # 例: "January 29, 2026 8:24 am"
-    dt = datetime.strptime(dt_str.strip(), "%B %d, %Y %I:%M %p")
-    return dt.replace(tzinfo=JST)
+    # 例: "January 29, 2026 8:24 am"（ロケール非依存・同じ文字列はメモ化）
+    return timestamps.parse_en_datetime(dt_str.strip(), JST)
+
+
+def _soup(html: str):
+    # bs4 はパースするときに初めて import する（import だけなら読み込まない）
+    from bs4 import BeautifulSoup
+
+    return BeautifulSoup(html, "html.parser")
+
+
+@dataclass(frozen=True)
+class Options:
+    desc_max_links: int = DESC_MAX_LINKS
+    desc_max_bytes: int = DESC_MAX_BYTES
+    full_content: bool = False
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return max(0, int(os.getenv(name, "") or default))
+    except ValueError:
+        return default
+
+
+def load_options() -> Options:
+    """環境変数から設定を読む（import 時ではなく実行のたびに呼ぶ。不正な値は既定値）。"""
+    return Options(
+        desc_max_links=_env_int("AZ_DESC_MAX_LINKS", DESC_MAX_LINKS),
+        desc_max_bytes=_env_int("AZ_DESC_MAX_BYTES", DESC_MAX_BYTES),
+        full_content=os.getenv("AZ_FULL_CONTENT", "") == "1",
+    )
+
 
+@dataclass(slots=True)
+class ListEntry:
+    """一覧ページの1件（feed に要る項目だけ）。"""
 
-def parse_list_page(html: str):
+    url: str
+    title: str
+    dt: datetime
+    dt_src: str
+
+
+@metrics.timed("parse_list_page")
+def parse_list_page(html: str) -> list[ListEntry]:
     """
-    一覧ページから (url, title, dt) を取得。
+    一覧ページから ListEntry(url, title, dt, dt_src) を取得。
     取得元は span.entry-date のみ。
       - dt: span.entry-date@title
       - url: span.entry-date a@href
       - title: span.entry-date a@title
     対象は #content 内の post ブロックごと（id=post-xxxx, classにtype-post）。
     """
-    soup = BeautifulSoup(html, "html.parser")
+    soup = _soup(html)
     content = soup.select_one("#content")
     if content is None:
         return []
@@ -84,18 +155,19 @@ def parse_list_page(html: str):
         except Exception:
             continue
 
-        items.append({"url": url, "title": title, "dt": dt, "dt_src": dt_src})
+        items.append(ListEntry(url, title, dt, dt_src))
 
     return items
 
 
+@metrics.timed("parse_post_description")
 def parse_post_description(post_url: str, html: str) -> str:
     """
     記事ページから description（HTML）を取得:
       #content 内の .entry-content をHTMLのまま
-    画像/リンクは相対→絶対に補正。
+    画像/リンクは相対→絶対に補正（srcset / data-src などの遅延読み込み属性も）。
     """
-    soup = BeautifulSoup(html, "html.parser")
+    soup = _soup(html)
     content = soup.select_one("#content")
     if content is None:
         return post_url
@@ -104,56 +176,119 @@ def parse_post_description(post_url: str, html: str) -> str:
     if entry is None:
         return str(content)
 
-    for tag in entry.find_all(["a", "img"]):
-        attr = "href" if tag.name == "a" else "src"
-        v = tag.get(attr)
-        if not v:
-            continue
-        tag[attr] = abs_url(post_url, v)
+    return urlrewrite.rewrite_html(str(entry), post_url)
 
-    return str(entry)
 
+def summarize_description(
+    post_url: str,
+    body: str,
+    max_links: int = DESC_MAX_LINKS,
+    max_bytes: int = DESC_MAX_BYTES,
+) -> str:
+    """
+    本文HTML（parse_post_description の結果）から要約を作る:
+      先頭の画像 + 先頭 max_links 個のリンク + 残り件数と記事へのリンク
+    切り出すのは <img> と <a>...</a> の完結した要素だけなので整形式が保たれる。
+    先頭画像を包んでいるリンク（画像ホストへのリンク）は画像と重複するので、
+    その画像を抜き、画像しか無かったリンクはリンク数にも数えない。
+    """
+    img = _IMG_RE.search(body)
+    links = _A_RE.findall(body)
+    if img:
+        tag = img.group(0)
+        links = [a.replace(tag, "") if tag in a else a for a in links]
+        links = [a for a in links if _A_TEXT_RE.sub("", a).strip()]
+
+    n = min(max_links, len(links))
+    while True:
+        parts = []
+        if img:
+            parts.append(f"<p>{img.group(0)}</p>")
+        if n:
+            parts.append("<ul>" + "".join(f"<li>{a}</li>" for a in links[:n]) + "</ul>")
+        rest = len(links) - n
+        more = f"ほか{rest}件のリンク" if rest else "記事を開く"
+        parts.append(f'<p><a href="{html_escape(post_url)}">{more}</a></p>')
+        out = "\n".join(parts)
+        if n == 0 or len(out.encode("utf-8")) <= max_bytes:
+            return out
+        n -= 1
+
+
+def item_from_article(it: ListEntry, body: str, opts: Options = Options()) -> FeedItem:
+    """一覧の1件と記事本文（parse_post_description の結果）から FeedItem を作る。"""
+    prefix = f"<p><strong>更新：</strong>{it.dt_src}</p>\n"
+    return FeedItem(
+        guid=f"{it.dt.isoformat()}|{it.url}",
+        title=it.title,
+        link=it.url,
+        description=prefix
+        + summarize_description(it.url, body, opts.desc_max_links, opts.desc_max_bytes),
+        published=it.dt,
+        content=prefix + body if opts.full_content else "",
+    )
+
+
+def build_items(opts: Options | None = None) -> list[FeedItem]:
+    t0 = time.monotonic()
+    if opts is None:
+        opts = load_options()
 
-def main():
     # 1) 一覧をマージ（URL重複除去）
     seen = set()
     candidates = []
-    for u in LIST_URLS:
-        html = get_html(u)
-        for it in parse_list_page(html):
-            if it["url"] in seen:
-                continue
-            seen.add(it["url"])
-            candidates.append(it)
+    with metrics.stage("list"):
+        for html in get_html_many(LIST_URLS, t0):
+            if isinstance(html, Exception):
+                raise html
+            for it in parse_list_page(html):
+                if it.url in seen:
+                    continue
+                seen.add(it.url)
+                candidates.append(it)
 
     # 2) 日付でソート（新しい順）
-    candidates.sort(key=lambda x: x["dt"], reverse=True)
+    candidates.sort(key=lambda x: x.dt, reverse=True)
 
     # 3) 先読み（まず試作なので全件先読み）
     candidates = candidates[:MAX_PREFETCH]
-    for it in candidates:
-        body = parse_post_description(it["url"], get_html(it["url"]))
-        prefix = f"<p><strong>更新：</strong>{it.get('dt_src','')}</p>\n"
-        it["desc"] = prefix + body
-
-    # 4) RSS生成
-    fg = FeedGenerator()
-    fg.title(FEED_TITLE)
-    fg.link(href=FEED_LINK, rel="alternate")
-    fg.description("A-z manga の更新情報（複数ページを統合）")
-    fg.language("ja")
-
-    for it in candidates:
-        guid = f"{it['dt'].isoformat()}|{it['url']}"
-        fe = fg.add_entry(order="append")
-        fe.id(guid)
-        fe.title(it["title"])
-        fe.link(href=it["url"])
-        fe.pubDate(it["dt"])
-        fe.description(it["desc"])
-
-    Path(OUT_XML).write_bytes(fg.rss_str(pretty=True))
+    with metrics.stage("articles"):
+        pages = get_html_many([it.url for it in candidates], t0)
+        fetched = []
+        htmls = []
+        for it, html in zip(candidates, pages):
+            if isinstance(html, fetch.DeadlineExceeded):
+                # 時間切れ分は次回に回す（feed全体を落とさない）
+                continue
+            if isinstance(html, Exception):
+                raise html
+            fetched.append(it)
+            htmls.append(html)
+        if len(fetched) < len(candidates):
+            print(f"Deadline reached: {len(candidates) - len(fetched)} articles skipped")
+
+    # パースはCPUバウンドなので件数が多ければプロセスプールへ（結果は候補順）
+    items: list[FeedItem] = []
+    with metrics.stage("parse"):
+        bodies = parallel.pmap(
+            parse_post_description, [(it.url, h) for it, h in zip(fetched, htmls)]
+        )
+        for it, body in zip(fetched, bodies):
+            items.append(item_from_article(it, body, opts))
+    return items
+
+
+def main():
+    opts = load_options()
+
+    # 取得に失敗したら前回成功時の items で出し直す（サイト障害で feed を空にしない）
+    items = swr.run(OUT_XML, lambda: build_items(opts))
+    metrics.count("items", len(items))
+
+    # 4) feed生成（FEED_ARCHIVE=1 なら古い分は RFC 5005 のアーカイブページへ）
+    if not feedrender.publish(OUT_XML, META, items):
+        print(f"No changes. {OUT_XML} not updated.")
 
 
 if __name__ == "__main__":
-    main()
+    raise SystemExit(profiling.run(main, OUT_XML))
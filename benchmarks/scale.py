@@ -0,0 +1,337 @@
+"""
+合成データでの規模ベンチマーク（ネットワークは使わない）。
+
+  python benchmarks/scale.py                          # 各ソース 1,000 件と 10,000 件
+  python benchmarks/scale.py --items 500,5000,50000 pixiv kemono
+  python benchmarks/scale.py --sources 2000 --items 20     # 小さいソースを大量に
+  python benchmarks/scale.py --json scale.json        # 結果を JSON でも残す
+
+pixiv の episodes API / kemono の posts API / onitsuka の GraphQL / a-zmanga の一覧・記事 HTML と
+同じ形の入力を指定件数ぶん生成し、各 generator の実際の変換関数
+（items_from_payload / read_page + items_from_posts / read_products + rows_from_products /
+parse_list_page + parse_post_description + item_from_article）と feedrender.publish を通す。
+
+件数ごとに build（変換）と write（描画・書き出し）の時間、1件あたりの時間、スループット、
+tracemalloc で測ったピークメモリを表示する。1件あたりの時間が、それより小さい件数での
+最小値の SCALING_TOLERANCE 倍を超えて伸びたら（件数に対して線形より悪化したら）終了コード 1。
+変換後の件数（out）が入力より少ない（上限で切られて規模を測れていない）ときも 1。
+出力は一時ディレクトリに書く。FEED_ARCHIVE などの feed 関連の環境変数はそのまま効く
+（画像ミラーと WebSub の ping はネットワークを使うので外す）。
+"""
+from __future__ import annotations
+
+import argparse
+import gc
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import feedrender  # noqa: E402
+from feeditem import FeedItem, FeedMeta  # noqa: E402
+
+DEFAULT_ITEMS = (1_000, 10_000)
+SCALING_TOLERANCE = 2.0
+CHUNK = 64 * 1024
+
+_T0 = datetime(2020, 1, 1, tzinfo=timezone.utc)
+
+
+@dataclass
+class Shape:
+    """1ソース分の入力の作り方と、generator 側の変換。"""
+
+    name: str
+    meta: FeedMeta
+    make: Callable[[int, int], Any]  # (件数, ソース番号) -> 入力
+    build: Callable[[Any], List[FeedItem]]
+
+
+@dataclass
+class Result:
+    source: str
+    sources: int
+    items_in: int
+    items_out: int
+    build_s: float
+    write_s: float
+    us_per_item: float
+    items_per_s: float
+    peak_mb: float
+
+
+def _chunks(data: bytes) -> List[bytes]:
+    return [data[i : i + CHUNK] for i in range(0, len(data), CHUNK)]
+
+
+# ---- pixiv: episodes API ----
+
+def _pixiv_make(n: int, k: int) -> bytes:
+    eps: List[Dict[str, Any]] = []
+    for i in range(n, 0, -1):
+        ms = int((_T0 + timedelta(hours=i)).timestamp() * 1000)
+        eps.append(
+            {
+                "state": "readable",
+                "episode": {
+                    "id": k * 10_000_000 + i,
+                    "numbering_title": f"第{i}話",
+                    "sub_title": f"サブタイトル {i}",
+                    "viewer_path": f"/viewer/stories/{k}-{i}",
+                    "thumbnail_image_url": f"https://public-img-comic.pximg.net/images/story_thumbnail/{k}/{i}.jpg",
+                    "read_start_at": ms,
+                },
+            }
+        )
+    eps.append({"state": "not_publishing", "message": "次回更新予定日: 2月16日 12:00"})
+    return json.dumps({"data": {"episodes": eps}}, ensure_ascii=False).encode("utf-8")
+
+
+def _pixiv_build(payload: bytes) -> List[FeedItem]:
+    import pixiv_api_7912
+
+    items, _ = pixiv_api_7912.items_from_payload(json.loads(payload), datetime.now(timezone.utc))
+    return items
+
+
+# ---- kemono: posts API ----
+
+def _kemono_make(n: int, k: int) -> bytes:
+    posts = [
+        {
+            "id": str(k * 10_000_000 + i),
+            "user": "31357565",
+            "service": "fanbox",
+            "title": f"投稿 {i}",
+            "published": (_T0 + timedelta(hours=i)).strftime("%Y-%m-%dT%H:%M:%S"),
+            "file": {"name": f"{i}.png", "path": f"/{i % 256:02x}/{i:08x}.png"},
+            "attachments": [{"name": f"{i}-{j}.png", "path": f"/a/{i}/{j}.png"} for j in range(3)],
+            "content": "<p>" + "本文 " * 40 + "</p>",
+        }
+        for i in range(n, 0, -1)
+    ]
+    return json.dumps(posts, ensure_ascii=False).encode("utf-8")
+
+
+def _kemono_build(payload: bytes) -> List[FeedItem]:
+    import kemono_api_31357565 as kemono
+
+    _, posts = kemono.read_page(_chunks(payload))
+    # 本番は FEED_ARCHIVE が無いと MAX_ITEMS 件で切るので、ここでは上限を外して全件を変換させる
+    # （FEED_ARCHIVE=1 にすると publish 側もアーカイブ出力になり、他のソースと比べられない）
+    cap, kemono.MAX_ITEMS = kemono.MAX_ITEMS, len(posts)
+    try:
+        return kemono.items_from_posts(posts)
+    finally:
+        kemono.MAX_ITEMS = cap
+
+
+# ---- onitsuka: GraphQL productSearch ----
+
+def _onitsuka_make(n: int, k: int) -> bytes:
+    items = [
+        {
+            "product": {
+                "sku": f"SKU{k:04d}{i:07d}",
+                "name": f"MEXICO 66 {i}",
+                "canonical_url": f"/jp/ja-jp/p/{k}-{i}.html",
+                "image": {"url": f"//www.onitsukatiger.com/media/{k}/{i}.jpg"},
+                "price_range": {
+                    "minimum_price": {"final_price": {"value": 10_000 + i, "currency": "JPY"}}
+                },
+            },
+            "productView": {"attributes": [{"name": "newest_first", "value": str(i)}]},
+        }
+        for i in range(n)
+    ]
+    doc = {"data": {"productSearch": {"total_count": n, "items": items}}}
+    return json.dumps(doc, ensure_ascii=False).encode("utf-8")
+
+
+def _onitsuka_build(payload: bytes) -> List[FeedItem]:
+    import onitsuka_api
+
+    products = onitsuka_api.read_products(_chunks(payload))
+    products.sort(key=lambda x: x.newest, reverse=True)
+    return onitsuka_api.rows_from_products(products)
+
+
+# ---- a-zmanga: 一覧 HTML + 記事 HTML ----
+
+_AZ_PER_PAGE = 20
+_AZ_LIST = '<html><body><div id="content">{}</div></body></html>'
+_AZ_POST = (
+    '<div id="post-{id}" class="post type-post"><h2>{title}</h2>'
+    '<span class="entry-date" title="{date}"><a href="{url}" title="{title}">{date}</a></span></div>'
+)
+_AZ_ARTICLE = (
+    '<html><body><div id="content"><div class="entry-content">'
+    '<p><img src="/wp-content/uploads/{id}.jpg" srcset="/wp-content/uploads/{id}.jpg 1x"></p>'
+    "<p>{title}</p>{links}</div></div></body></html>"
+)
+
+
+def _az_date(dt: datetime) -> str:
+    h = dt.hour % 12 or 12
+    return f"{dt:%B} {dt.day}, {dt.year} {h}:{dt.minute:02d} {'pm' if dt.hour >= 12 else 'am'}"
+
+
+def _azmanga_make(n: int, k: int) -> Dict[str, Any]:
+    posts = []
+    for i in range(n, 0, -1):
+        pid = k * 10_000_000 + i
+        posts.append(
+            {
+                "id": pid,
+                "title": f"[作者] タイトル 第{i}巻",
+                "url": f"https://www.a-zmanga.net/archives/{pid}",
+                "date": _az_date(_T0 + timedelta(hours=i)),
+            }
+        )
+    pages = [
+        _AZ_LIST.format("".join(_AZ_POST.format(**p) for p in posts[s : s + _AZ_PER_PAGE]))
+        for s in range(0, len(posts), _AZ_PER_PAGE)
+    ]
+    links = "".join(f'<a href="https://rapidgator.net/file/{j}">dl {j}</a>' for j in range(20))
+    articles = {p["url"]: _AZ_ARTICLE.format(id=p["id"], title=p["title"], links=links) for p in posts}
+    return {"pages": pages, "articles": articles}
+
+
+def _azmanga_build(payload: Dict[str, Any]) -> List[FeedItem]:
+    import azmanga
+    import parallel
+
+    entries = [e for html in payload["pages"] for e in azmanga.parse_list_page(html)]
+    entries.sort(key=lambda x: x.dt, reverse=True)
+    articles = payload["articles"]
+    bodies = parallel.pmap(azmanga.parse_post_description, [(e.url, articles[e.url]) for e in entries])
+    opts = azmanga.load_options()
+    return [azmanga.item_from_article(e, body, opts) for e, body in zip(entries, bodies)]
+
+
+def _meta(name: str) -> FeedMeta:
+    return FeedMeta(title=f"bench {name}", link=f"https://example.invalid/{name}", description=name)
+
+
+SHAPES = {
+    s.name: s
+    for s in (
+        Shape("pixiv", _meta("pixiv"), _pixiv_make, _pixiv_build),
+        Shape("kemono", _meta("kemono"), _kemono_make, _kemono_build),
+        Shape("onitsuka", _meta("onitsuka"), _onitsuka_make, _onitsuka_build),
+        Shape("azmanga", _meta("azmanga"), _azmanga_make, _azmanga_build),
+    )
+}
+
+
+def run_shape(shape: Shape, n_items: int, n_sources: int, workdir: Path) -> Result:
+    payloads = [shape.make(n_items, k) for k in range(n_sources)]
+
+    # 時間は tracemalloc なしで測る（有効にすると割り当てのたびに遅くなる）
+    build_s = write_s = 0.0
+    items_out = 0
+    for k, payload in enumerate(payloads):
+        gc.collect()
+        t0 = time.perf_counter()
+        items = shape.build(payload)
+        t1 = time.perf_counter()
+        feedrender.publish(workdir / f"feed_{shape.name}_{k}.xml", shape.meta, items)
+        t2 = time.perf_counter()
+        build_s += t1 - t0
+        write_s += t2 - t1
+        items_out += len(items)
+
+    # ピークメモリは1ソース分（入力は生成済みのものを使い、出力は別名にして書き直させる）
+    gc.collect()
+    tracemalloc.start()
+    items = shape.build(payloads[0])
+    feedrender.publish(workdir / f"feed_{shape.name}_peak.xml", shape.meta, items)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    total_in = n_items * n_sources
+    total_s = build_s + write_s
+    return Result(
+        source=shape.name,
+        sources=n_sources,
+        items_in=total_in,
+        items_out=items_out,
+        build_s=build_s,
+        write_s=write_s,
+        us_per_item=total_s / max(1, total_in) * 1e6,
+        items_per_s=total_in / total_s if total_s else float("inf"),
+        peak_mb=peak / 1e6,
+    )
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="synthetic large-scale feed building benchmark")
+    ap.add_argument("shapes", nargs="*", default=list(SHAPES), help=f"対象（{', '.join(SHAPES)}）")
+    ap.add_argument("--items", default=",".join(map(str, DEFAULT_ITEMS)), help="1ソースあたりの件数（カンマ区切り）")
+    ap.add_argument("--sources", type=int, default=1, help="形ごとのソース数")
+    ap.add_argument("--json", type=Path, help="結果を JSON で書き出す")
+    args = ap.parse_args()
+
+    unknown = [s for s in args.shapes if s not in SHAPES]
+    if unknown:
+        ap.error(f"unknown shape(s): {', '.join(unknown)}")
+    scales = sorted({int(x) for x in args.items.split(",") if x.strip()})
+
+    for name in ("FEED_IMAGE_MIRROR", "FEED_WEBSUB_HUB"):
+        os.environ.pop(name, None)
+
+    results: List[Result] = []
+    failed = False
+    print(
+        f"{'source':9} {'sources':>7} {'items':>8} {'out':>8} {'build s':>8} {'write s':>8} "
+        f"{'us/item':>8} {'items/s':>9} {'peak MB':>8}"
+    )
+    with tempfile.TemporaryDirectory(prefix="feed-bench-") as tmp:
+        cwd = os.getcwd()
+        os.chdir(tmp)  # アーカイブ状態などの副産物も一時ディレクトリに
+        try:
+            for name in args.shapes:
+                rows = []
+                for n in scales:
+                    r = run_shape(SHAPES[name], n, args.sources, Path(tmp))
+                    rows.append(r)
+                    print(
+                        f"{r.source:9} {r.sources:7d} {r.items_in:8d} {r.items_out:8d} "
+                        f"{r.build_s:8.2f} {r.write_s:8.2f} {r.us_per_item:8.1f} "
+                        f"{r.items_per_s:9.0f} {r.peak_mb:8.1f}"
+                    )
+                for r in rows:
+                    if r.items_out != r.items_in:
+                        # 途中で件数が切られていたら、その規模を測ったことにならない
+                        failed = True
+                        print(f"{name}: only {r.items_out} of {r.items_in} items were built")
+                # 小さい件数は固定費で1件あたりが割高になるので、大きい側への伸びだけを見る
+                best = rows[0].us_per_item
+                for r in rows[1:]:
+                    if r.us_per_item > best * SCALING_TOLERANCE:
+                        failed = True
+                        print(
+                            f"{name}: per-item time grows with scale "
+                            f"({r.us_per_item / best:.1f}x at {r.items_in} items)"
+                        )
+                    best = min(best, r.us_per_item)
+                results.extend(rows)
+        finally:
+            os.chdir(cwd)
+
+    if args.json:
+        args.json.write_text(json.dumps([asdict(r) for r in results], indent=2) + "\n", encoding="utf-8")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
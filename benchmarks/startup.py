@@ -0,0 +1,103 @@
+"""
+generator の import 時間と、import 時に重い依存を読み込んでいないかのチェック。
+
+  python benchmarks/startup.py             # 予算超過・重い依存の読み込みがあれば終了コード 1
+  python benchmarks/startup.py --repeat 10
+
+各モジュールを新しい Python プロセスで import し（secrets の環境変数も外した状態で）、
+import にかかった時間の最小値を IMPORT_BUDGET_MS（FEED_IMPORT_BUDGET_MS で上書き）と比べる。
+feedgen / lxml / bs4 / requests / playwright / asyncio などは実行時に初めて読み込む約束なので、
+import しただけで sys.modules に入っていたら失敗にする。
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+MODULES = [
+    "azmanga",
+    "pixiv_api_7912",
+    "kemono_api_31357565",
+    "onitsuka_api",
+    "onitsuka",
+    "pixiv_7912",
+    "kemono_31357565",
+    "scheduler",
+]
+
+# import だけでは読み込まれてはいけないもの（最初に使うときに遅延 import する）
+HEAVY = (
+    "feedgen",
+    "lxml",
+    "dateutil",
+    "bs4",
+    "requests",
+    "urllib3",
+    "playwright",
+    "asyncio",
+    "multiprocessing",
+    "cProfile",
+)
+
+IMPORT_BUDGET_MS = 100.0
+
+_PROBE = """
+import json, sys, time
+before = set(sys.modules)
+t0 = time.perf_counter()
+import {mod}
+ms = (time.perf_counter() - t0) * 1000
+loaded = sorted({{m.split(".")[0] for m in set(sys.modules) - before}})
+print(json.dumps({{"ms": ms, "loaded": loaded}}))
+"""
+
+
+def probe(mod: str) -> dict:
+    env = {k: v for k, v in os.environ.items() if not k.startswith("OT_")}
+    out = subprocess.run(
+        [sys.executable, "-c", _PROBE.format(mod=mod)],
+        cwd=ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if out.returncode != 0:
+        return {"ms": float("inf"), "loaded": [], "error": out.stderr.strip().splitlines()[-1:]}
+    return json.loads(out.stdout)
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="import-time budget check")
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("modules", nargs="*", default=MODULES)
+    args = ap.parse_args()
+
+    budget = float(os.getenv("FEED_IMPORT_BUDGET_MS", "") or IMPORT_BUDGET_MS)
+    failed = False
+    print(f"{'module':24} {'min ms':>8}  budget {budget:.0f}ms")
+    for mod in args.modules:
+        runs = [probe(mod) for _ in range(max(1, args.repeat))]
+        best = min(r["ms"] for r in runs)
+        heavy = sorted({m for r in runs for m in r["loaded"] if m in HEAVY})
+        errors = [r["error"] for r in runs if "error" in r]
+
+        status = "ok"
+        if errors:
+            status = f"import failed: {errors[0]}"
+        elif heavy:
+            status = f"heavy imports: {', '.join(heavy)}"
+        elif best > budget:
+            status = "over budget"
+        failed |= status != "ok"
+        print(f"{mod:24} {best:8.1f}  {status}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
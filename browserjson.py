@@ -0,0 +1,47 @@
+"""
+Playwright でページを開き、ページ自身が取りに行く JSON（XHR / fetch）のレスポンスを横取りする。
+
+    body = browserjson.capture(URL, lambda u: "/api/app/works/7912/episodes" in u)
+
+DOM の描画や networkidle は待たず、条件に合うレスポンスが届いた時点で返す。
+画像・フォント・動画・CSS は JSON に関係ないので読み込ませない（帯域と待ち時間の節約）。
+Playwright は呼び出したときに初めて import する。
+"""
+from __future__ import annotations
+
+from typing import Any, Callable
+
+import metrics
+
+DEFAULT_TIMEOUT_MS = 30_000
+
+# JSON を取るだけなら不要なリソース
+BLOCKED_RESOURCES = ("image", "font", "media", "stylesheet")
+
+
+def _block_assets(route: Any) -> None:
+    if route.request.resource_type in BLOCKED_RESOURCES:
+        route.abort()
+    else:
+        route.continue_()
+
+
+def capture(page_url: str, match: Callable[[str], bool], timeout_ms: int = DEFAULT_TIMEOUT_MS) -> bytes:
+    """page_url を開き、URL が match に合う最初のレスポンスの本文を返す。"""
+    from playwright.sync_api import sync_playwright
+
+    with sync_playwright() as p:
+        browser = p.chromium.launch(headless=True)
+        try:
+            page = browser.new_page()
+            page.route("**/*", _block_assets)
+            with page.expect_response(lambda r: match(r.url), timeout=timeout_ms) as info:
+                page.goto(page_url, wait_until="commit")
+            resp = info.value
+            if not resp.ok:
+                raise RuntimeError(f"{resp.url}: HTTP {resp.status}")
+            body = resp.body()
+        finally:
+            browser.close()
+    metrics.count("captured_bytes", len(body))
+    return body
@@ -0,0 +1,64 @@
+"""
+feedgen の拡張。
+
+feedgen は RSS 出力時に rel="self" 以外の atom:link を捨てるので、
+channel に任意の atom:link（prev-archive, current, hub など）と
+RFC 5005 の <fh:archive/> を足すための拡張を用意する。
+
+    ext = feedext.links(fg)
+    ext.link("feed_x.archive-0003.xml", "prev-archive")
+"""
+from __future__ import annotations
+
+from typing import List, Optional, Tuple
+
+from feedgen.ext.base import BaseExtension
+from lxml import etree
+
+ATOM_NS = "http://www.w3.org/2005/Atom"
+FH_NS = "http://purl.org/syndication/history/1.0"
+
+
+class LinksExtension(BaseExtension):
+    def __init__(self) -> None:
+        self._links: List[Tuple[str, str, Optional[str]]] = []
+        self._archive = False
+
+    def link(self, href: str, rel: str, type: Optional[str] = None) -> None:
+        self._links.append((href, rel, type))
+
+    def clear(self) -> None:
+        self._links = []
+
+    def archive(self, flag: bool = True) -> None:
+        """アーカイブ文書（RFC 5005 §4）として <fh:archive/> を付ける。"""
+        self._archive = flag
+
+    def extend_ns(self) -> dict:
+        ns = {"atom": ATOM_NS}
+        if self._archive:
+            ns["fh"] = FH_NS
+        return ns
+
+    def _append(self, parent: etree._Element) -> None:
+        for href, rel, typ in self._links:
+            el = etree.SubElement(parent, f"{{{ATOM_NS}}}link", href=href, rel=rel)
+            if typ:
+                el.attrib["type"] = typ
+        if self._archive:
+            etree.SubElement(parent, f"{{{FH_NS}}}archive")
+
+    def extend_rss(self, rss_feed: etree._Element) -> etree._Element:
+        self._append(rss_feed[0])
+        return rss_feed
+
+    def extend_atom(self, atom_feed: etree._Element) -> etree._Element:
+        self._append(atom_feed)
+        return atom_feed
+
+
+def links(fg) -> LinksExtension:
+    """fg に LinksExtension を（未登録なら）登録して返す。"""
+    if not hasattr(fg, "feedlinks"):
+        fg.register_extension("feedlinks", LinksExtension, None)
+    return fg.feedlinks
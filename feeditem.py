@@ -0,0 +1,94 @@
+"""
+全ソース共通の正規化済みエントリ。
+
+各 generator はソース固有の dict から FeedItem を作り、
+描画（RSS / Atom / JSON Feed）は feedrender がまとめて行う。
+"""
+from __future__ import annotations
+
+import hashlib
+import re
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, Optional
+from urllib.parse import quote, unquote, urlsplit
+
+# guid が IRI でないとき（"kemono-fanbox-…" や "日付|URL" など）の Atom の id は
+# tag:<feed の link のホスト>,<TAG_DATE>:<guid>（RFC 4151）。変えると既読が崩れるので固定
+TAG_DATE = "2026"
+_TAG_SAFE = "-._~!$&'()*+,;=:@/?"
+_IRI_RE = re.compile(r"^[a-zA-Z][a-zA-Z0-9+.\-]*:[^\s<>\"{}|\\^`]+$")
+_TAG_ID_RE = re.compile(r"^tag:[^,:]+," + TAG_DATE + r":(.*)$", re.S)
+
+
+def content_digest(title: str, link: str, description: str, content: str = "") -> str:
+    """表示に効く項目のハッシュ。前回の feed（prevfeed）から読んだ値と比べて変更を検出する。"""
+    h = hashlib.sha256()
+    for part in (title, link, description, content):
+        h.update(part.strip().encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()[:32]
+
+
+def atom_id(guid: str, feed_link: str) -> str:
+    """atom:id は IRI でなければならない（RFC 4287）。guid がそうでなければ tag: URI にする。"""
+    if _IRI_RE.match(guid):
+        return guid
+    host = urlsplit(feed_link).hostname or "localhost"
+    return f"tag:{host},{TAG_DATE}:{quote(guid, safe=_TAG_SAFE)}"
+
+
+def guid_from_atom_id(atom_id: str) -> str:
+    """atom_id() の逆（Atom の feed を読み直して guid を得る）。"""
+    m = _TAG_ID_RE.match(atom_id)
+    return unquote(m.group(1)) if m else atom_id
+
+
+@dataclass(slots=True)
+class FeedMeta:
+    title: str
+    link: str
+    description: str
+    language: str = "ja"
+
+
+@dataclass(slots=True)
+class FeedItem:
+    guid: str
+    title: str
+    link: str = ""
+    description: str = ""      # HTML（RSS description / Atom summary / JSON summary はタグを除く）
+    published: Optional[datetime] = None
+    content: str = ""          # 全文HTML（任意。RSS content:encoded / Atom content）
+    image: str = ""            # 代表画像（JSON Feed の image）
+
+    def digest(self) -> str:
+        return content_digest(self.title, self.link, self.description, self.content)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """アーカイブ状態などに保存するための JSON 化。"""
+        d = {
+            "guid": self.guid,
+            "title": self.title,
+            "link": self.link,
+            "description": self.description,
+            "published": self.published.isoformat() if self.published else "",
+        }
+        if self.content:
+            d["content"] = self.content
+        if self.image:
+            d["image"] = self.image
+        return d
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]) -> "FeedItem":
+        published = d.get("published") or ""
+        return cls(
+            guid=d["guid"],
+            title=d.get("title", ""),
+            link=d.get("link", ""),
+            description=d.get("description", ""),
+            published=datetime.fromisoformat(published) if published else None,
+            content=d.get("content", ""),
+            image=d.get("image", ""),
+        )
@@ -0,0 +1,269 @@
+"""
+FeedItem のリストから RSS / Atom / JSON Feed を1回の描画でまとめて出力する。
+
+    feedrender.publish(OUT, META, items)
+
+出力ファイル（FEED_FORMATS で選択、既定は rss,atom,json）:
+  rss  : feed_x.xml
+  atom : feed_x.atom.xml
+  json : feed_x.json（JSON Feed 1.1）
+FEED_ARCHIVE=1 のときは archive.paginate で head とアーカイブページに分けてから描画する。
+FEED_IMAGE_MIRROR=1 のときは描画の前に imagemirror で画像をローカルのコピーに差し替える。
+FEED_WEBSUB_HUB があれば head の feed に hub / self のリンクを入れ、変化したときにハブへ通知する（websub.py）。
+Atom の id は IRI でなければならないので、guid が IRI でなければ tag: URI にする（RSS の guid はそのまま）。
+JSON Feed の summary は plain text なので、description のタグを除いて入れる。
+
+feedgen（lxml / dateutil を引き込む）と feedext は描画するときに初めて import する。
+"""
+from __future__ import annotations
+
+import json
+import os
+from datetime import timezone
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, List, Sequence, Tuple
+
+import archive
+import feedwriter
+import metrics
+import prevfeed
+import websub
+from feeditem import FeedItem, FeedMeta, atom_id
+
+if TYPE_CHECKING:
+    from feedgen.feed import FeedGenerator
+
+ALL_FORMATS = ("rss", "atom", "json")
+
+# JSON Feed の summary（plain text）で改行にするタグ
+_BREAK_TAGS = frozenset(("br", "p", "div", "li", "tr", "h1", "h2", "h3", "h4", "h5", "h6"))
+
+# (rel, 対象ファイルの RSS 側パス)。href は形式ごとに format_path で読み替える
+Links = Sequence[Tuple[str, Path]]
+
+
+def formats() -> List[str]:
+    raw = os.getenv("FEED_FORMATS", ",".join(ALL_FORMATS))
+    out = [f.strip().lower() for f in raw.split(",") if f.strip()]
+    bad = [f for f in out if f not in ALL_FORMATS]
+    if bad:
+        raise ValueError(f"Unknown FEED_FORMATS: {', '.join(bad)}")
+    # RSS が主出力（変更判定・後段処理の基準）なので常に含める
+    return ["rss"] + [f for f in out if f != "rss"]
+
+
+def format_path(path: Path, fmt: str) -> Path:
+    if fmt == "atom":
+        return path.with_name(f"{path.stem}.atom{path.suffix}")
+    if fmt == "json":
+        return path.with_name(f"{path.stem}.json")
+    return path
+
+
+def build(meta: FeedMeta, items: Sequence[FeedItem]) -> FeedGenerator:
+    from feedgen.feed import FeedGenerator
+
+    fg = FeedGenerator()
+    fg.id(meta.link)
+    fg.title(meta.title)
+    fg.author({"name": meta.title})
+    fg.link(href=meta.link, rel="alternate")
+    fg.description(meta.description)
+    fg.language(meta.language)
+
+    for it in items:
+        # feedgenはデフォルトがprependなので、appendで“上から新しい順”を維持
+        fe = fg.add_entry(order="append")
+        fe.id(it.guid)
+        fe.title(it.title)
+        if it.link:
+            fe.link(href=it.link)
+        if it.description:
+            fe.summary(it.description, type="html")
+        if it.content:
+            fe.content(it.content, type="html")
+        if it.published:
+            fe.pubDate(it.published)
+            fe.updated(it.published)
+    return fg
+
+
+def plain_text(fragment: str) -> str:
+    """HTML 断片からタグを除いた文字列（JSON Feed の summary は plain text）。"""
+    from html.parser import HTMLParser
+
+    parts: List[str] = []
+
+    class _Text(HTMLParser):
+        def handle_starttag(self, tag: str, attrs: Any) -> None:
+            if tag in _BREAK_TAGS:
+                parts.append("\n")
+
+        def handle_data(self, data: str) -> None:
+            parts.append(data)
+
+    p = _Text(convert_charrefs=True)
+    p.feed(fragment)
+    p.close()
+    lines = (" ".join(line.split()) for line in "".join(parts).splitlines())
+    return "\n".join(line for line in lines if line)
+
+
+def _set_atom_ids(fg: FeedGenerator, meta: FeedMeta, items: Sequence[FeedItem]) -> None:
+    # feedgen の id() は RSS の guid も書き換えるので、RSS を描画した後に呼ぶ
+    for fe, it in zip(fg.entry(), items):
+        fe.id(atom_id(it.guid, meta.link))
+
+
+def _set_links(
+    fg: FeedGenerator, links: Links, is_archive: bool, fmt: str, hubs: Sequence[str] = ()
+) -> None:
+    import feedext
+
+    ext = feedext.links(fg)
+    ext.clear()
+    for hub in hubs:
+        ext.link(hub, "hub")
+    for rel, p in links:
+        ext.link(archive.href(format_path(p, fmt)), rel)
+    ext.archive(is_archive)
+
+
+def json_feed(
+    meta: FeedMeta,
+    items: Sequence[FeedItem],
+    links: Links = (),
+    is_archive: bool = False,
+    hubs: Sequence[str] = (),
+) -> bytes:
+    doc: Dict[str, Any] = {
+        "version": "https://jsonfeed.org/version/1.1",
+        "title": meta.title,
+        "home_page_url": meta.link,
+        "description": meta.description,
+        "language": meta.language,
+    }
+    for rel, p in links:
+        if rel == "self":
+            doc["feed_url"] = archive.href(format_path(p, "json"))
+        elif rel == "prev-archive":
+            # JSON Feed のページングは next_url（より古い側）
+            doc["next_url"] = archive.href(format_path(p, "json"))
+    if hubs:
+        doc["hubs"] = [{"type": "WebSub", "url": h} for h in hubs]
+    if is_archive:
+        doc["expired"] = True
+
+    rows = []
+    for it in items:
+        row: Dict[str, Any] = {"id": it.guid, "title": it.title}
+        if it.link:
+            row["url"] = it.link
+        row["content_html"] = it.content or it.description
+        if it.content and it.description:
+            row["summary"] = plain_text(it.description)
+        if it.image:
+            row["image"] = it.image
+        if it.published:
+            row["date_published"] = it.published.astimezone(timezone.utc).isoformat()
+        rows.append(row)
+    doc["items"] = rows
+    return (json.dumps(doc, ensure_ascii=False, indent=2) + "\n").encode("utf-8")
+
+
+def render(
+    meta: FeedMeta,
+    items: Sequence[FeedItem],
+    links: Links = (),
+    is_archive: bool = False,
+    fmts: Sequence[str] = ALL_FORMATS,
+    hubs: Sequence[str] = (),
+) -> Dict[str, bytes]:
+    """items を各形式のバイト列に描画する（feedgen のエントリ構築は1回だけ）。"""
+    out: Dict[str, bytes] = {}
+    with metrics.stage("serialize"):
+        fg = build(meta, items) if ("rss" in fmts or "atom" in fmts) else None
+        if "rss" in fmts:
+            if links or is_archive or hubs:
+                _set_links(fg, links, is_archive, "rss", hubs)
+            out["rss"] = fg.rss_str(pretty=True)
+        if "atom" in fmts:
+            if links or is_archive or hubs:
+                _set_links(fg, links, is_archive, "atom", hubs)
+            _set_atom_ids(fg, meta, items)
+            out["atom"] = fg.atom_str(pretty=True)
+        if "json" in fmts:
+            out["json"] = json_feed(meta, items, links, is_archive, hubs)
+    return out
+
+
+def write(
+    out_path: Any,
+    meta: FeedMeta,
+    items: Sequence[FeedItem],
+    links: Links = (),
+    is_archive: bool = False,
+) -> bool:
+    """全形式を書き出す。RSS が変わったら True。"""
+    path = Path(out_path)
+    hubs: List[str] = []
+    if not is_archive:
+        # アーカイブページは内容が変わらないので、購読対象（hub / self）は head だけ
+        hubs = websub.hubs()
+        if hubs:
+            links = [*links, ("self", path)]
+    changed = False
+    for fmt, data in render(meta, items, links, is_archive, formats(), hubs).items():
+        wrote = feedwriter.write_feed(format_path(path, fmt), data)
+        if fmt == "rss":
+            changed = wrote
+    return changed
+
+
+def unchanged(out_path: Any, items: Sequence[FeedItem]) -> bool:
+    """
+    前回の RSS を先頭から len(items)+1 件だけ読み（prevfeed）、GUID と表示内容のハッシュが
+    items と同じで、全形式・圧縮版がそろい、hub / self リンクも今の設定どおりなら True
+    （描画も書き出しも要らない）。アーカイブ・画像ミラーが有効なときは出力が items と
+    一致しないので常に False（publish に任せる）。
+    """
+    if archive.enabled() or os.getenv("FEED_IMAGE_MIRROR"):
+        return False
+    out = Path(out_path)
+    for fmt in formats():
+        p = format_path(out, fmt)
+        if not p.exists() or feedwriter.siblings_missing(p):
+            return False
+    hubs = websub.hubs()
+    want = [("hub", h) for h in hubs] + ([("self", archive.href(out))] if hubs else [])
+    have = [(rel, href) for rel, href in prevfeed.channel_links(out) if rel in ("hub", "self")]
+    if sorted(have) != sorted(want):
+        return False
+    prev = prevfeed.read(out, limit=len(items) + 1)
+    if [(p.guid, p.digest) for p in prev] != [(it.guid, it.digest()) for it in items]:
+        return False
+    metrics.cache_hit("items_unchanged")
+    return True
+
+
+def publish(out_path: Any, meta: FeedMeta, items: List[FeedItem]) -> bool:
+    """generator の最終段。アーカイブ・画像ミラーの設定も含めて feed を書き出す。"""
+    out = Path(out_path)
+    if os.getenv("FEED_IMAGE_MIRROR"):
+        import imagemirror
+
+        if imagemirror.enabled():
+            imagemirror.mirror_items(items, referer=meta.link)
+    if not archive.enabled():
+        changed = write(out, meta, items)
+    else:
+
+        def write_page(path: Path, page_items: List[FeedItem], links: Links) -> None:
+            write(path, meta, page_items, links, is_archive=True)
+
+        head, links = archive.paginate(out, items, write_page)
+        changed = write(out, meta, head, links)
+
+    if changed and websub.hubs() and not websub.deferred():
+        websub.ping([format_path(out, fmt) for fmt in formats()])
+    return changed
@@ -0,0 +1,316 @@
+"""
+生成済み feed をそのまま配信する軽量 HTTP サーバ（標準ライブラリのみ）。
+
+  python feedserver.py                   # カレントの feed_* を :8000 で配信
+  python feedserver.py --port 8080 --dir out
+  python scheduler.py --serve 8000       # 常駐スケジューラと同じプロセスで配信
+
+  - feed_*.xml / *.atom.xml / *.json とアーカイブページを起動時にメモリへ読み込む
+  - ETag は本文の SHA-256（強いETag。gzip/br 版はそれぞれ別の値）
+  - If-None-Match / If-Modified-Since に一致すれば 304（ディスクは読まない）
+  - Accept-Encoding に応じて事前圧縮版（feedwriter が書いた .br / .gz）をそのまま返す
+    （無ければメモリ上で gzip したものを使う）
+
+imagemirror がミラーした画像（images/xx/<sha256>.*）も配信する。内容のハッシュが
+ファイル名なので、こちらはディスクから読んで immutable として長期キャッシュさせる。
+
+ファイルの更新は refresh() で拾う。stat で変わったものだけ読み直し、
+新しい一覧を作ってから参照を丸ごと差し替えるので、配信中のリクエストが
+書きかけの状態を見ることはない。単体起動時は FEED_SERVE_REFRESH 秒（既定5）ごと、
+scheduler.py から使うときはビルドが終わるたびに refresh() する。
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import os
+import re
+import threading
+from dataclasses import dataclass
+from email.utils import formatdate, parsedate_to_datetime
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import feedwriter
+import imagemirror
+
+DEFAULT_PORT = 8000
+DEFAULT_REFRESH = 5.0
+DEFAULT_MAX_AGE = 300
+
+PATTERNS = ("feed_*.xml", "feed_*.json")
+# 同じパターンに当たるが配信しないもの（ランレポート・アーカイブや実行予定の状態ファイル）
+EXCLUDE = (".metrics.json", ".archive.json", ".schedule.json", ".cache.json", ".breaker.json")
+
+_IMAGE_RE = re.compile(r"^[0-9a-f]{2}/([0-9a-f]{64}(?:\.thumb)?)\.(jpg|png|gif|webp)$")
+IMAGE_TYPES = {"jpg": "image/jpeg", "png": "image/png", "gif": "image/gif", "webp": "image/webp"}
+
+
+@dataclass(slots=True, frozen=True)
+class Entry:
+    """配信する1ファイル分（本文・圧縮版・検証子）。"""
+
+    body: bytes
+    gz: bytes
+    br: Optional[bytes]
+    etag: str  # 引用符なしのハッシュ（gzip/br 版は -gz / -br を付ける）
+    mtime: float
+    content_type: str
+    stamp: Tuple[int, int]  # (mtime_ns, size) 変更検出用
+
+    @property
+    def last_modified(self) -> str:
+        return formatdate(self.mtime, usegmt=True)
+
+
+def content_type(name: str) -> str:
+    if name.endswith(".json"):
+        return "application/feed+json; charset=utf-8"
+    if name.endswith(".atom.xml"):
+        return "application/atom+xml; charset=utf-8"
+    return "application/rss+xml; charset=utf-8"
+
+
+def _stamp(path: Path) -> Tuple[int, int]:
+    st = path.stat()
+    return st.st_mtime_ns, st.st_size
+
+
+def _sibling(path: Path, suffix: str, mtime_ns: int) -> Optional[bytes]:
+    """feedwriter が書いた圧縮版（本文より古くないもの）があれば使う。"""
+    p = feedwriter.sibling(path, suffix)
+    try:
+        if p.stat().st_mtime_ns >= mtime_ns:
+            return p.read_bytes()
+    except FileNotFoundError:
+        pass
+    return None
+
+
+def load_entry(path: Path) -> Entry:
+    stamp = _stamp(path)
+    body = path.read_bytes()
+    gz = _sibling(path, ".gz", stamp[0]) or feedwriter.gzip_bytes(body)
+    br = _sibling(path, ".br", stamp[0])
+    return Entry(
+        body=body,
+        gz=gz,
+        br=br,
+        etag=hashlib.sha256(body).hexdigest()[:32],
+        mtime=stamp[0] / 1e9,
+        content_type=content_type(path.name),
+        stamp=stamp,
+    )
+
+
+class FeedStore:
+    """配信対象のメモリ上のスナップショット。refresh() で差分だけ読み直して差し替える。"""
+
+    def __init__(self, root: Path) -> None:
+        self.root = Path(root)
+        self._entries: Dict[str, Entry] = {}
+        self._lock = threading.Lock()  # refresh 同士の排他（読む側はロック不要）
+
+    def get(self, name: str) -> Optional[Entry]:
+        return self._entries.get(name)
+
+    def names(self) -> list:
+        return sorted(self._entries)
+
+    def refresh(self) -> int:
+        """変わったファイルを読み直す。読み直した件数を返す。"""
+        with self._lock:
+            old = self._entries
+            new: Dict[str, Entry] = {}
+            changed = 0
+            for pattern in PATTERNS:
+                for path in self.root.glob(pattern):
+                    if path.name.endswith(EXCLUDE):
+                        continue
+                    try:
+                        stamp = _stamp(path)
+                        prev = old.get(path.name)
+                        if prev is not None and prev.stamp == stamp:
+                            new[path.name] = prev
+                            continue
+                        new[path.name] = load_entry(path)
+                        changed += 1
+                    except FileNotFoundError:
+                        continue
+            if changed or len(new) != len(old):
+                self._entries = new  # 参照の差し替えだけなので読む側からは一瞬で切り替わる
+            return changed
+
+
+def accepted_encodings(header: str) -> set:
+    out = set()
+    for part in header.split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if name and q > 0:
+            out.add(name.strip().lower())
+    return out
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    """If-None-Match は弱い比較。エンコーディング違い（-gz/-br）も同じ内容として扱う。"""
+    for tag in header.split(","):
+        tag = tag.strip()
+        if tag == "*":
+            return True
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        tag = tag.strip('"')
+        if tag == etag or tag.split("-", 1)[0] == etag:
+            return True
+    return False
+
+
+def make_handler(store: FeedStore, max_age: int = DEFAULT_MAX_AGE):
+    class Handler(BaseHTTPRequestHandler):
+        server_version = "feed-generator"
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, fmt: str, *args) -> None:
+            # アクセスログは FEED_SERVE_LOG を指定したときだけ（既定は stderr に出さない）
+            if os.getenv("FEED_SERVE_LOG"):
+                super().log_message(fmt, *args)
+
+        def do_HEAD(self) -> None:
+            self._serve(head=True)
+
+        def do_GET(self) -> None:
+            self._serve(head=False)
+
+        def _not_modified(self, e: Entry) -> bool:
+            inm = self.headers.get("If-None-Match")
+            if inm is not None:
+                return _etag_matches(inm, e.etag)
+            ims = self.headers.get("If-Modified-Since")
+            if ims:
+                try:
+                    return int(e.mtime) <= int(parsedate_to_datetime(ims).timestamp())
+                except (TypeError, ValueError, IndexError, OverflowError):
+                    return False
+            return False
+
+        def _serve_image(self, rel: str, head: bool) -> bool:
+            m = _IMAGE_RE.match(rel)
+            if not m:
+                return False
+            path = store.root / imagemirror.image_dir() / rel
+            etag = f'"{m.group(1)}"'
+            if _etag_matches(self.headers.get("If-None-Match", ""), m.group(1)):
+                self.send_response(HTTPStatus.NOT_MODIFIED)
+                self.send_header("ETag", etag)
+                self.end_headers()
+                return True
+            try:
+                body = path.read_bytes()
+            except FileNotFoundError:
+                return False
+            self.send_response(HTTPStatus.OK)
+            self.send_header("Content-Type", IMAGE_TYPES[m.group(2)])
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", "public, max-age=31536000, immutable")
+            self.end_headers()
+            if not head:
+                self.wfile.write(body)
+            return True
+
+        def _serve(self, head: bool) -> None:
+            name = self.path.split("?", 1)[0].lstrip("/")
+            prefix = imagemirror.image_dir().as_posix().strip("/") + "/"
+            if name.startswith(prefix) and self._serve_image(name[len(prefix):], head):
+                return
+            e = store.get(name) if "/" not in name else None
+            if e is None:
+                self.send_error(HTTPStatus.NOT_FOUND)
+                return
+
+            enc = accepted_encodings(self.headers.get("Accept-Encoding", ""))
+            if e.br is not None and "br" in enc:
+                body, coding, etag = e.br, "br", e.etag + "-br"
+            elif "gzip" in enc:
+                body, coding, etag = e.gz, "gzip", e.etag + "-gz"
+            else:
+                body, coding, etag = e.body, None, e.etag
+
+            common = {
+                "ETag": f'"{etag}"',
+                "Last-Modified": e.last_modified,
+                "Cache-Control": f"public, max-age={max_age}",
+                "Vary": "Accept-Encoding",
+            }
+            if self._not_modified(e):
+                self.send_response(HTTPStatus.NOT_MODIFIED)
+                for k, v in common.items():
+                    self.send_header(k, v)
+                self.end_headers()
+                return
+
+            self.send_response(HTTPStatus.OK)
+            self.send_header("Content-Type", e.content_type)
+            self.send_header("Content-Length", str(len(body)))
+            if coding:
+                self.send_header("Content-Encoding", coding)
+            for k, v in common.items():
+                self.send_header(k, v)
+            self.end_headers()
+            if not head:
+                self.wfile.write(body)
+
+    return Handler
+
+
+def serve(
+    store: FeedStore, port: int = DEFAULT_PORT, host: str = "", max_age: int = DEFAULT_MAX_AGE
+) -> ThreadingHTTPServer:
+    """バックグラウンドスレッドで配信を始めてサーバを返す（止めるときは shutdown()）。"""
+    store.refresh()
+    httpd = ThreadingHTTPServer((host, port), make_handler(store, max_age))
+    httpd.daemon_threads = True
+    threading.Thread(target=httpd.serve_forever, name="feedserver", daemon=True).start()
+    return httpd
+
+
+def _float_env(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, "") or default)
+    except ValueError:
+        return default
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="serve generated feeds with conditional GET")
+    ap.add_argument("--port", type=int, default=DEFAULT_PORT)
+    ap.add_argument("--host", default="")
+    ap.add_argument("--dir", default=".")
+    args = ap.parse_args()
+
+    store = FeedStore(Path(args.dir))
+    httpd = serve(store, args.port, args.host, int(_float_env("FEED_SERVE_MAX_AGE", DEFAULT_MAX_AGE)))
+    print(f"Serving {', '.join(store.names()) or '(no feeds yet)'} on :{args.port}")
+    interval = _float_env("FEED_SERVE_REFRESH", DEFAULT_REFRESH)
+    stop = threading.Event()
+    try:
+        while not stop.wait(interval):
+            store.refresh()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,156 @@
+"""
+feed XML の共通書き出し。
+
+    changed = feedwriter.write_feed(OUT, fg.rss_str(pretty=True))
+
+  - 前回の内容と比べて変化が無ければ何も書かない（channel / feed 直下の lastBuildDate・updated の
+    差だけは無視。Atom の entry の updated は本当の編集なので比べる）
+  - XML と一緒に事前圧縮版 <feed>.gz / <feed>.br（brotli が入っていれば）も出す
+  - 圧縮版は mtime=0・ファイル名なしで作るので、同じXMLからは常に同じバイト列になる
+  - 書き込みは atomic_write(): 同じディレクトリの一時ファイルに書いて fsync し、
+    整形式チェック（.xml は XML、.json は JSON）を通ったものだけ rename で差し替える。
+    途中で落ちても（タイムアウト等）本番のファイル名には前回の完全な内容が残る
+"""
+from __future__ import annotations
+
+import gzip
+import io
+import json
+import os
+import re
+import tempfile
+from pathlib import Path
+from typing import Any, Iterable, Optional, Union
+from xml.parsers import expat
+
+import metrics
+
+try:
+    import brotli  # 任意依存
+except ImportError:  # pragma: no cover
+    brotli = None
+
+_VOLATILE_RE = re.compile(rb"<lastBuildDate>[^<]*</lastBuildDate>|<updated>[^<]*</updated>")
+# 最初の項目。ここより前（channel / feed 直下）だけを _VOLATILE_RE の対象にする
+_FIRST_ENTRY_RE = re.compile(rb"<(?:item|entry)[\s>]")
+
+
+class MalformedOutput(ValueError):
+    """書き出そうとした内容が整形式でなかった（本番のファイルは変更していない）。"""
+
+
+def check_well_formed(path: Path, tmp: Path) -> None:
+    """拡張子に応じて一時ファイルを読み直し、壊れていれば MalformedOutput。"""
+    name = path.name
+    try:
+        if name.endswith(".xml"):
+            parser = expat.ParserCreate()
+            with tmp.open("rb") as f:
+                parser.ParseFile(f)
+        elif name.endswith(".json"):
+            with tmp.open("rb") as f:
+                json.load(f)
+    except (expat.ExpatError, ValueError) as e:
+        raise MalformedOutput(f"{name}: {e}") from e
+
+
+def _fsync_dir(directory: Path) -> None:
+    # rename 自体を永続化する（対応していない環境では黙って諦める）
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def atomic_write(path: Any, data: Union[bytes, Iterable[bytes]], check: bool = True) -> None:
+    """
+    data（バイト列、またはバイト列チャンクのイテラブル）を path へ原子的に書き出す。
+    一時ファイル -> fsync -> 整形式チェック -> rename の順で、失敗時は一時ファイルを消す。
+    """
+    path = Path(path)
+    directory = path.parent if str(path.parent) else Path(".")
+    fd, tmp_name = tempfile.mkstemp(prefix=f".{path.name}.", suffix=".tmp", dir=directory)
+    tmp = Path(tmp_name)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            if isinstance(data, (bytes, bytearray, memoryview)):
+                f.write(data)
+            else:
+                for chunk in data:
+                    f.write(chunk)
+            f.flush()
+            os.fsync(f.fileno())
+        if check:
+            check_well_formed(path, tmp)
+        # mkstemp は 0600 で作るので、通常のファイルと同じパーミッションに揃える
+        umask = os.umask(0)
+        os.umask(umask)
+        os.chmod(tmp, 0o666 & ~umask)
+        os.replace(tmp, path)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    _fsync_dir(directory)
+
+
+def normalize(data: bytes) -> bytes:
+    """実行ごとに変わるだけの要素（最初の項目より前の lastBuildDate / updated）を除いた比較用のバイト列。"""
+    m = _FIRST_ENTRY_RE.search(data)
+    end = m.start() if m else len(data)
+    return _VOLATILE_RE.sub(b"", data[:end]) + data[end:]
+
+
+def gzip_bytes(data: bytes) -> bytes:
+    buf = io.BytesIO()
+    with gzip.GzipFile(filename="", mode="wb", fileobj=buf, compresslevel=9, mtime=0) as gz:
+        gz.write(data)
+    return buf.getvalue()
+
+
+def brotli_bytes(data: bytes) -> Optional[bytes]:
+    if brotli is None:
+        return None
+    return brotli.compress(data, quality=11)
+
+
+def sibling(path: Path, suffix: str) -> Path:
+    return path.with_name(path.name + suffix)
+
+
+def write_compressed(path: Path, data: bytes) -> None:
+    atomic_write(sibling(path, ".gz"), gzip_bytes(data), check=False)
+    br = brotli_bytes(data)
+    if br is not None:
+        atomic_write(sibling(path, ".br"), br, check=False)
+
+
+def siblings_missing(path: Path) -> bool:
+    if not sibling(path, ".gz").exists():
+        return True
+    return brotli is not None and not sibling(path, ".br").exists()
+
+
+def write_feed(path: Any, data: bytes) -> bool:
+    """
+    内容が変わったときだけ XML と圧縮版を書き出す。書いたら True。
+    整形式でなければ MalformedOutput を送出し、既存のファイルはそのまま残す。
+    """
+    path = Path(path)
+    old: Optional[bytes] = path.read_bytes() if path.exists() else None
+
+    if old is not None and normalize(old) == normalize(data):
+        # 初回導入時などで圧縮版だけ無い場合は、既存XMLから作る
+        if siblings_missing(path):
+            write_compressed(path, old)
+        metrics.cache_hit("feed_unchanged")
+        return False
+
+    atomic_write(path, data)
+    write_compressed(path, data)
+    return True
@@ -0,0 +1,537 @@
+"""
+HTTP取得の共通エンジン。
+
+  - request()/get()  : 同期版。プロセス内で requests.Session（コネクションプール）を共有
+  - AsyncFetcher     : asyncio版。共有プール + ホスト毎セマフォ + 全体レート制限 + デッドライン
+  - fetch_many()     : 複数URLをまとめて取得する同期ファサード（結果は入力順）
+
+パース処理（azmanga.parse_list_page など）はレスポンス本文を受け取るだけなので、
+どちらのバックエンドでもそのまま使える。
+FEED_FETCH=sync を指定すると fetch_many() も逐次の同期取得にフォールバックする。
+
+非同期側は新しい依存（aiohttp など）を増やさず、requests の呼び出しを
+専用スレッドプールに逃がして asyncio から制御する。
+
+ホスト毎の同時実行数は固定ではなく HostLimit（AIMD）で決める:
+  - レイテンシが基準から大きく外れていなければ、1往復ごとに +1 相当ずつ増やす
+    （基準は遅くなれば少しずつ追従するが、観測した最小値の BASE_MAX_DRIFT 倍で止まる）
+  - 429 / 503 / タイムアウトで半分にする（Retry-After があればその間ホストを止める）
+さらにホスト毎のブレーカーを持ち、接続失敗・タイムアウト・5xx が BREAK_AFTER 回続いたら
+BREAK_COOLDOWN 秒はそのホストへのリクエストを送らずに HostDown で即失敗させる
+（落ちているサイトに残りの全URLぶんタイムアウトを待たない）。
+学習した値は FEED_FETCH_LIMITS（既定 .fetch_limits.json）に保存し、次の実行の初期値にする。
+
+requests と asyncio は最初に使うときに import する（import するだけなら読み込まない）。
+"""
+from __future__ import annotations
+
+import atexit
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+from urllib.parse import urlsplit
+
+import feedwriter
+import metrics
+
+if TYPE_CHECKING:
+    import requests
+
+DEFAULT_CONCURRENCY = 8
+DEFAULT_PER_HOST = 4  # 学習値が無いホストの初期値
+DEFAULT_RATE = 8.0  # req/sec（全ホスト合計）
+CHUNK_SIZE = 64 * 1024
+DEADLINE_SLACK = 0.05  # timeout の発火の誤差（秒）
+
+# AIMD の範囲と判定
+MIN_PER_HOST = 1
+MAX_PER_HOST = DEFAULT_CONCURRENCY
+LATENCY_TOLERANCE = 2.0  # 基準レイテンシの何倍までを「横ばい」とみなすか
+BASE_MAX_DRIFT = 1.5  # 基準レイテンシが観測した最小値の何倍まで上に追従してよいか
+EWMA_ALPHA = 0.2
+THROTTLE_STATUS = (429, 503)
+DEFAULT_LIMITS_FILE = Path(".fetch_limits.json")
+
+# ホスト毎のブレーカー（実行中のみ。永続化はしない）
+BREAK_AFTER = 5
+BREAK_COOLDOWN = 60.0
+
+Consume = Callable[[Iterable[bytes]], Any]
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+
+class DeadlineExceeded(TimeoutError):
+    """デッドラインまでに開始・完了できなかったリクエスト。"""
+
+
+class HostDown(ConnectionError):
+    """ホストのブレーカーが開いているので送らなかったリクエスト。"""
+
+
+class HostLimit:
+    """
+    1ホスト分の同時実行数（AIMD）。スレッド（requests 実行側）から結果を記録し、
+    asyncio 側は current() / paused_for() を見て送出を絞る。
+    """
+
+    def __init__(
+        self, limit: float = DEFAULT_PER_HOST, base: Optional[float] = None, floor: Optional[float] = None
+    ) -> None:
+        self.limit = float(max(MIN_PER_HOST, min(MAX_PER_HOST, limit)))
+        self.base = base  # 基準レイテンシ（秒）: 直近の EWMA に少しずつ追従する
+        self.floor = floor if floor is not None else base  # 観測した EWMA の最小値
+        self.ewma: Optional[float] = None
+        self.last_cut = 0.0
+        self.paused_until = 0.0
+        self.fails = 0  # 連続失敗数（ブレーカー用）
+        self.down_until = 0.0
+        self._lock = threading.Lock()
+
+    def current(self) -> int:
+        return int(self.limit)
+
+    def paused_for(self) -> float:
+        return max(0.0, self.paused_until - time.monotonic())
+
+    def is_down(self) -> bool:
+        """ブレーカーが開いているか。COOLDOWN 後は1件だけ通して様子を見る（half-open）。"""
+        with self._lock:
+            if self.fails < BREAK_AFTER:
+                return False
+            now = time.monotonic()
+            if now < self.down_until:
+                return True
+            self.down_until = now + BREAK_COOLDOWN  # 試す1件以外は引き続き止める
+            return False
+
+    def on_failure(self) -> None:
+        with self._lock:
+            self.fails += 1
+            if self.fails >= BREAK_AFTER:
+                self.down_until = time.monotonic() + BREAK_COOLDOWN
+
+    def on_success(self, seconds: float) -> None:
+        with self._lock:
+            self.fails = 0
+            self.ewma = seconds if self.ewma is None else (
+                EWMA_ALPHA * seconds + (1 - EWMA_ALPHA) * self.ewma
+            )
+            self.floor = self.ewma if self.floor is None else min(self.floor, self.ewma)
+            # 基準はゆっくり上にも動かす（回線状況が変わったときに追従するため）。
+            # ただし最小値の BASE_MAX_DRIFT 倍まで: 少しずつ遅くなり続けるホストに
+            # 基準が付いていくと、混んでいても加算増加が止まらない
+            base = self.ewma if self.base is None else min(self.base * 1.01, self.ewma)
+            self.base = min(base, self.floor * BASE_MAX_DRIFT)
+            if self.ewma <= self.base * LATENCY_TOLERANCE:
+                self.limit = min(MAX_PER_HOST, self.limit + 1.0 / self.limit)
+
+    def on_throttle(self, retry_after: Optional[float] = None) -> None:
+        with self._lock:
+            now = time.monotonic()
+            # 同じ混雑で一斉に返ってきた失敗で何度も半減しないよう、1往復に1回まで
+            if now - self.last_cut >= (self.ewma or 1.0):
+                self.limit = max(float(MIN_PER_HOST), self.limit / 2)
+                self.last_cut = now
+            if retry_after:
+                self.paused_until = max(self.paused_until, now + retry_after)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"limit": round(self.limit, 2), "base": self.base, "floor": self.floor}
+
+
+_limits: Dict[str, HostLimit] = {}
+_limits_lock = threading.Lock()
+_limits_loaded = False
+
+
+def limits_path() -> Path:
+    return Path(os.getenv("FEED_FETCH_LIMITS", "") or DEFAULT_LIMITS_FILE)
+
+
+def _load_limits() -> None:
+    global _limits_loaded
+    _limits_loaded = True
+    atexit.register(save_limits)
+    try:
+        raw = json.loads(limits_path().read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return
+    for host, v in raw.items() if isinstance(raw, dict) else ():
+        try:
+            _limits[host] = HostLimit(float(v["limit"]), v.get("base"), v.get("floor"))
+        except (KeyError, TypeError, ValueError):
+            continue
+
+
+def host_limit(url: str) -> HostLimit:
+    """url のホストの HostLimit（初回呼び出しで前回の学習値を読み込む）。"""
+    host = urlsplit(url).netloc
+    with _limits_lock:
+        if not _limits_loaded:
+            _load_limits()
+        lim = _limits.get(host)
+        if lim is None:
+            lim = _limits[host] = HostLimit()
+        return lim
+
+
+def save_limits() -> None:
+    """学習した同時実行数を保存する（プロセス終了時にも自動で呼ばれる）。"""
+    with _limits_lock:
+        if not _limits:
+            return
+        data = {h: lim.to_dict() for h, lim in sorted(_limits.items())}
+    try:
+        feedwriter.atomic_write(limits_path(), (json.dumps(data, indent=1) + "\n").encode("utf-8"))
+    except OSError:
+        pass
+
+
+def _retry_after(r: Any) -> Optional[float]:
+    v = getattr(r, "headers", {}).get("Retry-After") if r is not None else None
+    try:
+        return float(v) if v else None
+    except ValueError:
+        return None  # HTTP-date 形式は使われていないので無視
+
+
+def _record(url: str, t0: float, r: Any = None, exc: Optional[BaseException] = None) -> None:
+    """1リクエストの結果を HostLimit に反映する。"""
+    import requests
+
+    lim = host_limit(url)
+    if exc is not None:
+        resp = getattr(exc, "response", None)
+        status = getattr(resp, "status_code", None)
+        if status in THROTTLE_STATUS:
+            lim.on_throttle(_retry_after(resp))
+        elif isinstance(exc, requests.Timeout):
+            lim.on_throttle()
+        # 404 などはホストの障害ではないのでブレーカーには数えない
+        if (status is not None and status >= 500) or isinstance(
+            exc, (requests.Timeout, requests.ConnectionError)
+        ):
+            lim.on_failure()
+        return
+    # 本文の読み込み時間は含めない（ヘッダ到着までの時間がサーバ側の混み具合に近い）
+    elapsed = getattr(r, "elapsed", None)
+    lim.on_success(elapsed.total_seconds() if elapsed is not None else time.perf_counter() - t0)
+
+
+def session() -> requests.Session:
+    """プロセス共有の Session（プールサイズは並列数に合わせる）。"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+
+            s = requests.Session()
+            adapter = HTTPAdapter(pool_connections=16, pool_maxsize=DEFAULT_CONCURRENCY * 2)
+            s.mount("https://", adapter)
+            s.mount("http://", adapter)
+            _session = s
+        return _session
+
+
+def use_async() -> bool:
+    return os.getenv("FEED_FETCH", "").strip().lower() != "sync"
+
+
+def _cap_timeout(timeout: Any, left: float) -> Any:
+    """requests の timeout（秒か (connect, read)）を残り時間 left 以下に詰める。"""
+    if isinstance(timeout, tuple):
+        return tuple(left if v is None else min(v, left) for v in timeout)
+    return left if timeout is None else min(timeout, left)
+
+
+def _deadline_hit(deadline_at: Optional[float]) -> bool:
+    # 詰めた timeout で切れたときは、ほぼちょうど deadline_at になっている
+    return deadline_at is not None and time.monotonic() >= deadline_at - DEADLINE_SLACK
+
+
+def request(
+    method: str,
+    url: str,
+    *,
+    consume: Optional[Consume] = None,
+    deadline_at: Optional[float] = None,
+    **kwargs: Any,
+) -> Any:
+    """
+    同期版。metrics に記録し、4xx/5xx は例外にする。
+    consume を渡すと本文を読み込まずにストリームで渡し、その戻り値を返す
+    （consume はバイト列チャンクのイテラブルを受け取る）。
+    deadline_at（time.monotonic() の値）を渡すと timeout をそこまでの残り時間に詰め、
+    間に合わなければ DeadlineExceeded にする（締め切りによる打ち切りはホストの混雑として学習しない）。
+    """
+    import requests
+
+    if deadline_at is not None:
+        left = deadline_at - time.monotonic()
+        if left <= 0:
+            raise DeadlineExceeded(url)
+        kwargs["timeout"] = _cap_timeout(kwargs.get("timeout"), left)
+    if host_limit(url).is_down():
+        metrics.count("host_down_skipped")
+        raise HostDown(url)
+    sess = kwargs.pop("session", None) or session()
+    t0 = time.perf_counter()
+    with metrics.request(url) as req:
+        if consume is None:
+            try:
+                r = sess.request(method, url, **kwargs)
+                req.status = r.status_code
+                req.nbytes = len(r.content)
+                r.raise_for_status()
+            except requests.RequestException as e:
+                if _deadline_hit(deadline_at):
+                    raise DeadlineExceeded(url) from e
+                _record(url, t0, exc=e)
+                raise
+            _record(url, t0, r)
+            return r
+
+        try:
+            r = sess.request(method, url, stream=True, **kwargs)
+        except requests.RequestException as e:
+            if _deadline_hit(deadline_at):
+                raise DeadlineExceeded(url) from e
+            _record(url, t0, exc=e)
+            raise
+        try:
+            req.status = r.status_code
+            try:
+                r.raise_for_status()
+            except requests.HTTPError as e:
+                _record(url, t0, exc=e)
+                raise
+            _record(url, t0, r)
+
+            def chunks() -> Iterator[bytes]:
+                try:
+                    for chunk in r.iter_content(chunk_size=CHUNK_SIZE):
+                        req.nbytes += len(chunk)
+                        yield chunk
+                        # 1回の read は timeout で切れるが、少しずつ届き続ける本文は締め切りで止める
+                        if _deadline_hit(deadline_at):
+                            raise DeadlineExceeded(url)
+                except requests.RequestException as e:
+                    if _deadline_hit(deadline_at):
+                        raise DeadlineExceeded(url) from e
+                    raise
+
+            return consume(chunks())
+        finally:
+            r.close()
+
+
+def get(url: str, **kwargs: Any) -> Any:
+    return request("GET", url, **kwargs)
+
+
+def post(url: str, **kwargs: Any) -> Any:
+    return request("POST", url, **kwargs)
+
+
+class RateLimiter:
+    """トークンバケット。rate=0 なら無制限。"""
+
+    def __init__(self, rate: float, burst: Optional[int] = None) -> None:
+        import asyncio
+
+        self.rate = rate
+        self.capacity = float(burst if burst is not None else max(1, int(rate)))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        import asyncio
+
+        if self.rate <= 0:
+            return
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class _HostGate:
+    """
+    イベントループ側のホスト毎の入口。同時実行数が HostLimit.current() に収まるまで待つ
+    （上限は結果を見て変わるので、解放のたびに待っている側が再判定する）。
+    """
+
+    def __init__(self, limit: HostLimit, cap: Optional[int]) -> None:
+        import asyncio
+
+        self.limit = limit
+        self.cap = cap
+        self.inflight = 0
+        self._changed = asyncio.Event()
+
+    def _allowed(self) -> int:
+        n = self.limit.current()
+        return min(n, self.cap) if self.cap else n
+
+    async def __aenter__(self) -> None:
+        import asyncio
+
+        while True:
+            pause = self.limit.paused_for()
+            if pause > 0:
+                await asyncio.sleep(pause)
+                continue
+            if self.inflight < self._allowed():
+                break
+            self._changed.clear()
+            await self._changed.wait()
+        self.inflight += 1
+
+    async def __aexit__(self, *exc: Any) -> None:
+        self.inflight -= 1
+        self._changed.set()
+
+
+class AsyncFetcher:
+    """
+    asyncio から requests を並列に呼ぶ取得エンジン。
+
+      max_concurrency : 全体の同時実行数（スレッド数・プールサイズ）
+      per_host        : ホスト毎の同時実行数の上限（None なら HostLimit の学習値のみ）
+      rate            : 全体のリクエスト開始レート（req/sec）
+      deadline        : 生成からの秒数。超えたら未完了のリクエストは DeadlineExceeded
+                        （実行中の requests も timeout を残り時間に詰めてあるので、
+                        スレッドが締め切りを越えて通信を続けることはない）
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = DEFAULT_CONCURRENCY,
+        per_host: Optional[int] = None,
+        rate: float = DEFAULT_RATE,
+        deadline: Optional[float] = None,
+        sess: Optional[requests.Session] = None,
+    ) -> None:
+        import asyncio
+        from concurrent.futures import ThreadPoolExecutor
+
+        self.session = sess or session()
+        self.per_host = per_host
+        self.limiter = RateLimiter(rate)
+        self.deadline_at = None if deadline is None else time.monotonic() + deadline
+        self._global = asyncio.Semaphore(max_concurrency)
+        self._hosts: Dict[str, _HostGate] = {}
+        self._pool = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="fetch")
+
+    def remaining(self) -> Optional[float]:
+        if self.deadline_at is None:
+            return None
+        return self.deadline_at - time.monotonic()
+
+    def _host_gate(self, url: str) -> _HostGate:
+        host = urlsplit(url).netloc
+        gate = self._hosts.get(host)
+        if gate is None:
+            gate = self._hosts[host] = _HostGate(host_limit(url), self.per_host)
+        return gate
+
+    async def _run(self, method: str, url: str, **kwargs: Any) -> requests.Response:
+        import asyncio
+
+        # ホストの枠を先に取る（他ホストの分まで全体の枠を握って待たないように）
+        async with self._host_gate(url), self._global:
+            await self.limiter.acquire()
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                self._pool,
+                lambda: request(method, url, session=self.session, deadline_at=self.deadline_at, **kwargs),
+            )
+
+    async def request(self, method: str, url: str, **kwargs: Any) -> requests.Response:
+        import asyncio
+
+        left = self.remaining()
+        if left is not None and left <= 0:
+            raise DeadlineExceeded(url)
+        try:
+            return await asyncio.wait_for(self._run(method, url, **kwargs), left)
+        except asyncio.TimeoutError:
+            raise DeadlineExceeded(url) from None
+
+    async def get(self, url: str, **kwargs: Any) -> requests.Response:
+        return await self.request("GET", url, **kwargs)
+
+    async def gather(self, calls: Iterable["Call"], **common: Any) -> List[Any]:
+        """calls を並列に取得。結果は入力順、失敗は例外オブジェクトのまま返す。"""
+        import asyncio
+
+        coros = []
+        for c in calls:
+            url, kw = _split_call(c)
+            coros.append(self.request(kw.pop("method", "GET"), url, **{**common, **kw}))
+        return await asyncio.gather(*coros, return_exceptions=True)
+
+    def close(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+Call = Union[str, Tuple[str, Dict[str, Any]]]
+
+
+def _split_call(c: Call) -> Tuple[str, Dict[str, Any]]:
+    if isinstance(c, str):
+        return c, {}
+    url, kw = c
+    return url, dict(kw)
+
+
+def fetch_many(
+    calls: Iterable[Call],
+    *,
+    max_concurrency: int = DEFAULT_CONCURRENCY,
+    per_host: Optional[int] = None,
+    rate: float = DEFAULT_RATE,
+    deadline: Optional[float] = None,
+    **common: Any,
+) -> List[Any]:
+    """
+    calls（URL か (URL, requests の kwargs)）をまとめて取得し、入力順に返す。
+    各要素は Response（consume 指定時はその戻り値）か、失敗時の例外オブジェクト。
+    """
+    calls = list(calls)
+    if deadline is not None and deadline <= 0:
+        # 使い切った予算は「無制限」ではない。1件も送らずに全部打ち切り扱いにする
+        return [DeadlineExceeded(_split_call(c)[0]) for c in calls]
+    if not use_async():
+        t_end = None if deadline is None else time.monotonic() + deadline
+        out: List[Any] = []
+        for c in calls:
+            url, kw = _split_call(c)
+            try:
+                out.append(request(kw.pop("method", "GET"), url, deadline_at=t_end, **{**common, **kw}))
+            except Exception as e:
+                out.append(e)
+        return out
+
+    import asyncio
+
+    async def _main() -> List[Any]:
+        f = AsyncFetcher(max_concurrency, per_host, rate, deadline)
+        try:
+            return await f.gather(calls, **common)
+        finally:
+            f.close()
+
+    return asyncio.run(_main())
@@ -0,0 +1,250 @@
+"""
+feed 内の画像をローカルにミラーする任意の段（FEED_IMAGE_MIRROR=1 で有効）。
+
+feedrender.publish() が描画の直前に呼ぶ:
+  - description の <img src> / <img data-src>（遅延読み込み）と FeedItem.image の画像を1回だけダウンロード
+    （Referer には feed の link を付ける。pixiv などは Referer が無いと弾かれる）
+  - 保存名は内容の SHA-256（content-addressed）。別URLでも同じ画像なら1ファイル
+  - Pillow があれば長辺 THUMB_SIZE px の縮小版を作り、<img src> / data-src はそちらに差し替える
+    （無ければ原寸のコピーに差し替える）
+  - 元URL -> 保存先 の対応は <dir>/index.json に残し、次回以降はダウンロードしない
+
+設定（環境変数）:
+  FEED_IMAGE_DIR       保存先（既定 images）
+  FEED_IMAGE_BASE_URL  差し替え後のURLの基点（既定は FEED_BASE_URL、無ければ相対パス）
+  FEED_IMAGE_MAX_NEW   1回の実行で新しく取りに行く最大枚数（既定 200。残りは次回）
+取得に失敗した画像は元のURLのまま残す。
+Pillow が無いと縮小版を作れず原寸のコピーを配ることになるので、新しく保存した画像が
+あればその旨を表示する（metrics の counters にも images_full_size として残る）。
+"""
+from __future__ import annotations
+
+import hashlib
+import io
+import json
+import os
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import feedwriter
+import fetch
+import metrics
+import urlrewrite
+from feeditem import FeedItem
+
+DEFAULT_DIR = "images"
+THUMB_SIZE = 480
+MAX_NEW = 200
+MAX_IMAGE_BYTES = 20 * 1024 * 1024
+DEADLINE = 120.0
+
+# <img> の src と data-src（遅延読み込み）を別々に扱う。属性の切り出しは urlrewrite と共通
+SRC_ATTRS = ("src", "data-src")
+
+_MAGIC = (
+    (b"\xff\xd8\xff", ".jpg"),
+    (b"\x89PNG\r\n\x1a\n", ".png"),
+    (b"GIF87a", ".gif"),
+    (b"GIF89a", ".gif"),
+)
+
+
+def enabled() -> bool:
+    return os.getenv("FEED_IMAGE_MIRROR", "").strip().lower() in ("1", "true", "yes", "on")
+
+
+def image_dir() -> Path:
+    return Path(os.getenv("FEED_IMAGE_DIR", "") or DEFAULT_DIR)
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return max(0, int(os.getenv(name, "") or default))
+    except ValueError:
+        return default
+
+
+def sniff_ext(data: bytes) -> Optional[str]:
+    """先頭バイトから画像形式を判定（画像でなければ None）。"""
+    for magic, ext in _MAGIC:
+        if data.startswith(magic):
+            return ext
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return ".webp"
+    return None
+
+
+def has_pillow() -> bool:
+    try:
+        import PIL  # noqa: F401  任意依存
+    except ImportError:
+        return False
+    return True
+
+
+def make_thumb(data: bytes) -> Optional[bytes]:
+    """Pillow があれば長辺 THUMB_SIZE の縮小版（JPEG / 透過ありは PNG）。小さい画像や失敗時は None。"""
+    try:
+        from PIL import Image  # 任意依存
+    except ImportError:
+        return None
+    try:
+        with Image.open(io.BytesIO(data)) as im:
+            if max(im.size) <= THUMB_SIZE:
+                return None
+            im.thumbnail((THUMB_SIZE, THUMB_SIZE))
+            buf = io.BytesIO()
+            if im.mode in ("RGBA", "LA", "P"):
+                im.save(buf, "PNG", optimize=True)
+            else:
+                im.convert("RGB").save(buf, "JPEG", quality=80, optimize=True, progressive=True)
+            return buf.getvalue()
+    except Exception:
+        return None
+
+
+class Mirror:
+    """保存先ディレクトリと index.json（元URL -> 保存した相対パス）。"""
+
+    def __init__(self, root: Path) -> None:
+        self.root = root
+        self.index_path = root / "index.json"
+        self.index: Dict[str, Dict[str, str]] = {}
+        self.dirty = False
+        try:
+            raw = json.loads(self.index_path.read_text(encoding="utf-8"))
+            if isinstance(raw, dict):
+                self.index = raw
+        except (OSError, ValueError):
+            pass
+
+    def href(self, rel: str) -> str:
+        base = (os.getenv("FEED_IMAGE_BASE_URL", "") or os.getenv("FEED_BASE_URL", "")).strip()
+        path = f"{self.root.as_posix()}/{rel}"
+        return f"{base.rstrip('/')}/{path}" if base else path
+
+    def lookup(self, url: str) -> Optional[Dict[str, str]]:
+        entry = self.index.get(url)
+        if entry and (self.root / entry["file"]).exists():
+            return entry
+        return None
+
+    def _write_once(self, rel: str, data: bytes) -> None:
+        dest = self.root / rel
+        if dest.exists():  # 同じハッシュ = 同じ内容
+            return
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        feedwriter.atomic_write(dest, data, check=False)
+
+    def add(self, url: str, data: bytes) -> Optional[Dict[str, str]]:
+        ext = sniff_ext(data)
+        if ext is None:
+            return None
+        digest = hashlib.sha256(data).hexdigest()
+        stem = f"{digest[:2]}/{digest}"
+        entry = {"sha256": digest, "file": stem + ext}
+        self._write_once(entry["file"], data)
+
+        for thumb_ext in (".jpg", ".png"):
+            if (self.root / f"{stem}.thumb{thumb_ext}").exists():
+                entry["thumb"] = f"{stem}.thumb{thumb_ext}"
+                break
+        else:
+            thumb = make_thumb(data)
+            if thumb is not None:
+                thumb_rel = f"{stem}.thumb{sniff_ext(thumb) or '.jpg'}"
+                self._write_once(thumb_rel, thumb)
+                entry["thumb"] = thumb_rel
+
+        self.index[url] = entry
+        self.dirty = True
+        return entry
+
+    def save(self) -> None:
+        if not self.dirty:
+            return
+        self.root.mkdir(parents=True, exist_ok=True)
+        # 並列に動く別のシャードが足した対応を消さないよう、今のファイルに重ねて書く
+        try:
+            current = json.loads(self.index_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            current = {}
+        if isinstance(current, dict):
+            self.index = {**current, **self.index}
+        data = json.dumps(self.index, ensure_ascii=False, indent=1, sort_keys=True) + "\n"
+        feedwriter.atomic_write(self.index_path, data.encode("utf-8"))
+        self.dirty = False
+
+
+def _image_urls(it: FeedItem) -> List[str]:
+    urls: List[str] = []
+    urlrewrite.sub_attrs(it.description, SRC_ATTRS, lambda _, v: urls.append(v.strip()), ("img",))
+    if it.image:
+        urls.append(it.image)
+    return [u for u in urls if u.startswith(("http://", "https://"))]
+
+
+def _download(urls: Sequence[str], referer: str) -> Dict[str, bytes]:
+    headers = {"User-Agent": "Mozilla/5.0 (compatible; feed-generator/1.0)"}
+    if referer:
+        headers["Referer"] = referer
+
+    def body(chunks) -> Optional[bytes]:
+        buf = bytearray()
+        for chunk in chunks:
+            buf += chunk
+            if len(buf) > MAX_IMAGE_BYTES:
+                return None
+        return bytes(buf)
+
+    out: Dict[str, bytes] = {}
+    results = fetch.fetch_many(urls, headers=headers, timeout=30, deadline=DEADLINE, consume=body)
+    for url, res in zip(urls, results):
+        if isinstance(res, (bytes, bytearray)):
+            out[url] = res
+    return out
+
+
+def mirror_items(items: Sequence[FeedItem], referer: str = "") -> None:
+    """items の画像をミラーし、description の <img src> / data-src と image を差し替える（その場で更新）。"""
+    m = Mirror(image_dir())
+
+    with metrics.stage("image_mirror"):
+        wanted: List[str] = []
+        seen = set()
+        for it in items:
+            for u in _image_urls(it):
+                if u in seen:
+                    continue
+                seen.add(u)
+                if m.lookup(u) is None:
+                    wanted.append(u)
+        metrics.cache_hit("image_index", len(seen) - len(wanted))
+        limit = _env_int("FEED_IMAGE_MAX_NEW", MAX_NEW)
+        new = wanted[:limit]
+        metrics.count("images_deferred", len(wanted) - len(new))
+
+        added = 0
+        if new:
+            for url, data in _download(new, referer).items():
+                if m.add(url, data) is not None:
+                    added += 1
+        metrics.count("images_mirrored", added)
+        if added and not has_pillow():
+            print(f"imagemirror: Pillow is not installed; {added} image(s) will be served full size")
+            metrics.count("images_full_size", added)
+        m.save()
+
+        def thumb_href(url: str) -> Optional[str]:
+            e = m.lookup(url)
+            return m.href(e.get("thumb") or e["file"]) if e else None
+
+        for it in items:
+            if it.description:
+                it.description = urlrewrite.sub_attrs(
+                    it.description, SRC_ATTRS, lambda _, v: thumb_href(v.strip()), ("img",)
+                )
+            if it.image:
+                e = m.lookup(it.image)
+                if e is not None:
+                    it.image = m.href(e["file"])
@@ -0,0 +1,164 @@
+"""
+大きな JSON レスポンスを、配列の要素単位でストリームから読み出す。
+
+    for post in jsonstream.iter_array(chunks):                  # トップレベルが配列
+        ...
+    for item in jsonstream.iter_array(chunks, ("data", "productSearch", "items")):
+        ...
+
+chunks はバイト列（または文字列）のイテラブル（requests の iter_content など）。
+目的の配列に着くまでの兄弟要素は読み捨て、配列の要素は1件ずつ json でデコードして返す。
+レスポンス全体を一度にメモリへ載せないので、要素を受け取った側で必要な項目だけ残せば
+ピークメモリは「1要素 + 読み込みバッファ」程度に収まる。
+"""
+from __future__ import annotations
+
+import codecs
+import json
+from typing import Any, Dict, Iterable, Iterator, Optional, Sequence, Union
+
+_WS = " \t\r\n"
+_NUM = frozenset("0123456789+-.eE")
+
+
+class PathNotFound(ValueError):
+    """指定したパスに配列が無かった（null だった等）。"""
+
+
+class _Reader:
+    def __init__(self, chunks: Iterable[Union[bytes, str]]) -> None:
+        self._it = iter(chunks)
+        self._utf8 = codecs.getincrementaldecoder("utf-8")()
+        self._dec = json.JSONDecoder()
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self) -> bool:
+        if self.eof:
+            return False
+        for chunk in self._it:
+            text = self._utf8.decode(chunk) if isinstance(chunk, bytes) else chunk
+            if text:
+                self.buf = self.buf[self.pos:] + text
+                self.pos = 0
+                return True
+        self.buf = self.buf[self.pos:] + self._utf8.decode(b"", final=True)
+        self.pos = 0
+        self.eof = True
+        return False
+
+    def peek(self) -> str:
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in _WS:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, ch: str) -> None:
+        got = self.peek()
+        if got != ch:
+            raise json.JSONDecodeError(f"Expecting {ch!r}", self.buf, self.pos)
+        self.pos += 1
+
+    def value(self) -> Any:
+        self.peek()
+        while True:
+            try:
+                obj, end = self._dec.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+            # 数値・リテラルは続きが次のチャンクにあるかもしれない（"-500." で切れていれば -500 と読めてしまう）
+            if (
+                not isinstance(obj, (dict, list, str))
+                and _NUM.issuperset(self.buf[end:])
+                and not self.eof
+                and self._fill()
+            ):
+                continue
+            self.pos = end
+            return obj
+
+
+def _not_found(
+    r: _Reader, path: Sequence[str], depth: int, captured: Optional[Dict[str, Any]], at_value: bool
+) -> PathNotFound:
+    """
+    path[depth] で途切れた。captured があれば、途切れた所から抜けながら残りのトップレベルの兄弟
+    （"data": null の後ろの "errors" など）を拾ってから例外を返す。
+    at_value: 途切れたのが値の位置か（False なら depth 段目のオブジェクトの閉じ括弧の前）。
+    """
+    if captured is not None:
+        try:
+            if at_value:
+                r.value()
+                _ascend(r, path[:depth], captured)
+            else:
+                _ascend(r, path[: depth + 1], captured)
+        except json.JSONDecodeError:
+            pass
+    return PathNotFound("/".join(path[: depth + 1]) or "<root>")
+
+
+def _descend(r: _Reader, path: Sequence[str], captured: Optional[Dict[str, Any]]) -> None:
+    for depth, key in enumerate(path):
+        if r.peek() != "{":
+            raise _not_found(r, path, depth, captured, at_value=True)
+        r.expect("{")
+        while True:
+            if r.peek() == "}":
+                raise _not_found(r, path, depth, captured, at_value=False)
+            k = r.value()
+            r.expect(":")
+            if k == key:
+                break
+            v = r.value()
+            if captured is not None and depth == 0:
+                captured[k] = v
+            if r.peek() == ",":
+                r.expect(",")
+
+
+def _ascend(r: _Reader, path: Sequence[str], captured: Dict[str, Any]) -> None:
+    """配列の後ろに残った兄弟を読み進め、トップレベルのものを captured に入れる。"""
+    for depth in reversed(range(len(path))):
+        while r.peek() == ",":
+            r.expect(",")
+            k = r.value()
+            r.expect(":")
+            v = r.value()
+            if depth == 0:
+                captured[k] = v
+        r.expect("}")
+
+
+def iter_array(
+    chunks: Iterable[Union[bytes, str]],
+    path: Sequence[str] = (),
+    captured: Optional[Dict[str, Any]] = None,
+) -> Iterator[Any]:
+    """
+    path（オブジェクトのキーの並び）の先にある配列の要素を順に返す。
+    captured を渡すと、読み捨てたトップレベルの兄弟（"errors" など）をそこに入れる
+    （配列より後ろにあるものも、配列を読み終えた時点で拾う）。
+    """
+    r = _Reader(chunks)
+    _descend(r, path, captured)
+    if r.peek() != "[":
+        raise _not_found(r, path, len(path), captured, at_value=True)
+    r.expect("[")
+    if r.peek() != "]":
+        while True:
+            yield r.value()
+            c = r.peek()
+            r.expect(c if c in ",]" else ",")
+            if c == "]":
+                break
+    else:
+        r.expect("]")
+    if captured is not None:
+        _ascend(r, path, captured)
@@ -1,11 +1,15 @@
 # kemono_31357565.py
 from __future__ import annotations
 
-from datetime import datetime
 from pathlib import Path
+from urllib.parse import urlsplit
 
-from feedgen.feed import FeedGenerator
-from playwright.sync_api import sync_playwright
+import browserjson
+import feedrender
+import metrics
+import profiling
+from feeditem import FeedMeta
+from kemono_api_31357565 import items_from_posts, read_page
 
 USER_ID = "31357565"
 SERVICE = "fanbox"
@@ -18,116 +22,32 @@ FEED_DESC = "kemono shine-nabyss feed"
 
 OUT = Path("feed_kemono_31357565.xml")
 
+META = FeedMeta(title=FEED_TITLE, link=URL, description=FEED_DESC)
 
-def abs_url(u: str) -> str:
-    u = (u or "").strip()
-    if not u:
-        return ""
-    if u.startswith("//"):
-        return "https:" + u
-    if u.startswith("/"):
-        return BASE + u
-    return u
+# ユーザーページが読み込む投稿一覧の API（kemono_api_31357565.py が直接叩くのと同じもの）
+POSTS_PATH = f"/api/v1/{SERVICE}/user/{USER_ID}/posts"
 
 
 def main() -> int:
-    items = []
-
-    with sync_playwright() as p:
-        browser = p.chromium.launch(headless=True)
-        page = browser.new_page()
-
-        page.goto(URL, wait_until="networkidle")
-        page.wait_for_timeout(1000)
-        page.wait_for_selector("article.post-card.post-card--preview", timeout=15000)
-
-        # あなたが提示した要素：article.post-card.post-card--preview
-        cards = page.locator("article.post-card.post-card--preview")
-        n = cards.count()
-
-        for i in range(n):
-            card = cards.nth(i)
-
-            post_id = card.get_attribute("data-id") or ""
-            if not post_id:
-                continue
-
-            a = card.locator("a.fancy-link.fancy-link--kemono").first
-            href = a.get_attribute("href") if a.count() else ""
-            link = abs_url(href or "")
-
-            title_el = card.locator("header.post-card__header").first
-            title = title_el.inner_text().strip() if title_el.count() else f"post {post_id}"
-
-            img_el = card.locator("img.post-card__image").first
-            thumb = abs_url(img_el.get_attribute("src") or "") if img_el.count() else ""
-
-            time_loc = card.locator("time.timestamp")
-            dt_raw = ""
-            date_text = ""
-
-            if time_loc.count():
-                time_el = time_loc.first
-                dt_raw = (time_el.get_attribute("datetime") or "").strip()
-                date_text = time_el.inner_text().strip()
-
-            upd_iso = dt_raw[:10] if len(dt_raw) >= 10 else ""
-
-            # description（あなた指定：画像 + タイトル + 更新日）
-            desc_lines = []
-            if thumb:
-                desc_lines.append(f'<img src="{thumb}"><br>')
-            if title:
-                desc_lines.append(title)
-            if date_text:
-                desc_lines.append("<br>")
-                desc_lines.append(f"更新: {date_text}")
-            description = "\n".join(desc_lines)
-
-            items.append(
-                {
-                    "post_id": post_id,
-                    "link": link,
-                    "thumb": thumb,
-                    "title": title,
-                    "date_text": date_text,   # ← 変更
-                    "upd_iso": upd_iso,
-                    "description": description,
-                }
-            )
-
-        browser.close()
-
-    # 新しい順に並べたいなら更新日でソート（取れないものは末尾）
-    def sort_key(x):
-        return x["upd_iso"] or "0000-00-00"
-
-    items.sort(key=sort_key, reverse=True)
-
-    fg = FeedGenerator()
-    fg.title(FEED_TITLE)
-    fg.link(href=URL, rel="alternate")
-    fg.description(FEED_DESC)
-    fg.language("ja")
-
-    for it in items:
-        fe = fg.add_entry(order="append")  # デフォルトはprepend（pixiv版と同じ）
-        fe.id(f"kemono-{SERVICE}-user-{USER_ID}-post-{it['post_id']}")
-        if it["link"]:
-            fe.link(href=it["link"])
-        fe.title(it["title"])
-        fe.description(it["description"])
-
-        # pubDate（pixiv版と同じ方針：日付が取れているときだけ入れる）
-        if it["upd_iso"]:
-            fe.pubDate(
-                datetime.fromisoformat(it["upd_iso"]).strftime("%a, %d %b %Y 00:00:00 +0900")
-            )
-
-    OUT.write_bytes(fg.rss_str(pretty=True))
-    print(f"Wrote {OUT} ({len(items)} items)")
+    # DOM（article.post-card）は読まず、ページが取りに行く posts API の JSON を横取りして
+    # API 版と同じ変換をする（ブラウザが読み込む1ページ目の分だけ）
+    with metrics.stage("fetch"):
+        # posts-legacy など別形式の API もあるので、パスは完全一致で見る
+        body = browserjson.capture(URL, lambda u: urlsplit(u).path.rstrip("/") == POSTS_PATH)
+
+    n_raw, posts = read_page([body])
+    if not n_raw:
+        # 形式が変わったときに空の feed で上書きしない
+        raise RuntimeError(f"{POSTS_PATH}: response is not a list of posts")
+    feed_items = items_from_posts(posts)
+
+    metrics.count("items", len(feed_items))
+    if feedrender.publish(OUT, META, feed_items):
+        print(f"Wrote {OUT} ({len(feed_items)} items)")
+    else:
+        print(f"No changes. {OUT} not updated.")
     return 0
 
 
 if __name__ == "__main__":
-    raise SystemExit(main())
+    raise SystemExit(profiling.run(main, OUT))
@@ -1,13 +1,21 @@
 # kemono_31357565.py (API版)
 from __future__ import annotations
 
+from dataclasses import dataclass
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Iterable, List, Optional, Tuple
 import html
 
-import requests
-from feedgen.feed import FeedGenerator
+import archive
+import feedrender
+import fetch
+import jsonstream
+import metrics
+import profiling
+import swr
+import timestamps
+from feeditem import FeedItem, FeedMeta
 
 USER_ID = "31357565"
 SERVICE = "fanbox"
@@ -19,6 +27,19 @@ FEED_TITLE = "kemono shine-nabyss"
 FEED_DESC = "kemono shine-nabyss feed"
 OUT = Path("feed_kemono_31357565.xml")
 
+META = FeedMeta(title=FEED_TITLE, link=USER_URL, description=FEED_DESC)
+
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (compatible; feed-generator/1.0)",
+    "Accept": "application/json,text/plain,*/*",
+}
+
+# だいたい50件単位が多いので最大20ページ程度で打ち切り
+MAX_PAGES = 20
+
+# feed に載せる上限（FEED_ARCHIVE=1 のときは超えた分をアーカイブページへ）
+MAX_ITEMS = 80
+
 
 def abs_url(u: str) -> str:
     u = (u or "").strip()
@@ -32,36 +53,78 @@ def abs_url(u: str) -> str:
 
 
 def parse_dt(published: Any) -> Optional[datetime]:
-    """KemonoのAPIは環境でpublishedの型が揺れることがあるので吸収する。"""
-    if published is None:
+    """KemonoのAPIは環境でpublishedの型が揺れることがあるので吸収する（数値=unix秒 / ISO文字列）。"""
+    return timestamps.parse_any(published)
+
+
+@dataclass(slots=True)
+class Post:
+    """feed に必要な項目だけを持つ投稿レコード（APIの生dictは保持しない）。"""
+
+    post_id: str
+    title: str
+    link: str
+    thumb: str
+    published: Optional[datetime]
+
+
+def post_from_api(p: Any) -> Optional[Post]:
+    if not isinstance(p, dict):
         return None
-    if isinstance(published, (int, float)):
-        # unix epoch seconds 想定
-        return datetime.fromtimestamp(float(published), tz=timezone.utc)
-    if isinstance(published, str):
-        s = published.strip()
-        # ISOっぽい文字列を想定
-        try:
-            return datetime.fromisoformat(s.replace("Z", "+00:00")).astimezone(timezone.utc)
-        except Exception:
-            return None
-    return None
+    post_id = str(p.get("id") or p.get("post_id") or "").strip()
+    if not post_id:
+        return None
+
+    title = (p.get("title") or f"post {post_id}").strip()
 
+    # 投稿ページURL（HTML側のURL）
+    link = abs_url(p.get("url") or f"/{SERVICE}/user/{USER_ID}/post/{post_id}")
 
-def fetch_posts() -> List[Dict[str, Any]]:
+    # サムネ候補（よくあるキーを順に試す）
+    thumb = ""
+    for k in ("thumb", "thumbnail", "file", "preview", "cover"):
+        v = p.get(k)
+        if isinstance(v, str) and v.strip():
+            thumb = abs_url(v)
+            break
+    # file が dict で来るケースもある
+    if not thumb and isinstance(p.get("file"), dict):
+        v = p["file"].get("path") or p["file"].get("url")
+        if isinstance(v, str) and v.strip():
+            thumb = abs_url(v)
+
+    published = parse_dt(p.get("published") or p.get("added"))
+    return Post(post_id, title, link, thumb, published)
+
+
+def read_page(chunks: Iterable[bytes]) -> Tuple[int, List[Post]]:
+    """
+    1ページ分のレスポンスをストリームで読み、要素ごとに Post へ変換する。
+    戻り値は (APIが返した件数, posts)。配列でなければ (0, [])。
+    """
+    n = 0
+    posts: List[Post] = []
+    try:
+        for p in jsonstream.iter_array(chunks):
+            n += 1
+            post = post_from_api(p)
+            if post is not None:
+                posts.append(post)
+    except jsonstream.PathNotFound:
+        return 0, []
+    return n, posts
+
+
+def fetch_posts() -> List[Post]:
     """
     Kemonoの一般的なAPIパターン:
       /api/v1/{service}/user/{user_id}/posts?o=0
     ただし、環境差があるので複数パターンを試す。
+    1ページ目でページサイズを確定し、以降のページはまとめて並列に取る。
+    まとめる件数は fetch が学習したホストの同時実行数（AIMD）に合わせる
+    （429 が返れば次の窓から小さくなる。取り過ぎても空ページが返るだけ）。
+    各ページはレスポンスをストリームで読みながら Post に変換する（生のJSON全体は持たない）。
     """
-    session = requests.Session()
-    session.headers.update(
-        {
-            "User-Agent": "Mozilla/5.0 (compatible; feed-generator/1.0)",
-            "Accept": "application/json,text/plain,*/*",
-        }
-    )
-
     candidates = [
         (f"{BASE}/api/v1/{SERVICE}/user/{USER_ID}/posts", "o"),  # offset param o
         (f"{BASE}/api/v1/{SERVICE}/user/{USER_ID}/posts", "offset"),
@@ -70,104 +133,101 @@ def fetch_posts() -> List[Dict[str, Any]]:
     last_err = None
     for url, offset_key in candidates:
         try:
-            all_posts: List[Dict[str, Any]] = []
-            offset = 0
-            # だいたい50件単位が多いので最大20ページ程度で打ち切り
-            for _ in range(20):
-                r = session.get(url, params={offset_key: offset}, timeout=30)
-                r.raise_for_status()
-                data = r.json()
-                if not isinstance(data, list) or not data:
-                    break
-                all_posts.extend(data)
-                offset += len(data)
-            if all_posts:
-                return all_posts
+            page_size, all_posts = fetch.get(
+                url, params={offset_key: 0}, headers=HEADERS, timeout=30, consume=read_page
+            )
+            if not page_size:
+                continue
+
+            page = 1
+            done = False
+            while page < MAX_PAGES and not done:
+                n = min(fetch.host_limit(url).current(), MAX_PAGES - page)
+                calls = [
+                    (url, {"params": {offset_key: page_size * (page + i)}}) for i in range(n)
+                ]
+                pages = fetch.fetch_many(calls, headers=HEADERS, timeout=30, consume=read_page)
+                for res in pages:
+                    if isinstance(res, Exception):
+                        raise res
+                    n_raw, posts = res
+                    if not n_raw:
+                        done = True
+                        break
+                    all_posts.extend(posts)
+                    if n_raw < page_size:
+                        done = True
+                        break
+                page += n
+            return all_posts
         except Exception as e:
+            if not swr.is_outage(e):
+                raise
             last_err = e
 
-    # ここまで来たらAPIが取れなかった。feed全体を落とすかは運用次第。
-    # 今回は「他のfeedもある」ので、kemonoだけスキップできるようにする。
-    print("Kemono API fetch failed. Skipping kemono this run.")
-    if last_err:
-        print("Last error:", repr(last_err))
-    return []
+    # ここまで来たらAPIが取れなかった。空の feed で上書きしないよう例外にして、
+    # swr.run に前回成功時の items で出し直してもらう。
+    raise swr.SourceError(f"Kemono API fetch failed: {last_err!r}") from last_err
 
 
-def main() -> int:
-    posts = fetch_posts()
-
-    # 新しい順に並べたい：published（取れないなら末尾）
-    def sort_key(p: Dict[str, Any]) -> str:
-        dt = parse_dt(p.get("published") or p.get("added"))
-        return dt.isoformat() if dt else "0000-00-00T00:00:00+00:00"
+def build_items() -> List[FeedItem]:
+    with metrics.stage("fetch"):
+        posts = fetch_posts()
+    return items_from_posts(posts)
 
-    posts.sort(key=sort_key, reverse=True)
 
-    fg = FeedGenerator()
-    fg.title(FEED_TITLE)
-    fg.link(href=USER_URL, rel="alternate")
-    fg.description(FEED_DESC)
-    fg.language("ja")
+def items_from_posts(posts: List[Post]) -> List[FeedItem]:
+    """Post を新しい順の FeedItem にする（Playwright 版の kemono_31357565.py も使う）。"""
+    # 新しい順に並べたい：published（取れないなら末尾）
+    oldest = datetime.min.replace(tzinfo=timezone.utc)
+    posts.sort(key=lambda p: p.published or oldest, reverse=True)
 
     # 多すぎると重いので上限（必要なら調整）
-    for p in posts[:80]:
-        post_id = str(p.get("id") or p.get("post_id") or "").strip()
-        if not post_id:
-            continue
-
-        title = (p.get("title") or f"post {post_id}").strip()
-
-        # 投稿ページURL（HTML側のURL）
-        link = abs_url(p.get("url") or f"/{SERVICE}/user/{USER_ID}/post/{post_id}")
-
-        # サムネ候補（よくあるキーを順に試す）
-        thumb = ""
-        for k in ("thumb", "thumbnail", "file", "preview", "cover"):
-            v = p.get(k)
-            if isinstance(v, str) and v.strip():
-                thumb = abs_url(v)
-                break
-        # file が dict で来るケースもある
-        if not thumb and isinstance(p.get("file"), dict):
-            v = p["file"].get("path") or p["file"].get("url")
-            if isinstance(v, str) and v.strip():
-                thumb = abs_url(v)
-
-        dt = parse_dt(p.get("published") or p.get("added"))
+    # アーカイブ出力時は古い投稿もアーカイブページに回すので全件
+    items: List[FeedItem] = []
+    for p in (posts if archive.enabled() else posts[:MAX_ITEMS]):
         date_text = ""
-        if dt:
+        if p.published:
             # 表示用（JST）
-            date_text = dt.astimezone(timezone.utc).astimezone(
+            date_text = p.published.astimezone(timezone.utc).astimezone(
                 timezone(datetime.now().astimezone().utcoffset())
             ).strftime("%Y-%m-%d %H:%M")
 
         # description（あなたの現行と同趣旨：画像 + タイトル + 更新日）
         desc_lines = []
-        if thumb:
-            desc_lines.append(f'<img src="{html.escape(thumb)}"><br>')
-        if title:
-            desc_lines.append(html.escape(title))
+        if p.thumb:
+            desc_lines.append(f'<img src="{html.escape(p.thumb)}"><br>')
+        if p.title:
+            desc_lines.append(html.escape(p.title))
         if date_text:
             desc_lines.append("<br>")
             desc_lines.append(f"更新: {html.escape(date_text)}")
         description = "\n".join(desc_lines)
 
-        fe = fg.add_entry(order="append")
-        fe.id(f"kemono-{SERVICE}-user-{USER_ID}-post-{post_id}")
-        if link:
-            fe.link(href=link)
-        fe.title(title)
-        fe.description(description)
+        items.append(
+            FeedItem(
+                guid=f"kemono-{SERVICE}-user-{USER_ID}-post-{p.post_id}",
+                title=p.title,
+                link=p.link,
+                description=description,
+                published=p.published,
+                image=p.thumb,
+            )
+        )
+    return items
 
-        if dt:
-            # RSSのpubDate（UTCでもいいが、見た目優先なら+0900固定でもOK）
-            fe.pubDate(dt.strftime("%a, %d %b %Y %H:%M:%S +0000"))
 
-    OUT.write_bytes(fg.rss_str(pretty=True))
-    print(f"Wrote {OUT} ({min(len(posts),80)} items)")
+def main() -> int:
+    # API が落ちていたら前回成功時の items で出し直す（feed を空で上書きしない）
+    items = swr.run(OUT, build_items)
+
+    metrics.count("items", len(items))
+    if feedrender.publish(OUT, META, items):
+        print(f"Wrote {OUT} ({min(len(items),MAX_ITEMS)} items)")
+    else:
+        print(f"No changes. {OUT} not updated.")
     return 0
 
 
 if __name__ == "__main__":
-    raise SystemExit(main())
+    raise SystemExit(profiling.run(main, OUT))
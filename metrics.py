@@ -0,0 +1,209 @@
+"""
+feed生成の計測レイヤー。
+
+  - stage(name)   : with で囲んだ区間の所要時間を記録
+  - timed(name)   : 関数デコレータ版の stage
+  - request(url)  : HTTPリクエスト1回分（件数・バイト数・レイテンシ）
+  - cache_hit(kind): 取得や書き出しを前回の結果で済ませた回数（キャッシュヒット）
+                    swr の前回 items での配信、変化なしで feed を書かなかった回など
+  - count(name)   : 任意のカウンタ
+
+実行後に write_report() で JSON のランレポートを出力する。
+出力は環境変数 FEED_METRICS が設定されているときだけ:
+  FEED_METRICS=1      -> feed と同じ場所に <feed>.metrics.json
+  FEED_METRICS=<dir>  -> <dir>/<feed>.metrics.json
+"""
+from __future__ import annotations
+
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional
+from urllib.parse import urlsplit
+
+
+def percentile(values: List[float], q: float) -> float:
+    """最近傍法のパーセンタイル（q は 0-100）。"""
+    if not values:
+        return 0.0
+    s = sorted(values)
+    k = max(0, min(len(s) - 1, int(round(q / 100.0 * (len(s) - 1)))))
+    return s[k]
+
+
+class RequestRecord:
+    """request() の with ブロック内で呼び出し側が埋める値。"""
+
+    __slots__ = ("url", "status", "nbytes", "error")
+
+    def __init__(self, url: str) -> None:
+        self.url = url
+        self.status: Optional[int] = None
+        self.nbytes = 0
+        self.error = False
+
+
+class Metrics:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.started_at = datetime.now(timezone.utc)
+        self._t0 = time.perf_counter()
+        self.stages: Dict[str, List[float]] = {}
+        self.counters: Dict[str, int] = {}
+        self.cache_hits: Dict[str, int] = {}
+        self.requests: List[tuple] = []  # (host, seconds, nbytes, error, status)
+
+    def reset(self) -> None:
+        """常駐プロセス（scheduler.py）で1回分のビルドごとに計測をやり直す。"""
+        with self._lock:
+            self.started_at = datetime.now(timezone.utc)
+            self._t0 = time.perf_counter()
+            self.stages = {}
+            self.counters = {}
+            self.cache_hits = {}
+            self.requests = []
+
+    # ---- 記録 ----
+
+    def add_stage(self, name: str, seconds: float) -> None:
+        with self._lock:
+            self.stages.setdefault(name, []).append(seconds)
+
+    def take_stages(self) -> Dict[str, List[float]]:
+        """記録済みの stage を取り出して空にする（プロセスプールのワーカーから親へ返す用）。"""
+        with self._lock:
+            stages, self.stages = self.stages, {}
+        return stages
+
+    def merge_stages(self, stages: Dict[str, List[float]]) -> None:
+        with self._lock:
+            for name, secs in stages.items():
+                self.stages.setdefault(name, []).extend(secs)
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_stage(name, time.perf_counter() - t0)
+
+    def timed(self, name: str) -> Callable:
+        def deco(fn: Callable) -> Callable:
+            @functools.wraps(fn)
+            def wrapper(*args: Any, **kwargs: Any) -> Any:
+                with self.stage(name):
+                    return fn(*args, **kwargs)
+
+            return wrapper
+
+        return deco
+
+    def count(self, name: str, n: int = 1) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def cache_hit(self, kind: str, n: int = 1) -> None:
+        with self._lock:
+            self.cache_hits[kind] = self.cache_hits.get(kind, 0) + n
+
+    @contextmanager
+    def request(self, url: str) -> Iterator[RequestRecord]:
+        rec = RequestRecord(url)
+        t0 = time.perf_counter()
+        try:
+            yield rec
+        except BaseException:
+            rec.error = True
+            raise
+        finally:
+            self.add_request(rec, time.perf_counter() - t0)
+
+    def add_request(self, rec: RequestRecord, seconds: float) -> None:
+        host = urlsplit(rec.url).netloc or "-"
+        with self._lock:
+            self.requests.append((host, seconds, rec.nbytes, rec.error, rec.status))
+
+    # ---- 集計 ----
+
+    @staticmethod
+    def _summarize_requests(rows: List[tuple]) -> Dict[str, Any]:
+        lat = [r[1] * 1000.0 for r in rows]
+        return {
+            "count": len(rows),
+            "errors": sum(1 for r in rows if r[3]),
+            "bytes": sum(r[2] for r in rows),
+            "latency_ms": {
+                "p50": round(percentile(lat, 50), 1),
+                "p90": round(percentile(lat, 90), 1),
+                "p99": round(percentile(lat, 99), 1),
+                "max": round(max(lat), 1) if lat else 0.0,
+            },
+        }
+
+    def report(self, name: str = "") -> Dict[str, Any]:
+        with self._lock:
+            stages = {k: list(v) for k, v in self.stages.items()}
+            counters = dict(self.counters)
+            hits = dict(self.cache_hits)
+            rows = list(self.requests)
+
+        by_host: Dict[str, List[tuple]] = {}
+        for r in rows:
+            by_host.setdefault(r[0], []).append(r)
+
+        req = self._summarize_requests(rows)
+        req["by_host"] = {h: self._summarize_requests(v) for h, v in sorted(by_host.items())}
+
+        return {
+            "feed": name,
+            "started_at": self.started_at.isoformat(),
+            "total_seconds": round(time.perf_counter() - self._t0, 3),
+            "stages": {
+                k: {
+                    "calls": len(v),
+                    "total_seconds": round(sum(v), 3),
+                    "max_seconds": round(max(v), 3),
+                }
+                for k, v in stages.items()
+            },
+            "requests": req,
+            "cache_hits": {"total": sum(hits.values()), "by_kind": dict(sorted(hits.items()))},
+            "counters": counters,
+        }
+
+    def write_report(self, out_path: Any, target: Optional[str] = None) -> Optional[Path]:
+        """FEED_METRICS（または target）が指定されていればレポートを書き出す。"""
+        target = target if target is not None else os.getenv("FEED_METRICS", "")
+        if not target:
+            return None
+        out = Path(out_path)
+        if target == "1":
+            dest = out.with_name(out.name + ".metrics.json")
+        else:
+            dest = Path(target) / (out.name + ".metrics.json")
+            dest.parent.mkdir(parents=True, exist_ok=True)
+        dest.write_text(
+            json.dumps(self.report(out.name), ensure_ascii=False, indent=2) + "\n",
+            encoding="utf-8",
+        )
+        return dest
+
+
+# プロセス全体で共有する既定インスタンス
+METRICS = Metrics()
+
+stage = METRICS.stage
+timed = METRICS.timed
+count = METRICS.count
+cache_hit = METRICS.cache_hit
+request = METRICS.request
+write_report = METRICS.write_report
+reset = METRICS.reset
+take_stages = METRICS.take_stages
+merge_stages = METRICS.merge_stages
@@ -0,0 +1,62 @@
+"""
+「次に実行すると意味がある時刻」を feed の横に残す。
+
+    nextrun.record(OUT, next_release)   # generator 側: API で見えた次回公開予定
+    nextrun.next_run_at(OUT)            # scheduler / workflow 側: 次に回すべき時刻（無ければ None）
+
+<feed>.schedule.json に次回公開予定（next_release）と、その少し後の
+実行推奨時刻（next_run = next_release + RELEASE_GRACE）を書く。
+公開直後は API への反映が遅れることがあるので、GRACE の分だけ後ろにずらす。
+予定が見えなかった実行ではファイルを消す（古い予定で起こさないように）。
+"""
+from __future__ import annotations
+
+import json
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Optional
+
+import feedwriter
+import timestamps
+
+RELEASE_GRACE = timedelta(minutes=10)
+
+
+def path(out: Any) -> Path:
+    out = Path(out)
+    return out.with_name(out.name + ".schedule.json")
+
+
+def record(out: Any, next_release: Optional[datetime], now: Optional[datetime] = None) -> None:
+    p = path(out)
+    if next_release is None:
+        p.unlink(missing_ok=True)
+        return
+    now = now or datetime.now(timezone.utc)
+    doc = {
+        "checked_at": now.astimezone(timezone.utc).isoformat(),
+        "next_release": next_release.astimezone(timezone.utc).isoformat(),
+        "next_run": (next_release + RELEASE_GRACE).astimezone(timezone.utc).isoformat(),
+    }
+    data = (json.dumps(doc, indent=2) + "\n").encode("utf-8")
+    if p.exists() and _same_schedule(p.read_bytes(), doc):
+        return
+    feedwriter.atomic_write(p, data)
+
+
+def _same_schedule(old: bytes, doc: dict) -> bool:
+    # checked_at だけの違いでは書き換えない
+    try:
+        prev = json.loads(old)
+    except ValueError:
+        return False
+    return prev.get("next_release") == doc["next_release"]
+
+
+def next_run_at(out: Any) -> Optional[datetime]:
+    p = path(out)
+    try:
+        doc = json.loads(p.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    return timestamps.parse_iso(doc.get("next_run") or "")
@@ -2,12 +2,18 @@ from __future__ import annotations
 
 import json
 import os
+from dataclasses import dataclass
 from pathlib import Path
+from typing import Iterable, Optional
 from urllib.parse import urljoin
-import xml.etree.ElementTree as ET
 
-import requests
-from feedgen.feed import FeedGenerator
+import feedrender
+import fetch
+import jsonstream
+import metrics
+import profiling
+import swr
+from feeditem import FeedItem, FeedMeta
 
 
 # =========================
@@ -30,12 +36,16 @@ OUT_XML = Path("feed_onitsuka.xml")
 FEED_TITLE = "Onitsuka Tiger"
 FEED_DESC = "Auto-generated feed via Onitsuka Tiger GraphQL API"
 
+META = FeedMeta(title=FEED_TITLE, link=LIST_URL, description=FEED_DESC)
+
 GRAPHQL_ENDPOINT = "https://catalog-service.adobe.io/graphql"
 
 
 # =========================
-# 環境変数（GitHub Actions Secrets）チェック
+# 環境変数（GitHub Actions Secrets）
 # =========================
+# import 時には読まず、main() の実行時に build_headers() / build_variables() で解決する
+# （secrets が無い環境でも import だけはできるように）
 
 REQUIRED_ENVS = [
     "OT_X_API_KEY",
@@ -44,28 +54,34 @@ REQUIRED_ENVS = [
     "OT_MAGENTO_STORE_CODE",
     "OT_MAGENTO_STORE_VIEW_CODE",
 ]
-missing = [k for k in REQUIRED_ENVS if not os.getenv(k)]
-if missing:
-    raise RuntimeError(
-        "Missing required env vars: "
-        + ", ".join(missing)
-        + " (GitHub Actions: pass secrets via step env: ...)"
-    )
 
-HEADERS = {
-    "Content-Type": "application/json",
-    "Accept": "application/json",
-    "Origin": "https://www.onitsukatiger.com",
-    "X-Api-Key": os.getenv("OT_X_API_KEY", ""),
-    "Magento-Environment-Id": os.getenv("OT_MAGENTO_ENV_ID", ""),
-    "Magento-Website-Code": os.getenv("OT_MAGENTO_WEBSITE_CODE", ""),
-    "Magento-Store-Code": os.getenv("OT_MAGENTO_STORE_CODE", ""),
-    "Magento-Store-View-Code": os.getenv("OT_MAGENTO_STORE_VIEW_CODE", ""),
-}
+DEFAULT_CUSTOMER_GROUP = "b6589fc6ab0dc82cf12099d1c2d40ab994e8410c"
+
+
+def build_headers() -> dict:
+    missing = [k for k in REQUIRED_ENVS if not os.getenv(k)]
+    if missing:
+        raise RuntimeError(
+            "Missing required env vars: "
+            + ", ".join(missing)
+            + " (GitHub Actions: pass secrets via step env: ...)"
+        )
+
+    headers = {
+        "Content-Type": "application/json",
+        "Accept": "application/json",
+        "Origin": "https://www.onitsukatiger.com",
+        "X-Api-Key": os.getenv("OT_X_API_KEY", ""),
+        "Magento-Environment-Id": os.getenv("OT_MAGENTO_ENV_ID", ""),
+        "Magento-Website-Code": os.getenv("OT_MAGENTO_WEBSITE_CODE", ""),
+        "Magento-Store-Code": os.getenv("OT_MAGENTO_STORE_CODE", ""),
+        "Magento-Store-View-Code": os.getenv("OT_MAGENTO_STORE_VIEW_CODE", ""),
+    }
 
-# 任意（あれば使う）
-if os.getenv("OT_MAGENTO_CUSTOMER_GROUP"):
-    HEADERS["Magento-Customer-Group"] = os.getenv("OT_MAGENTO_CUSTOMER_GROUP", "")
+    # 任意（あれば使う）
+    if os.getenv("OT_MAGENTO_CUSTOMER_GROUP"):
+        headers["Magento-Customer-Group"] = os.getenv("OT_MAGENTO_CUSTOMER_GROUP", "")
+    return headers
 
 
 # =========================
@@ -113,32 +129,30 @@ query productSearch(
 }
 """
 
-VARIABLES = {
-    "phrase": "",
-    "pageSize": 80,   # 33件なら十分、増えても余裕
-    "currentPage": 1,
-    "filter": [
-        {
-            "attribute": "model",
-            "in": [
-                "MEXICO Mid Runner",
-                "MEXICO MID RUNNER DELUXE",
-                "SERRANO",
-                "SERRANO CL",
-            ],
+def build_variables() -> dict:
+    return {
+        "phrase": "",
+        "pageSize": 80,   # 33件なら十分、増えても余裕
+        "currentPage": 1,
+        "filter": [
+            {
+                "attribute": "model",
+                "in": [
+                    "MEXICO Mid Runner",
+                    "MEXICO MID RUNNER DELUXE",
+                    "SERRANO",
+                    "SERRANO CL",
+                ],
+            },
+            {"attribute": "categoryPath", "eq": "store/all/shoes/sneakers"},
+            {"attribute": "visibility", "in": ["Catalog", "Catalog, Search"]},
+        ],
+        "sort": [{"attribute": "newest_first", "direction": "DESC"}],
+        "context": {
+            "customerGroup": os.getenv("OT_MAGENTO_CUSTOMER_GROUP", DEFAULT_CUSTOMER_GROUP),
+            "userViewHistory": [],
         },
-        {"attribute": "categoryPath", "eq": "store/all/shoes/sneakers"},
-        {"attribute": "visibility", "in": ["Catalog", "Catalog, Search"]},
-    ],
-    "sort": [{"attribute": "newest_first", "direction": "DESC"}],
-    "context": {
-        "customerGroup": os.getenv(
-            "OT_MAGENTO_CUSTOMER_GROUP",
-            "b6589fc6ab0dc82cf12099d1c2d40ab994e8410c",
-        ),
-        "userViewHistory": [],
-    },
-}
+    }
 
 
 # =========================
@@ -168,79 +182,100 @@ def newest_first_key(item: dict) -> int:
     return -10**18
 
 
-def load_existing_guids(path: Path) -> list[str]:
-    """前回XMLの item/guid を読み取り、同一なら書き換えない"""
-    if not path.exists():
-        return []
-    try:
-        tree = ET.parse(path)
-        root = tree.getroot()
-    except Exception:
-        return []
-
-    guids: list[str] = []
-    for elem in root.iter():
-        if not elem.tag.endswith("item"):
-            continue
-        guid = None
-        for c in list(elem):
-            if c.tag.endswith("guid"):
-                guid = (c.text or "").strip()
-                break
-        if guid:
-            guids.append(guid)
-    return guids
-
-
 # =========================
 # Core
 # =========================
 
-def fetch_items() -> list[dict]:
-    resp = requests.post(
+@dataclass(slots=True)
+class Product:
+    """feed に必要な項目だけの商品レコード（GraphQL の生dictは保持しない）"""
+
+    sku: str
+    name: str
+    link: str
+    image: str
+    price: Optional[float]
+    currency: str
+    newest: int
+
+
+def product_from_api(item: dict) -> Optional[Product]:
+    p = item.get("product") or {}
+    sku = (p.get("sku") or "").strip()
+    if not sku:
+        return None
+
+    price = (
+        (p.get("price_range") or {})
+        .get("minimum_price", {})
+        .get("final_price", {})
+    )
+    price_val = price.get("value")
+    return Product(
+        sku=sku,
+        name=(p.get("name") or sku).strip(),
+        link=fix_url(p.get("canonical_url") or ""),
+        image=fix_url((p.get("image") or {}).get("url") or ""),
+        price=price_val if isinstance(price_val, (int, float)) else None,
+        currency=price.get("currency") or "JPY",
+        newest=newest_first_key(item),
+    )
+
+
+def read_products(chunks: Iterable[bytes]) -> list[Product]:
+    """
+    GraphQL レスポンスを data.productSearch.items の要素単位でストリームから読み、
+    Product（必要な項目だけ）に変換する。
+    """
+    captured: dict = {}
+    products = []
+    try:
+        for it in jsonstream.iter_array(chunks, ("data", "productSearch", "items"), captured):
+            prod = product_from_api(it)
+            if prod is not None:
+                products.append(prod)
+    except jsonstream.PathNotFound:
+        if "errors" not in captured:
+            raise
+    if "errors" in captured:
+        raise RuntimeError("GraphQL errors: " + json.dumps(captured["errors"], ensure_ascii=False))
+    return products
+
+
+def fetch_items(headers: dict, variables: dict) -> list[Product]:
+    products = fetch.post(
         GRAPHQL_ENDPOINT,
-        headers=HEADERS,
-        json={"query": QUERY, "variables": VARIABLES},
+        headers=headers,
+        json={"query": QUERY, "variables": variables},
         timeout=40,
+        consume=read_products,
     )
-    resp.raise_for_status()
-    data = resp.json()
+    products.sort(key=lambda x: x.newest, reverse=True)
+    return products
 
-    if "errors" in data:
-        raise RuntimeError("GraphQL errors: " + json.dumps(data["errors"], ensure_ascii=False))
 
-    items = data["data"]["productSearch"]["items"]
-    items.sort(key=newest_first_key, reverse=True)
-    return items
+def build_items(headers: dict, variables: dict) -> list[FeedItem]:
+    with metrics.stage("fetch"):
+        items = fetch_items(headers, variables)
+    return rows_from_products(items)
 
 
-def main() -> None:
-    items = fetch_items()
-
-    feed_rows = []
+def rows_from_products(items: list[Product]) -> list[FeedItem]:
+    """Product（新しい順）から FeedItem を作る。同じ商品ページへのリンクは1件にまとめる。"""
+    feed_rows: list[FeedItem] = []
     seen = set()
 
-    for it in items:
-        p = it.get("product") or {}
-        sku = (p.get("sku") or "").strip()
-        if not sku:
-            continue
-
-        link = fix_url(p.get("canonical_url") or "")
+    for p in items:
+        link = p.link
         if not link or link in seen:
             continue
         seen.add(link)
 
-        name = (p.get("name") or sku).strip()
-        img = fix_url((p.get("image") or {}).get("url") or "")
-
-        price = (
-            (p.get("price_range") or {})
-            .get("minimum_price", {})
-            .get("final_price", {})
-        )
-        price_val = price.get("value")
-        currency = price.get("currency") or "JPY"
+        sku = p.sku
+        name = p.name
+        img = p.image
+        price_val = p.price
+        currency = p.currency
 
         # ===== ここが要望反映ポイント =====
         # TITLE：価格なし
@@ -259,37 +294,38 @@ def main() -> None:
         # ===== ここまで =====
 
         feed_rows.append(
-            {
-                "guid": sku,    # GUIDはSKU固定（更新判定が安定）
-                "title": title,
-                "link": link,
-                "desc": desc,
-            }
+            FeedItem(
+                guid=sku,    # GUIDはSKU固定（更新判定が安定）
+                title=title,
+                link=link,
+                description=desc,
+                image=img,
+            )
         )
+    return feed_rows
+
 
-    old_guids = load_existing_guids(OUT_XML)
-    new_guids = [r["guid"] for r in feed_rows]
-    if old_guids == new_guids:
+def main() -> None:
+    # 設定（secrets）は取得の前に検証する。足りなければ障害扱いにせずここで落とす
+    headers = build_headers()
+    variables = build_variables()
+    feed_rows = swr.run(OUT_XML, lambda: build_items(headers, variables))
+
+    metrics.count("items", len(feed_rows))
+
+    # 前回の feed を件数 +1 件まで流し読みして、内容も出力一式も変わらなければ描画しない
+    # （Atom / JSON / 圧縮版が欠けている・hub の設定が変わったときは publish に進む）
+    with metrics.stage("load_existing"):
+        same = feedrender.unchanged(OUT_XML, feed_rows)
+    if same:
         print("No changes. feed_onitsuka.xml not updated.")
         return
 
-    fg = FeedGenerator()
-    fg.title(FEED_TITLE)
-    fg.link(href=LIST_URL, rel="alternate")
-    fg.description(FEED_DESC)
-    fg.language("ja")
-
-    for r in feed_rows:
-        fe = fg.add_entry(order="append")
-        fe.id(r["guid"])
-        fe.guid(r["guid"], permalink=False)
-        fe.title(r["title"])
-        fe.link(href=r["link"])
-        fe.description(r["desc"])
-
-    OUT_XML.write_bytes(fg.rss_str(pretty=True))
-    print("feed_onitsuka.xml updated.")
+    if feedrender.publish(OUT_XML, META, feed_rows):
+        print("feed_onitsuka.xml updated.")
+    else:
+        print("No changes. feed_onitsuka.xml not updated.")
 
 
 if __name__ == "__main__":
-    main()
+    raise SystemExit(profiling.run(main, OUT_XML))
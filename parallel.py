@@ -0,0 +1,76 @@
+"""
+CPUバウンドな処理（HTMLパースなど）をプロセスプールに分散するヘルパ。
+
+    results = parallel.pmap(parse_post_description, [(url, html), ...])
+
+結果は入力順。件数が MIN_BATCH 未満、または使えるコアが1つなら
+プールを立てずに同じプロセスで処理する（起動とIPCのコストの方が大きいため）。
+ワーカー数は FEED_PARSE_WORKERS で上書きできる（1 で常に in-process）。
+プールで動かした fn の中で記録された metrics の stage（@metrics.timed など）は
+結果と一緒に親プロセスへ返して合算する（ワーカー側に置き去りにしない）。
+ワーカーは fork ではなく forkserver（無い環境では spawn）で起動する。pmap の時点で
+fetch のスレッドプールのスレッドがまだ残っていることがあり、スレッドのいるプロセスを
+fork するとロックを握ったままの子ができてデッドロックしうる（3.12 以降は警告も出る）。
+"""
+from __future__ import annotations
+
+import os
+from functools import partial
+from typing import Any, Callable, List, Optional, Sequence
+
+import metrics
+
+# 1件あたり数ms程度のパースなら、これ未満はプールを使わない方が速い
+MIN_BATCH = 16
+
+
+def available_cpus() -> int:
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def worker_count(n_items: int, max_workers: Optional[int] = None) -> int:
+    env = os.getenv("FEED_PARSE_WORKERS", "").strip()
+    if env.isdigit():
+        max_workers = int(env)
+    if max_workers is None:
+        max_workers = available_cpus()
+    return max(1, min(max_workers, n_items))
+
+
+def _measured(fn: Callable[..., Any], *args: Any) -> tuple:
+    """ワーカー側: fn(*args) の結果と、その呼び出しで記録された stage を返す。"""
+    metrics.take_stages()  # 前の呼び出しで残った分は捨てる
+    return fn(*args), metrics.take_stages()
+
+
+def mp_context() -> Any:
+    import multiprocessing
+
+    method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    return multiprocessing.get_context(method)
+
+
+def pmap(
+    fn: Callable[..., Any],
+    args_list: Sequence[tuple],
+    *,
+    min_batch: int = MIN_BATCH,
+    max_workers: Optional[int] = None,
+) -> List[Any]:
+    """fn(*args) を args_list の各要素に適用する。fn はモジュールトップレベルの関数であること。"""
+    n = len(args_list)
+    workers = worker_count(n, max_workers)
+    if n < min_batch or workers <= 1:
+        return [fn(*a) for a in args_list]
+
+    from concurrent.futures import ProcessPoolExecutor  # multiprocessing は使うときだけ読み込む
+
+    chunksize = max(1, n // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers, mp_context=mp_context()) as ex:
+        results = list(ex.map(partial(_measured, fn), *zip(*args_list), chunksize=chunksize))
+    for _, stages in results:
+        metrics.merge_stages(stages)
+    return [r for r, _ in results]
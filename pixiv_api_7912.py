@@ -1,10 +1,17 @@
 from __future__ import annotations
 
-from datetime import datetime, timedelta, timezone
+from datetime import datetime, timezone
 from pathlib import Path
+from typing import Optional
 
-import requests
-from feedgen.feed import FeedGenerator
+import feedrender
+import fetch
+import metrics
+import nextrun
+import profiling
+import swr
+import timestamps
+from feeditem import FeedItem, FeedMeta
 
 # ===== 設定 =====
 WORK_ID = 7912
@@ -17,39 +24,70 @@ FEED_TITLE = f"pixivコミック　{WORK_NAME}"
 FEED_DESC = f"pixivコミック　{WORK_NAME}　更新feed"
 OUT = Path("feed_pixiv_7912.xml")
 
-API_URL = f"{BASE}/api/app/works/{WORK_ID}/episodes/v2?order=desc"
-
-JST = timezone(timedelta(hours=9))
-
+META = FeedMeta(title=FEED_TITLE, link=WORK_URL, description=FEED_DESC)
 
-def ms_to_jst_date_jp(ms: int) -> str:
-    # 例: 2026年2月2日
-    dt = datetime.fromtimestamp(ms / 1000, tz=timezone.utc).astimezone(JST)
-    return f"{dt.year}年{dt.month}月{dt.day}日"
+API_URL = f"{BASE}/api/app/works/{WORK_ID}/episodes/v2?order=desc"
 
+JST = timestamps.JST
+
+
+def upcoming_release(it: dict, now: datetime) -> Optional[datetime]:
+    """
+    まだ読めないエピソードの公開予定時刻（分からなければ None）。
+      - episode.read_start_at（ms）が未来ならその時刻
+      - not_publishing などの message に書かれた予定日（"2月16日 12:00" など）
+    """
+    ep = it.get("episode")
+    if isinstance(ep, dict):
+        ts = ep.get("read_start_at")
+        if isinstance(ts, (int, float)) and not isinstance(ts, bool):
+            dt = timestamps.from_epoch_ms(int(ts))
+            if dt > now:
+                return dt
+    msg = it.get("message")
+    if isinstance(msg, str) and msg.strip():
+        dt = timestamps.parse_jp_schedule(msg, now, JST)
+        if dt is not None and dt > now:
+            return dt
+    return None
+
+
+def build_items(now: datetime) -> tuple[list[FeedItem], Optional[datetime]]:
+    """API から items と、まだ読めないエピソードのうち最も早い公開予定時刻を作る。"""
+    with metrics.stage("fetch"):
+        r = fetch.get(
+            API_URL,
+            headers={
+                "accept": "application/json",
+                "x-requested-with": "pixivcomic",
+                "referer": WORK_URL,
+            },
+            timeout=30,
+        )
+        data = r.json()
+    return items_from_payload(data, now)
 
-def main() -> int:
-    r = requests.get(
-        API_URL,
-        headers={
-            "accept": "application/json",
-            "x-requested-with": "pixivcomic",
-            "referer": WORK_URL,
-        },
-        timeout=30,
-    )
-    r.raise_for_status()
-    data = r.json()
 
+def items_from_payload(data: dict, now: datetime) -> tuple[list[FeedItem], Optional[datetime]]:
+    """
+    episodes API のレスポンスから items と次回公開予定を作る。
+    Playwright 版（pixiv_7912.py）もページが読み込む同じ JSON をこれで変換する。
+    """
     raw_items = data.get("data", {}).get("episodes", [])
     if not isinstance(raw_items, list):
         raise RuntimeError("JSON format unexpected: data.episodes is not a list")
 
-    items: list[dict] = []
+    items: list[FeedItem] = []
+    next_release: Optional[datetime] = None
 
     for it in raw_items:
-        # {"state":"not_publishing","message":...} を除外
-        if not isinstance(it, dict) or it.get("state") != "readable":
+        if not isinstance(it, dict):
+            continue
+        # {"state":"not_publishing","message":...} は feed には載せず、公開予定だけ拾う
+        if it.get("state") != "readable":
+            dt = upcoming_release(it, now)
+            if dt is not None and (next_release is None or dt < next_release):
+                next_release = dt
             continue
         ep = it.get("episode")
         if not isinstance(ep, dict):
@@ -66,7 +104,8 @@ def main() -> int:
             continue
 
         link = f"{BASE}{viewer_path}"
-        upd_jp = ms_to_jst_date_jp(int(read_start_at))
+        published = timestamps.from_epoch_ms(int(read_start_at))
+        upd_jp = timestamps.jp_date(published, JST)  # 例: 2026年2月2日
 
         # ---- TITLE ----
         # 爛漫ドレスコードレス　第38話-②　初詣は縁起物コーデで
@@ -85,41 +124,49 @@ def main() -> int:
         desc_parts.append(f"更新日: {upd_jp}")
         description = "<br>\n".join(desc_parts)
 
+        # pubDateも入れる（JST 00:00固定ではなく、read_start_atの時刻で入れる）
         items.append(
-            {
-                "story_id": story_id,
-                "link": link,
-                "title": entry_title,
-                "description": description,
-                "read_start_at": int(read_start_at),
-            }
+            FeedItem(
+                guid=f"pixiv-works-{WORK_ID}-story-{story_id}",
+                title=entry_title,
+                link=link,
+                description=description,
+                published=published,
+                image=thumb,
+            )
         )
 
     # 念のため、新しい順に（APIがorder=descでも保険）
-    items.sort(key=lambda x: x["read_start_at"], reverse=True)
-
-    fg = FeedGenerator()
-    fg.title(FEED_TITLE)
-    fg.link(href=WORK_URL, rel="alternate")
-    fg.description(FEED_DESC)
-    fg.language("ja")
-
-    for it in items:
-        # feedgenはデフォルトがprependなので、appendで“上から新しい順”を維持
-        fe = fg.add_entry(order="append")
-        fe.id(f"pixiv-works-{WORK_ID}-story-{it['story_id']}")
-        fe.link(href=it["link"])
-        fe.title(it["title"])
-        fe.description(it["description"])
+    items.sort(key=lambda x: x.published, reverse=True)
+    return items, next_release
 
-        # pubDateも入れる（JST 00:00固定ではなく、read_start_atの時刻で入れる）
-        dt = datetime.fromtimestamp(it["read_start_at"] / 1000, tz=timezone.utc)
-        fe.pubDate(dt.strftime("%a, %d %b %Y %H:%M:%S %z"))
 
-    OUT.write_bytes(fg.rss_str(pretty=True))
-    print(f"Wrote {OUT} ({len(items)} items)")
+def main() -> int:
+    now = datetime.now(timezone.utc)
+    schedule: dict[str, Optional[datetime]] = {}
+
+    def build() -> list[FeedItem]:
+        items, schedule["next_release"] = build_items(now)
+        return items
+
+    items = swr.run(OUT, build)
+
+    metrics.count("items", len(items))
+    if feedrender.publish(OUT, META, items):
+        print(f"Wrote {OUT} ({len(items)} items)")
+    else:
+        print(f"No changes. {OUT} not updated.")
+
+    # 次回の公開予定が見えていれば、その直後を「次に回す価値のある時刻」として残す
+    # キャッシュの items を返した（取得に失敗した）ときは、前回の予定をそのまま残す
+    if "next_release" not in schedule:
+        return 0
+    next_release = schedule["next_release"]
+    nextrun.record(OUT, next_release, now)
+    if next_release is not None:
+        print(f"Next release: {next_release.astimezone(JST).isoformat()}")
     return 0
 
 
 if __name__ == "__main__":
-    raise SystemExit(main())
+    raise SystemExit(profiling.run(main, OUT))
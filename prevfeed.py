@@ -0,0 +1,133 @@
+"""
+前回出力した feed（RSS / Atom）を、文書全体をメモリに載せずに読む。
+
+    prevfeed.guids(OUT)                         # GUID の並び（先頭から）
+    prevfeed.read(OUT, limit=20)                # 先頭 20 件だけ読んで打ち切る
+    prevfeed.read(OUT, until_guid=last_seen)    # その GUID が出たところで打ち切る（その項目も含む）
+    prevfeed.channel_links(OUT)                 # channel / feed の atom:link（hub / self など）
+
+iterparse で item / entry を1件ずつ読み、読み終えた要素は親から外して捨てるので、
+全文 HTML（content:encoded）入りの大きな feed でも使うメモリは1件分で済む。
+各項目は GUID・公開日時・表示に効く項目のハッシュ（FeedItem.digest() と同じ計算）を返す。
+
+ファイルが無い・壊れているときは [] を返す（呼び出し側は「前回なし」として扱う）。
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Any, List, Optional, Tuple
+
+import timestamps
+from feeditem import content_digest, guid_from_atom_id
+
+ATOM_NS = "{http://www.w3.org/2005/Atom}"
+CONTENT_ENCODED = "{http://purl.org/rss/1.0/modules/content/}encoded"
+
+_ITEM_TAGS = ("item", f"{ATOM_NS}entry")
+
+
+@dataclass(slots=True)
+class PrevItem:
+    guid: str
+    published: Optional[datetime]
+    digest: str
+
+
+def _text(el: Any) -> str:
+    return (el.text or "").strip() if el is not None else ""
+
+
+def _rss_item(el: Any) -> PrevItem:
+    pub = _text(el.find("pubDate"))
+    return PrevItem(
+        guid=_text(el.find("guid")),
+        published=timestamps.parse_rfc2822(pub) if pub else None,
+        digest=content_digest(
+            _text(el.find("title")),
+            _text(el.find("link")),
+            _text(el.find("description")),
+            _text(el.find(CONTENT_ENCODED)),
+        ),
+    )
+
+
+def _atom_entry(el: Any) -> PrevItem:
+    link = ""
+    for ln in el.iterfind(f"{ATOM_NS}link"):
+        if ln.get("rel", "alternate") == "alternate":
+            link = (ln.get("href") or "").strip()
+            break
+    pub = _text(el.find(f"{ATOM_NS}published")) or _text(el.find(f"{ATOM_NS}updated"))
+    return PrevItem(
+        guid=guid_from_atom_id(_text(el.find(f"{ATOM_NS}id"))),
+        published=timestamps.parse_iso(pub) if pub else None,
+        digest=content_digest(
+            _text(el.find(f"{ATOM_NS}title")),
+            link,
+            _text(el.find(f"{ATOM_NS}summary")),
+            _text(el.find(f"{ATOM_NS}content")),
+        ),
+    )
+
+
+def read(
+    path: Any, limit: Optional[int] = None, until_guid: Optional[str] = None
+) -> List[PrevItem]:
+    """先頭から最大 limit 件（until_guid が出たらそこまで）の項目を読む。"""
+    path = Path(path)
+    if not path.exists() or limit == 0:
+        return []
+    import xml.etree.ElementTree as ET
+
+    out: List[PrevItem] = []
+    stack: List[Any] = []  # 読み終えた item を親から外すための祖先の並び
+    try:
+        with path.open("rb") as f:
+            for event, el in ET.iterparse(f, events=("start", "end")):
+                if event == "start":
+                    stack.append(el)
+                    continue
+                stack.pop()
+                if el.tag not in _ITEM_TAGS:
+                    continue
+                prev = _rss_item(el) if el.tag == "item" else _atom_entry(el)
+                if stack:
+                    stack[-1].remove(el)
+                el.clear()
+                if prev.guid:
+                    out.append(prev)
+                if (limit is not None and len(out) >= limit) or (
+                    until_guid is not None and prev.guid == until_guid
+                ):
+                    break
+    except ET.ParseError:
+        return []
+    return out
+
+
+def channel_links(path: Any) -> List[Tuple[str, str]]:
+    """channel / feed 直下の atom:link の (rel, href)。最初の item / entry の手前で読むのをやめる。"""
+    path = Path(path)
+    if not path.exists():
+        return []
+    import xml.etree.ElementTree as ET
+
+    out: List[Tuple[str, str]] = []
+    try:
+        with path.open("rb") as f:
+            for event, el in ET.iterparse(f, events=("start", "end")):
+                if event == "start":
+                    if el.tag in _ITEM_TAGS:
+                        break
+                    continue
+                if el.tag == f"{ATOM_NS}link":
+                    out.append((el.get("rel", "alternate"), (el.get("href") or "").strip()))
+    except ET.ParseError:
+        return []
+    return out
+
+
+def guids(path: Any, limit: Optional[int] = None) -> List[str]:
+    return [p.guid for p in read(path, limit=limit)]
@@ -0,0 +1,84 @@
+"""
+generator のエントリポイント共通ラッパ（オプトインのプロファイル付き）。
+
+    if __name__ == "__main__":
+        raise SystemExit(profiling.run(main, OUT))
+
+プロファイルは次のどちらかで有効になる:
+  - 環境変数 FEED_PROFILE=1
+  - コマンドライン引数 --profile
+
+有効時は cProfile でビルド全体を計測し、feed と同じ場所に
+  <feed>.prof      : pstats 形式（snakeviz などで開ける）
+  <feed>.prof.txt  : 累積時間上位 N 関数のサマリ（N は FEED_PROFILE_TOP、既定30）
+を書き出す。metrics のランレポートもここでまとめて出力する。
+"""
+from __future__ import annotations
+
+import io
+import os
+import sys
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable
+
+import metrics
+
+if TYPE_CHECKING:
+    import cProfile
+
+DEFAULT_TOP = 30
+
+
+def enabled(argv: list[str] | None = None) -> bool:
+    argv = sys.argv[1:] if argv is None else argv
+    if "--profile" in argv:
+        return True
+    return os.getenv("FEED_PROFILE", "").strip().lower() in ("1", "true", "yes", "on")
+
+
+def top_n() -> int:
+    try:
+        return max(1, int(os.getenv("FEED_PROFILE_TOP", DEFAULT_TOP)))
+    except ValueError:
+        return DEFAULT_TOP
+
+
+def write_profile(prof: cProfile.Profile, out_path: Any, top: int) -> Path:
+    import pstats
+
+    out = Path(out_path)
+    dest = out.with_name(out.name + ".prof")
+    prof.dump_stats(str(dest))
+
+    buf = io.StringIO()
+    stats = pstats.Stats(prof, stream=buf)
+    stats.strip_dirs().sort_stats("cumulative").print_stats(top)
+    buf.write("\n")
+    stats.sort_stats("tottime").print_stats(top)
+    dest.with_name(dest.name + ".txt").write_text(buf.getvalue(), encoding="utf-8")
+    return dest
+
+
+def run(main: Callable[[], Any], out_path: Any) -> Any:
+    on = enabled()
+    # 各スクリプトが後で argv を見ても困らないようにフラグは取り除く
+    while "--profile" in sys.argv:
+        sys.argv.remove("--profile")
+
+    prof = None
+    if on:
+        import cProfile
+
+        prof = cProfile.Profile()
+    try:
+        if prof is None:
+            return main()
+        prof.enable()
+        try:
+            return main()
+        finally:
+            prof.disable()
+            dest = write_profile(prof, out_path, top_n())
+            print(f"Profile written: {dest}")
+    finally:
+        metrics.write_report(out_path)
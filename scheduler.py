@@ -0,0 +1,245 @@
+"""
+常駐モードのスケジューラ。
+
+  python scheduler.py                    # 常駐して各ソースをそれぞれの間隔でポーリング
+  python scheduler.py --once             # 全ソースを1回ずつ回して終了（学習した間隔は保存する）
+  python scheduler.py azmanga onitsuka   # 対象ソースを絞る（名前は sources.py）
+  python scheduler.py --serve 8000       # 生成した feed を同じプロセスから配信（feedserver.py）
+  python scheduler.py --once --shard 1/3 # 3分割したうちの2番目のソースだけ（shards.py）
+
+GitHub Actions の cron 実行と違い、プロセスを使い回すので
+HTTP のコネクションプール（fetch.session）・import 済みのモジュール・
+各モジュールのメモ化キャッシュ（timestamps / urlrewrite など）が次の実行まで残る。
+
+ポーリング間隔はソースごとに適応的に変える（nextrun.py で次回公開予定を残すソースは、
+その時刻が次の予定より早ければそこまで前倒しする）:
+  - 新しい項目が出た（feed が書き換わった） -> 間隔を SHRINK 倍（下限 min_interval）
+  - 変化なし                               -> 間隔を GROW 倍（上限 max_interval）
+  - 失敗                                   -> 間隔は据え置きで、連続失敗数に応じた指数バックオフ
+どの場合も ±JITTER のゆらぎを入れて、複数ソースの実行が同じ時刻に揃わないようにする。
+
+学習した間隔と次回実行時刻は FEED_SCHED_STATE（既定 scheduler.state.json）に保存し、
+再起動後も引き継ぐ。FEED_METRICS を指定していれば、実行ごとに feed 別のランレポートを書く。
+"""
+from __future__ import annotations
+
+import argparse
+import importlib
+import json
+import os
+import random
+import signal
+import threading
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import feedwriter
+import metrics
+import nextrun
+from sources import SOURCES, Source, by_name, parse_shard, shard_of
+
+GROW = 1.5
+SHRINK = 0.5
+JITTER = 0.1
+# 起動直後や設定変更時に全ソースが一斉に走らないよう、初回はこの秒数の範囲でずらす
+STARTUP_SPREAD = 30.0
+
+DEFAULT_STATE = Path("scheduler.state.json")
+
+_stop = threading.Event()
+
+
+@dataclass(slots=True)
+class SourceState:
+    interval: float
+    next_run: float = 0.0  # unix 秒
+    failures: int = 0
+    runs: int = 0
+    changes: int = 0
+    last_run: Optional[float] = None
+    last_change: Optional[float] = None
+
+
+def state_path() -> Path:
+    return Path(os.getenv("FEED_SCHED_STATE", "") or DEFAULT_STATE)
+
+
+def load_state(path: Path, sources: List[Source]) -> Dict[str, SourceState]:
+    raw: Dict[str, Any] = {}
+    if path.exists():
+        try:
+            raw = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            raw = {}
+
+    out: Dict[str, SourceState] = {}
+    now = time.time()
+    for src in sources:
+        st = None
+        if isinstance(raw.get(src.name), dict):
+            try:
+                st = SourceState(**raw[src.name])
+            except TypeError:
+                st = None
+        if st is None:
+            st = SourceState(interval=src.interval, next_run=now + random.uniform(0, STARTUP_SPREAD))
+        # sources.py 側で範囲を変えたときは保存値を収める
+        st.interval = clamp(src, st.interval)
+        out[src.name] = st
+    return out
+
+
+def save_state(path: Path, states: Dict[str, SourceState]) -> None:
+    # 対象を絞って起動したときも、他のソースの保存値は消さない
+    merged: Dict[str, Any] = {}
+    if path.exists():
+        try:
+            merged = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            merged = {}
+    merged.update({k: asdict(v) for k, v in states.items()})
+    feedwriter.atomic_write(path, (json.dumps(merged, indent=2) + "\n").encode("utf-8"))
+
+
+def clamp(src: Source, interval: float) -> float:
+    return max(src.min_interval, min(src.max_interval, interval))
+
+
+def jitter(seconds: float) -> float:
+    return seconds * random.uniform(1 - JITTER, 1 + JITTER)
+
+
+def next_interval(src: Source, st: SourceState, changed: bool) -> float:
+    return clamp(src, st.interval * (SHRINK if changed else GROW))
+
+
+def error_delay(src: Source, failures: int) -> float:
+    """連続 failures 回目の失敗後の待ち時間（min_interval から倍々、上限は max_interval）。"""
+    return min(src.max_interval, src.min_interval * (2 ** max(0, failures - 1)))
+
+
+def _stamp(path: Path) -> Optional[int]:
+    try:
+        return path.stat().st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+def run_source(src: Source) -> bool:
+    """
+    ソースの main() を1回実行し、feed が書き換わったかを返す。
+    feedwriter は内容が変わったときしか書かないので、出力ファイルの mtime で判定できる。
+    """
+    mod = importlib.import_module(src.module)  # 2回目以降は sys.modules のものを使い回す
+    before = _stamp(src.out)
+    metrics.reset()
+    try:
+        rc = mod.main()
+    finally:
+        metrics.write_report(src.out)
+    if rc not in (None, 0):
+        raise RuntimeError(f"{src.module}.main() returned {rc!r}")
+    return _stamp(src.out) != before
+
+
+def tick(src: Source, st: SourceState) -> None:
+    """1ソース分の実行と、結果に応じた次回時刻の更新。"""
+    t0 = time.time()
+    try:
+        changed = run_source(src)
+    except Exception as e:  # 1ソースの失敗で常駐プロセスごと落とさない
+        st.failures += 1
+        delay = error_delay(src, st.failures)
+        print(f"[{src.name}] failed ({st.failures} in a row): {e!r}; retry in {delay:.0f}s")
+    else:
+        st.failures = 0
+        st.runs += 1
+        if changed:
+            st.changes += 1
+            st.last_change = t0
+        st.interval = next_interval(src, st, changed)
+        delay = st.interval
+        print(
+            f"[{src.name}] {'updated' if changed else 'no changes'} "
+            f"in {time.time() - t0:.1f}s; next interval {st.interval:.0f}s"
+        )
+    st.last_run = t0
+    st.next_run = time.time() + jitter(delay)
+
+    # 公開予定が分かっているなら、間隔を待たずに公開直後に回す
+    hint = nextrun.next_run_at(src.out)
+    if hint is not None and time.time() < hint.timestamp() < st.next_run:
+        st.next_run = hint.timestamp()
+
+
+def _handle_signal(signum: int, frame: Any) -> None:
+    _stop.set()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="feed generator scheduler")
+    ap.add_argument("names", nargs="*", help="対象ソース（既定: 全部）")
+    ap.add_argument("--once", action="store_true", help="全ソースを1回ずつ回して終了")
+    ap.add_argument("--now", action="store_true", help="保存された次回時刻を無視して最初に全ソースを実行")
+    ap.add_argument("--serve", type=int, metavar="PORT", help="feedserver で配信しながら常駐する")
+    ap.add_argument("--shard", metavar="I/N", help="名前のハッシュで N 分割したうちの I 番目（0 始まり）だけ回す")
+    args = ap.parse_args(argv)
+
+    registry = by_name()
+    unknown = [n for n in args.names if n not in registry]
+    if unknown:
+        ap.error(f"unknown source(s): {', '.join(unknown)} (known: {', '.join(registry)})")
+    sources = [registry[n] for n in args.names] if args.names else list(SOURCES)
+    if args.shard:
+        try:
+            index, shards = parse_shard(args.shard)
+        except ValueError as e:
+            ap.error(str(e))
+        sources = [s for s in sources if shard_of(s.name, shards) == index]
+        if not sources:
+            print(f"No sources in shard {args.shard}.")
+            return 0
+
+    path = state_path()
+    states = load_state(path, sources)
+    if args.now or args.once:
+        for st in states.values():
+            st.next_run = min(st.next_run, time.time())
+
+    signal.signal(signal.SIGTERM, _handle_signal)
+    signal.signal(signal.SIGINT, _handle_signal)
+
+    store = httpd = None
+    if args.serve:
+        import feedserver
+
+        store = feedserver.FeedStore(Path("."))
+        httpd = feedserver.serve(store, args.serve)
+        print(f"Serving feeds on :{args.serve}")
+
+    while not _stop.is_set():
+        now = time.time()
+        due = sorted((s for s in sources if states[s.name].next_run <= now),
+                     key=lambda s: states[s.name].next_run)
+        for src in due:
+            if _stop.is_set():
+                break
+            tick(src, states[src.name])
+            save_state(path, states)
+            if store is not None:
+                store.refresh()  # 書き換わった feed だけ読み直して差し替える
+        if args.once:
+            break
+        wake = min(states[s.name].next_run for s in sources)
+        _stop.wait(max(1.0, wake - time.time()))
+
+    save_state(path, states)
+    if httpd is not None:
+        httpd.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,223 @@
+"""
+ソース一覧（sources.py）をシャードに分けて並列に回し、結果をまとめる。
+
+  python shards.py list 3                  # どのソースがどのシャードか
+  python shards.py run 3                   # 3 プロセスで並列に1回ずつ回し、状態をマージ
+  python shards.py export 1 3 out/shard-1  # matrix の1ジョブ分の成果物を書き出す
+  python shards.py merge out/shard-*       # 各ジョブの成果物をカレントディレクトリにまとめる
+
+割り当ては sources.shard_of（名前の sha1）で決まるので、どの実行でも同じソースは同じシャードに入る。
+各ソースの出力（feed_x.xml から始まる feed_x.* 一式: Atom / JSON / 圧縮版 / アーカイブ /
+キャッシュ / ブレーカー / 次回予定）はそのソースのシャードだけが書くので、まとめるときに衝突しない。
+シャードをまたぐ状態は次のようにまとめる:
+  - scheduler の状態（FEED_SCHED_STATE）: ソースごとに、そのソースのシャードの値を採る
+  - fetch の学習値（FEED_FETCH_LIMITS）: ホストごとに、元の値から変わったもの（複数なら小さい方）
+  - 画像ミラー: ファイルは内容のハッシュ名なので和集合、index.json も和集合
+merge の土台は dest にある前回まとめた状態。各ソースの出力一式は持ち主のシャードのものに
+そろえる（シャード側で消えたファイル、たとえば閉じたブレーカーは dest からも消す）。
+
+run では各シャードを `scheduler.py --once --shard I/N` の子プロセスとして同じディレクトリで動かし、
+状態ファイルだけシャードごとの別名（*.shard-I.json）に分けて、終わったらマージして消す。
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+import feedwriter
+import fetch
+import imagemirror
+import scheduler
+from sources import SOURCES, Source, in_shard, shard_of
+
+MARKER = "shard.json"
+
+
+def _read_json(p: Path) -> Dict[str, Any]:
+    try:
+        doc = json.loads(p.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    return doc if isinstance(doc, dict) else {}
+
+
+def _write_json(p: Path, doc: Dict[str, Any]) -> None:
+    feedwriter.atomic_write(p, (json.dumps(doc, indent=2) + "\n").encode("utf-8"))
+
+
+def _shard_path(p: Path, index: int) -> Path:
+    return p.with_name(f"{p.stem}.shard-{index}{p.suffix}")
+
+
+def outputs(src: Source, root: Path) -> List[Path]:
+    """root にある src の出力一式（feed_x.* ）。"""
+    return sorted(root.glob(f"{src.out.stem}.*"))
+
+
+def merge_state(base: Dict[str, Any], parts: Sequence[tuple]) -> Dict[str, Any]:
+    """parts: (シャードの状態, そのシャードのソース名) の並び。各ソースは持ち主のシャードの値を採る。"""
+    out = dict(base)
+    for state, names in parts:
+        for name in names:
+            if name in state:
+                out[name] = state[name]
+    return out
+
+
+def merge_limits(base: Dict[str, Any], parts: Sequence[Dict[str, Any]]) -> Dict[str, Any]:
+    """ホストごとに、base から変わった値を採る（複数のシャードが変えていたら limit の小さい方）。"""
+    out = dict(base)
+    for part in parts:
+        for host, v in part.items():
+            if v == base.get(host):
+                continue
+            cur = out.get(host)
+            if cur is None or cur == base.get(host) or v.get("limit", 0) < cur.get("limit", 0):
+                out[host] = v
+    return out
+
+
+def merge_images(dest: Path, src: Path) -> None:
+    if not src.is_dir():
+        return
+    for p in src.rglob("*"):
+        rel = p.relative_to(src)
+        if p.is_file() and p.name != "index.json" and not (dest / rel).exists():
+            (dest / rel).parent.mkdir(parents=True, exist_ok=True)
+            shutil.copy2(p, dest / rel)
+    index = {**_read_json(dest / "index.json"), **_read_json(src / "index.json")}
+    if index:
+        dest.mkdir(parents=True, exist_ok=True)
+        _write_json(dest / "index.json", index)
+
+
+def cmd_list(shards: int) -> int:
+    for i in range(shards):
+        names = [s.name for s in in_shard(i, shards)]
+        print(f"{i}/{shards}: {', '.join(names) or '-'}")
+    return 0
+
+
+def cmd_run(shards: int, extra: Sequence[str]) -> int:
+    state, limits = scheduler.state_path(), fetch.limits_path()
+    procs = []
+    for i in range(shards):
+        if not in_shard(i, shards):
+            continue
+        env = dict(os.environ)
+        env["FEED_SCHED_STATE"] = str(_shard_path(state, i))
+        env["FEED_FETCH_LIMITS"] = str(_shard_path(limits, i))
+        for p in (state, limits):
+            if p.exists():
+                shutil.copy2(p, _shard_path(p, i))
+        script = Path(__file__).resolve().with_name("scheduler.py")
+        cmd = [sys.executable, str(script), "--once", "--shard", f"{i}/{shards}", *extra]
+        procs.append((i, subprocess.Popen(cmd, env=env)))
+
+    failed = [i for i, p in procs if p.wait() != 0]
+
+    state_parts, limit_parts = [], []
+    for i, _ in procs:
+        names = [s.name for s in in_shard(i, shards)]
+        state_parts.append((_read_json(_shard_path(state, i)), names))
+        limit_parts.append(_read_json(_shard_path(limits, i)))
+    _write_json(state, merge_state(_read_json(state), state_parts))
+    merged = merge_limits(_read_json(limits), limit_parts)
+    if merged:
+        _write_json(limits, merged)
+    for i, _ in procs:
+        _shard_path(state, i).unlink(missing_ok=True)
+        _shard_path(limits, i).unlink(missing_ok=True)
+
+    if failed:
+        print(f"Shard(s) failed: {', '.join(map(str, failed))}")
+    return 1 if failed else 0
+
+
+def cmd_export(index: int, shards: int, dest: Path) -> int:
+    """このシャードのソースの出力と状態を dest に集める（actions/upload-artifact 用）。"""
+    dest.mkdir(parents=True, exist_ok=True)
+    mine = in_shard(index, shards)
+    for src in mine:
+        for p in outputs(src, Path(".")):
+            shutil.copy2(p, dest / p.name)
+    for p in (scheduler.state_path(), fetch.limits_path()):
+        if p.exists():
+            shutil.copy2(p, dest / p.name)
+    merge_images(dest / imagemirror.image_dir(), imagemirror.image_dir())
+    _write_json(dest / MARKER, {"index": index, "shards": shards, "sources": [s.name for s in mine]})
+    return 0
+
+
+def cmd_merge(dirs: Sequence[Path], dest: Path = Path(".")) -> int:
+    """export した各シャードの成果物を dest（既定はカレント）にまとめる。"""
+    state, limits = scheduler.state_path(), fetch.limits_path()
+    state_parts, limit_parts = [], []
+    for d in dirs:
+        marker = _read_json(d / MARKER)
+        if not marker:
+            print(f"{d}: no {MARKER}, skipped")
+            continue
+        shards = int(marker["shards"])
+        # 持ち主の判定はマーカーの一覧ではなく、その場で shard_of を計算し直して確かめる
+        names = [s.name for s in SOURCES if shard_of(s.name, shards) == int(marker["index"])]
+        for src in SOURCES:
+            if src.name in names:
+                theirs = outputs(src, d)
+                keep = {p.name for p in theirs}
+                for p in outputs(src, dest):
+                    if p.name not in keep:
+                        p.unlink()
+                for p in theirs:
+                    shutil.copy2(p, dest / p.name)
+        state_parts.append((_read_json(d / state.name), names))
+        limit_parts.append(_read_json(d / limits.name))
+        merge_images(dest / imagemirror.image_dir(), d / imagemirror.image_dir())
+
+    if state_parts:
+        _write_json(dest / state, merge_state(_read_json(dest / state), state_parts))
+        merged = merge_limits(_read_json(dest / limits), limit_parts)
+        if merged:
+            _write_json(dest / limits, merged)
+    print(f"Merged {len(state_parts)} shard(s) into {dest}")
+    return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="run feed sources in shards")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("list", help="シャードごとのソース")
+    p.add_argument("shards", type=int)
+    p = sub.add_parser("run", help="全シャードを並列の子プロセスで1回ずつ回す")
+    p.add_argument("shards", type=int)
+    p = sub.add_parser("export", help="1シャード分の成果物を DIR に集める")
+    p.add_argument("index", type=int)
+    p.add_argument("shards", type=int)
+    p.add_argument("dir", type=Path)
+    p = sub.add_parser("merge", help="export した成果物をまとめる")
+    p.add_argument("dirs", nargs="+", type=Path)
+    args, extra = ap.parse_known_args(argv)
+
+    if getattr(args, "shards", 1) < 1:
+        ap.error("shards must be >= 1")
+    if args.cmd == "list":
+        return cmd_list(args.shards)
+    if args.cmd == "run":
+        return cmd_run(args.shards, extra)
+    if extra:
+        ap.error(f"unrecognized arguments: {' '.join(extra)}")
+    if args.cmd == "export":
+        if not 0 <= args.index < args.shards:
+            ap.error("index must be in 0 .. shards-1")
+        return cmd_export(args.index, args.shards, args.dir)
+    return cmd_merge(args.dirs)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
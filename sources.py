@@ -0,0 +1,68 @@
+"""
+スケジューラ（scheduler.py）が回すソースの一覧。
+
+各ソースは既存の generator スクリプト（main() を持つモジュール）と、その出力 feed、
+ポーリング間隔（初期値・下限・上限、秒）の組。間隔は実行結果に応じて
+scheduler 側で下限〜上限の間を伸び縮みする。
+
+ソースを増やすときは generator スクリプトを用意してここに1行足す。
+
+シャード（scheduler.py --shard I/N, shards.py）への割り当ては名前のハッシュで決まるので、
+ソースを足しても既存ソースのシャードは N を変えない限り動かない。
+"""
+from __future__ import annotations
+
+import hashlib
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+MINUTE = 60
+HOUR = 60 * MINUTE
+
+
+@dataclass(slots=True, frozen=True)
+class Source:
+    name: str
+    module: str  # import するモジュール名（main() を呼ぶ）
+    out: Path  # main() が書き出す feed（更新の有無の判定に使う）
+    interval: float  # 初期のポーリング間隔
+    min_interval: float = 30 * MINUTE
+    max_interval: float = 24 * HOUR
+
+
+SOURCES: List[Source] = [
+    Source("azmanga", "azmanga", Path("feed_azmanga.xml"), interval=6 * HOUR),
+    Source("pixiv_7912", "pixiv_api_7912", Path("feed_pixiv_7912.xml"), interval=12 * HOUR),
+    Source(
+        "kemono_31357565",
+        "kemono_api_31357565",
+        Path("feed_kemono_31357565.xml"),
+        interval=6 * HOUR,
+    ),
+    Source("onitsuka", "onitsuka_api", Path("feed_onitsuka.xml"), interval=12 * HOUR),
+]
+
+
+def by_name() -> Dict[str, Source]:
+    return {s.name: s for s in SOURCES}
+
+
+def shard_of(name: str, shards: int) -> int:
+    """ソース名から決まるシャード番号（0 .. shards-1）。hash() は実行ごとに変わるので sha1 を使う。"""
+    return int(hashlib.sha1(name.encode("utf-8")).hexdigest()[:8], 16) % shards
+
+
+def in_shard(index: int, shards: int) -> List[Source]:
+    return [s for s in SOURCES if shard_of(s.name, shards) == index]
+
+
+def parse_shard(spec: str) -> Tuple[int, int]:
+    """"I/N"（0 始まり）を (I, N) にする。"""
+    try:
+        i, n = (int(x) for x in spec.split("/"))
+    except ValueError:
+        raise ValueError(f"shard must be I/N, got {spec!r}") from None
+    if not 0 <= i < n:
+        raise ValueError(f"shard index out of range: {spec!r}")
+    return i, n
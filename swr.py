@@ -0,0 +1,195 @@
+"""
+ソース単位のサーキットブレーカーと、前回成功時の items による stale-while-revalidate。
+
+    items = swr.run(OUT, build_items)
+    feedrender.publish(OUT, META, items)
+
+build_items()（取得 + FeedItem への変換）を次のように包む:
+  - 成功: items を <feed>.cache.json に保存し、ブレーカーを閉じる
+  - 失敗（取得側の障害 = is_outage() が真の例外、または前回は items があったのに今回 0 件）:
+      失敗回数を <feed>.breaker.json に記録し、キャッシュの items を返す
+      （feed の内容は前回と同じになるので feedwriter は何も書かない = feed が空にならない）
+  - 連続 FAIL_THRESHOLD 回失敗したらブレーカーを開き、COOLDOWN の間は
+    build_items() を呼ばずにすぐキャッシュを返す（障害中に毎回タイムアウトまで待たない）。
+    COOLDOWN が過ぎたら1回だけ試し（half-open）、失敗すれば COOLDOWN を倍にして開き直す
+キャッシュも無い（初回など）ときは例外をそのまま送出する。この場合も feed は書き換えない。
+設定漏れ（secrets が無い、鍵が失効して 401/403 など）やエンドポイントの移動（404）、
+応答の解析エラー、コードの不具合による例外は障害扱いにせず、そのまま送出する
+（古い items で成功したことにして隠さない。ブレーカーも動かさない）。
+
+FEED_SWR=0 で無効（常に build_items() の結果をそのまま使う）。
+"""
+from __future__ import annotations
+
+import json
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, List, Optional
+
+import feedwriter
+import metrics
+from feeditem import FeedItem
+
+FAIL_THRESHOLD = 2
+COOLDOWN = 60 * 60.0
+MAX_COOLDOWN = 24 * 60 * 60.0
+
+
+class CircuitOpen(RuntimeError):
+    """ブレーカーが開いているので取得を試さなかった。"""
+
+
+class SourceError(RuntimeError):
+    """取得元の障害（全エンドポイントが失敗した、0 件しか返らなかったなど）。"""
+
+
+def is_outage(err: BaseException) -> bool:
+    """キャッシュで出し直してよい、取得元側の一時的な失敗か。
+
+    通信エラー・タイムアウト（fetch.DeadlineExceeded / fetch.HostDown、requests の
+    ConnectionError / Timeout / ChunkedEncodingError を含む）、5xx と 429、SourceError。
+    401/403/404 などの 4xx（鍵の失効・エンドポイントの移動）や JSON の解析エラーは
+    直るまで古い items を出し続けることになるので障害扱いにしない。
+    """
+    if isinstance(err, (ConnectionError, TimeoutError, SourceError)):
+        return True
+    # requests の例外なら requests は読み込み済み（ここで import はしない）
+    requests = sys.modules.get("requests")
+    if requests is None:
+        return False
+    if isinstance(err, (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError)):
+        return True
+    if isinstance(err, requests.HTTPError):
+        status = getattr(err.response, "status_code", None)
+        return status is not None and (status >= 500 or status == 429)
+    return False
+
+
+def enabled() -> bool:
+    return os.getenv("FEED_SWR", "1").strip().lower() not in ("0", "false", "no", "off")
+
+
+def cache_path(out: Path) -> Path:
+    return out.with_name(out.name + ".cache.json")
+
+
+def breaker_path(out: Path) -> Path:
+    return out.with_name(out.name + ".breaker.json")
+
+
+def _read_json(p: Path) -> Optional[Any]:
+    try:
+        return json.loads(p.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+
+
+def _write_json(p: Path, doc: Any) -> None:
+    feedwriter.atomic_write(p, (json.dumps(doc, ensure_ascii=False, indent=1) + "\n").encode("utf-8"))
+
+
+def load_cache(out: Path) -> List[FeedItem]:
+    doc = _read_json(cache_path(out))
+    if not isinstance(doc, dict):
+        return []
+    try:
+        return [FeedItem.from_dict(d) for d in doc.get("items", [])]
+    except (KeyError, TypeError, ValueError):
+        return []
+
+
+def save_cache(out: Path, items: List[FeedItem]) -> None:
+    rows = [it.to_dict() for it in items]
+    prev = _read_json(cache_path(out))
+    if isinstance(prev, dict) and prev.get("items") == rows:
+        return  # 内容が同じなら書かない
+    _write_json(cache_path(out), {"saved_at": time.time(), "items": rows})
+
+
+class Breaker:
+    """<feed>.breaker.json に永続化する、ソース1つ分のブレーカー。"""
+
+    def __init__(self, out: Path) -> None:
+        self.path = breaker_path(out)
+        doc = _read_json(self.path)
+        doc = doc if isinstance(doc, dict) else {}
+        self.failures = int(doc.get("failures", 0))
+        self.open_until = float(doc.get("open_until", 0.0))
+        self.cooldown = float(doc.get("cooldown", COOLDOWN))
+        self.last_error = str(doc.get("last_error", ""))
+
+    def is_open(self, now: float) -> bool:
+        return now < self.open_until
+
+    def success(self) -> None:
+        changed = self.failures or self.open_until
+        self.failures = 0
+        self.open_until = 0.0
+        self.cooldown = COOLDOWN
+        self.last_error = ""
+        if changed:
+            self._save()
+
+    def failure(self, err: BaseException, now: float) -> None:
+        half_open = self.open_until > 0 and now >= self.open_until
+        self.failures += 1
+        self.last_error = repr(err)[:500]
+        if half_open:
+            # 試しに1回やって駄目だったので、さらに長く開く
+            self.cooldown = min(MAX_COOLDOWN, self.cooldown * 2)
+        if half_open or self.failures >= FAIL_THRESHOLD:
+            self.open_until = now + self.cooldown
+        self._save()
+
+    def _save(self) -> None:
+        if not (self.failures or self.open_until):
+            self.path.unlink(missing_ok=True)
+            return
+        _write_json(
+            self.path,
+            {
+                "failures": self.failures,
+                "open_until": self.open_until,
+                "cooldown": self.cooldown,
+                "last_error": self.last_error,
+            },
+        )
+
+
+def run(out_path: Any, build: Callable[[], List[FeedItem]]) -> List[FeedItem]:
+    """build() の結果（失敗時は前回成功時の items）を返す。"""
+    if not enabled():
+        return build()
+
+    out = Path(out_path)
+    breaker = Breaker(out)
+    now = time.time()
+
+    err: BaseException
+    if breaker.is_open(now):
+        err = CircuitOpen(f"{out.name}: circuit open ({breaker.last_error})")
+    else:
+        try:
+            items = build()
+        except Exception as e:
+            if not is_outage(e):
+                raise
+            err = e
+        else:
+            # 前回まで items があったのに 0 件なら、取得側の異常とみなす
+            if items or not load_cache(out):
+                breaker.success()
+                save_cache(out, items)
+                return items
+            err = SourceError(f"{out.name}: source returned no items")
+        breaker.failure(err, now)
+
+    cached = load_cache(out)
+    if not cached:
+        raise err
+    metrics.count("stale_items", len(cached))
+    metrics.cache_hit("breaker_open" if isinstance(err, CircuitOpen) else "stale_served")
+    print(f"{out.name}: serving {len(cached)} cached items ({err})")
+    return cached
@@ -0,0 +1,82 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import archive
+import feedrender
+from feeditem import FeedItem, FeedMeta
+
+T0 = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def items(start, stop):
+    """新しい順（番号が大きいほど新しい）。"""
+    return [
+        FeedItem(guid=str(i), title=f"t{i}", published=T0 + timedelta(hours=i))
+        for i in reversed(range(start, stop))
+    ]
+
+
+@pytest.fixture
+def out(tmp_path, monkeypatch):
+    monkeypatch.setenv("FEED_ARCHIVE_HEAD", "3")
+    monkeypatch.setenv("FEED_ARCHIVE_PAGE", "4")
+    monkeypatch.delenv("FEED_BASE_URL", raising=False)
+    return tmp_path / "feed_x.xml"
+
+
+def recorder(pages):
+    def write_page(dest, chunk, links):
+        pages.append((dest.name, [it.guid for it in chunk], links))
+        dest.write_text("page")
+
+    return write_page
+
+
+def test_head_never_exceeds_head_size(out):
+    pages = []
+    head, links = archive.paginate(out, items(0, 6), recorder(pages))
+    # 押し出された 2..0 はすぐに（4件たまるのを待たずに）ページになる
+    assert [it.guid for it in head] == ["5", "4", "3"]
+    assert pages == [("feed_x.archive-0001.xml", ["2", "1", "0"], [("current", out)])]
+    assert links == [("prev-archive", archive.page_path(out, 1))]
+
+    head, links = archive.paginate(out, items(2, 8), recorder(pages))
+    assert [it.guid for it in head] == ["7", "6", "5"]
+    assert pages[1] == (
+        "feed_x.archive-0002.xml",
+        ["4", "3"],
+        [("current", out), ("prev-archive", archive.page_path(out, 1))],
+    )
+    assert links == [("prev-archive", archive.page_path(out, 2))]
+
+    # 何も押し出されなければページは増えない
+    archive.paginate(out, items(2, 8), recorder(pages))
+    assert len(pages) == 2
+
+
+def test_large_overflow_is_split_into_full_pages(out):
+    pages = []
+    archive.paginate(out, items(0, 12), recorder(pages))
+    assert [p[1] for p in pages] == [["3", "2", "1", "0"], ["7", "6", "5", "4"], ["8"]]
+
+
+def test_state_is_rebuilt_from_pages_on_disk(out, monkeypatch):
+    monkeypatch.delenv("FEED_ARCHIVE", raising=False)
+    monkeypatch.setenv("FEED_FORMATS", "rss")
+    meta = FeedMeta(title="x", link="https://example.com/", description="d")
+
+    def write_page(dest, chunk, links):
+        feedrender.write(dest, meta, chunk, links, is_archive=True)
+
+    archive.paginate(out, items(0, 6), write_page)
+    archive.state_path(out).unlink()
+
+    written = []
+    head, links = archive.paginate(
+        out, items(0, 7), lambda d, c, l: written.append((d.name, [it.guid for it in c]))
+    )
+    # 2..0 はページ1にあるので再アーカイブしない。押し出された 3 だけが新しいページ2
+    assert written == [("feed_x.archive-0002.xml", ["3"])]
+    assert links == [("prev-archive", archive.page_path(out, 2))]
+    assert archive.load_state(out)["pages"] == 2
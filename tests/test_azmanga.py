@@ -0,0 +1,30 @@
+import azmanga
+
+IMG = '<img src="https://s.example/t.jpg">'
+
+
+def test_summary_drops_anchor_wrapping_lead_image():
+    body = (
+        f'<p><a href="https://www.turboimagehost.com/p/1">{IMG}</a></p>'
+        '<a href="https://dl.example/1">l1</a><a href="https://dl.example/2">l2</a>'
+    )
+    out = azmanga.summarize_description("https://a.example/post", body, max_links=2)
+    assert out.count(IMG) == 1
+    assert "turboimagehost" not in out
+    assert 'href="https://dl.example/1"' in out and 'href="https://dl.example/2"' in out
+    assert "記事を開く" in out
+
+
+def test_summary_keeps_text_of_anchor_around_lead_image():
+    body = f'<a href="https://dl.example/1">{IMG} DL</a>'
+    out = azmanga.summarize_description("https://a.example/post", body, max_links=5)
+    assert out.count(IMG) == 1
+    assert '<li><a href="https://dl.example/1"> DL</a></li>' in out
+
+
+def test_load_options_ignores_bad_values(monkeypatch):
+    monkeypatch.setenv("AZ_DESC_MAX_LINKS", "many")
+    monkeypatch.setenv("AZ_FULL_CONTENT", "1")
+    opts = azmanga.load_options()
+    assert opts.desc_max_links == azmanga.DESC_MAX_LINKS
+    assert opts.full_content
@@ -0,0 +1,22 @@
+from datetime import datetime
+
+from feeditem import FeedItem
+from timestamps import JST
+
+
+def test_dict_round_trip():
+    it = FeedItem(
+        guid="g",
+        title="t",
+        link="https://example.com/",
+        description="<p>d</p>",
+        published=datetime(2026, 1, 2, 3, 4, tzinfo=JST),
+        image="https://example.com/i.jpg",
+    )
+    assert FeedItem.from_dict(it.to_dict()) == it
+    assert "content" not in it.to_dict()
+    assert FeedItem.from_dict({"guid": "g"}) == FeedItem(guid="g", title="")
+
+
+def test_records_have_no_instance_dict():
+    assert not hasattr(FeedItem(guid="g", title="t"), "__dict__")
@@ -0,0 +1,40 @@
+import json
+import xml.etree.ElementTree as ET
+
+import pytest
+
+import feedrender
+from feeditem import FeedItem, FeedMeta
+
+pytest.importorskip("feedgen")
+
+ATOM = "{http://www.w3.org/2005/Atom}"
+META = FeedMeta(title="t", link="https://www.example.com/user/1", description="d")
+ITEMS = [
+    FeedItem(guid="kemono-fanbox-12", title="a", link="https://www.example.com/p/12",
+             description="<p>one &amp; <b>two</b></p><p>three<br>four</p>", content="<p>body</p>"),
+    FeedItem(guid="2026-01-01|https://www.example.com/p/1", title="b", link="https://www.example.com/p/1"),
+    FeedItem(guid="https://www.example.com/p/2", title="c", link="https://www.example.com/p/2"),
+]
+
+
+def test_atom_ids_are_iris_and_rss_guids_are_kept():
+    out = feedrender.render(META, ITEMS)
+    atom_ids = [e.findtext(f"{ATOM}id") for e in ET.fromstring(out["atom"]).iter(f"{ATOM}entry")]
+    assert atom_ids == [
+        "tag:www.example.com,2026:kemono-fanbox-12",
+        "tag:www.example.com,2026:2026-01-01%7Chttps://www.example.com/p/1",
+        "https://www.example.com/p/2",
+    ]
+    guids = [g.text for g in ET.fromstring(out["rss"]).iter("guid")]
+    assert guids == [it.guid for it in ITEMS]
+
+
+def test_json_feed_summary_is_plain_text():
+    doc = json.loads(feedrender.render(META, ITEMS, fmts=("json",))["json"])
+    first = doc["items"][0]
+    assert first["summary"] == "one & two\nthree\nfour"
+    assert first["content_html"] == "<p>body</p>"
+    assert first["id"] == "kemono-fanbox-12"
+    # content が無ければ description（HTML）は content_html にだけ入る
+    assert "summary" not in doc["items"][1]
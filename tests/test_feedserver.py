@@ -0,0 +1,64 @@
+import gzip
+import http.client
+
+import pytest
+
+import feedserver
+
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+    monkeypatch.delenv("FEED_IMAGE_DIR", raising=False)
+    (tmp_path / "feed_x.xml").write_bytes(b"<rss>one</rss>")
+    (tmp_path / "feed_x.xml.cache.json").write_text("{}")
+    store = feedserver.FeedStore(tmp_path)
+    httpd = feedserver.serve(store, port=0, host="127.0.0.1")
+    yield store, tmp_path, httpd.server_address[1]
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def get(port, path, **headers):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+    conn.request("GET", path, headers=headers)
+    resp = conn.getresponse()
+    body = resp.read()
+    conn.close()
+    return resp, body
+
+
+def test_etag_and_conditional_get(server):
+    _, _, port = server
+    resp, body = get(port, "/feed_x.xml")
+    assert resp.status == 200 and body == b"<rss>one</rss>"
+    etag = resp.getheader("ETag")
+
+    resp, body = get(port, "/feed_x.xml", **{"If-None-Match": etag})
+    assert resp.status == 304 and body == b""
+
+    resp, body = get(port, "/feed_x.xml", **{"Accept-Encoding": "gzip"})
+    assert resp.getheader("Content-Encoding") == "gzip"
+    assert gzip.decompress(body) == b"<rss>one</rss>"
+    # エンコーディング違いの ETag でも同じ内容として 304
+    resp, _ = get(port, "/feed_x.xml", **{"If-None-Match": resp.getheader("ETag")})
+    assert resp.status == 304
+
+
+def test_state_files_are_not_served(server):
+    _, _, port = server
+    assert get(port, "/feed_x.xml.cache.json")[0].status == 404
+    assert get(port, "/../feed_x.xml")[0].status == 404
+
+
+def test_refresh_picks_up_new_content(server):
+    store, root, port = server
+    etag = get(port, "/feed_x.xml")[0].getheader("ETag")
+    (root / "feed_x.xml").write_bytes(b"<rss>second</rss>")
+    assert store.refresh() >= 1
+    resp, body = get(port, "/feed_x.xml", **{"If-None-Match": etag})
+    assert resp.status == 200 and body == b"<rss>second</rss>"
+
+
+def test_accepted_encodings():
+    assert feedserver.accepted_encodings("gzip;q=0, br") == {"br"}
+    assert feedserver.accepted_encodings("") == set()
@@ -0,0 +1,62 @@
+import gzip
+
+import pytest
+
+import feedwriter
+
+RSS = b"<rss><channel><lastBuildDate>%s</lastBuildDate><item>%s</item></channel></rss>"
+
+
+def rss(build, item=b"a"):
+    return RSS % (build, item)
+
+
+def test_normalize_ignores_build_dates_only():
+    a = feedwriter.normalize(rss(b"Mon, 01 Jan 2026 00:00:00 +0000"))
+    b = feedwriter.normalize(rss(b"Tue, 02 Jan 2026 00:00:00 +0000"))
+    assert a == b
+    assert feedwriter.normalize(b"<feed><updated>1</updated></feed>") == b"<feed></feed>"
+    assert feedwriter.normalize(rss(b"x", b"b")) != a
+
+
+ATOM = (
+    b"<feed><updated>%s</updated><title>t</title>"
+    b"<entry><id>1</id><updated>%s</updated></entry></feed>"
+)
+
+
+def test_normalize_keeps_entry_updated():
+    a = feedwriter.normalize(ATOM % (b"2026-01-01", b"2025-12-01"))
+    assert a == feedwriter.normalize(ATOM % (b"2026-01-02", b"2025-12-01"))
+    assert a != feedwriter.normalize(ATOM % (b"2026-01-02", b"2025-12-02"))
+    assert b"<updated>2025-12-01</updated>" in a
+
+
+def test_write_feed_skips_volatile_only_changes(tmp_path):
+    out = tmp_path / "feed_x.xml"
+    assert feedwriter.write_feed(out, rss(b"1"))
+    assert gzip.decompress((tmp_path / "feed_x.xml.gz").read_bytes()) == rss(b"1")
+
+    assert not feedwriter.write_feed(out, rss(b"2"))
+    assert out.read_bytes() == rss(b"1")
+
+    assert feedwriter.write_feed(out, rss(b"3", b"b"))
+    assert out.read_bytes() == rss(b"3", b"b")
+
+
+def test_write_feed_recreates_missing_siblings(tmp_path):
+    out = tmp_path / "feed_x.xml"
+    feedwriter.write_feed(out, rss(b"1"))
+    (tmp_path / "feed_x.xml.gz").unlink()
+    assert not feedwriter.write_feed(out, rss(b"2"))
+    assert gzip.decompress((tmp_path / "feed_x.xml.gz").read_bytes()) == rss(b"1")
+
+
+@pytest.mark.parametrize("name, bad", [("feed_x.xml", b"<rss><channel>"), ("feed_x.json", b'{"items": [')])
+def test_malformed_output_keeps_previous_file(tmp_path, name, bad):
+    out = tmp_path / name
+    out.write_bytes(b"previous")
+    with pytest.raises(feedwriter.MalformedOutput):
+        feedwriter.atomic_write(out, bad)
+    assert out.read_bytes() == b"previous"
+    assert [p.name for p in tmp_path.iterdir()] == [name]
@@ -0,0 +1,170 @@
+import pytest
+
+import fetch
+
+
+def test_zero_deadline_is_not_unlimited():
+    f = fetch.AsyncFetcher(deadline=0.0)
+    try:
+        assert f.deadline_at is not None
+        assert f.remaining() <= 0
+    finally:
+        f.close()
+
+
+def test_fetch_many_with_spent_deadline_sends_nothing(monkeypatch):
+    def boom(*a, **k):
+        raise AssertionError("request must not be sent")
+
+    monkeypatch.setattr(fetch, "request", boom)
+    for mode in ("sync", "async"):
+        monkeypatch.setenv("FEED_FETCH", mode)
+        out = fetch.fetch_many(["https://a.invalid/1", ("https://a.invalid/2", {})], deadline=0.0)
+        assert [type(r) for r in out] == [fetch.DeadlineExceeded] * 2
+        assert str(out[1]) == "https://a.invalid/2"
+
+
+def test_no_deadline_means_unlimited():
+    f = fetch.AsyncFetcher(deadline=None)
+    try:
+        assert f.remaining() is None
+    finally:
+        f.close()
+
+
+def test_additive_increase_is_about_one_per_round_trip():
+    lim = fetch.HostLimit(limit=2)
+    lim.on_success(0.1)
+    assert lim.limit == 2.5
+    for _ in range(3):
+        lim.on_success(0.1)
+    assert 3.5 < lim.limit < 4.0
+    for _ in range(1000):
+        lim.on_success(0.1)
+    assert lim.limit == fetch.MAX_PER_HOST
+
+
+def test_no_increase_when_latency_is_far_above_baseline():
+    lim = fetch.HostLimit(limit=2, base=0.1)
+    lim.on_success(0.1 * fetch.LATENCY_TOLERANCE * 2)
+    assert lim.limit == 2
+
+
+def test_baseline_drift_is_capped():
+    lim = fetch.HostLimit(limit=1)
+    latency = 0.1
+    for _ in range(2000):
+        lim.on_success(latency)
+        latency *= 1.005  # 少しずつ遅くなり続けるホスト
+    assert lim.floor == 0.1
+    assert lim.base == 0.1 * fetch.BASE_MAX_DRIFT
+    before = lim.limit
+    lim.on_success(latency)
+    assert lim.limit == before  # 加算増加は止まっている
+
+
+def test_throttle_halves_at_most_once_per_round_trip(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(fetch.time, "monotonic", lambda: now[0])
+    lim = fetch.HostLimit(limit=8)
+    lim.on_success(0.5)
+    lim.on_throttle()
+    assert lim.limit == 4
+    now[0] += 0.4  # 同じ往復の中で返ってきた 429
+    lim.on_throttle()
+    assert lim.limit == 4
+    now[0] += 0.2
+    lim.on_throttle(retry_after=30)
+    assert lim.limit == 2
+    assert lim.paused_for() == pytest.approx(30)
+    for _ in range(5):
+        now[0] += 1
+        lim.on_throttle()
+    assert lim.limit == fetch.MIN_PER_HOST
+
+
+def test_limits_file_round_trip(tmp_path, monkeypatch):
+    path = tmp_path / "limits.json"
+    monkeypatch.setenv("FEED_FETCH_LIMITS", str(path))
+    monkeypatch.setattr(fetch.atexit, "register", lambda fn: None)
+    monkeypatch.setattr(fetch, "_limits", {})
+    monkeypatch.setattr(fetch, "_limits_loaded", False)
+
+    lim = fetch.host_limit("https://a.example/x")
+    assert lim.limit == fetch.DEFAULT_PER_HOST
+    lim.on_success(0.2)
+    lim.on_success(0.3)
+    fetch.save_limits()
+
+    monkeypatch.setattr(fetch, "_limits", {})
+    monkeypatch.setattr(fetch, "_limits_loaded", False)
+    again = fetch.host_limit("https://a.example/y")
+    assert again is not lim
+    assert again.to_dict() == lim.to_dict()
+    assert fetch.host_limit("https://b.example/").limit == fetch.DEFAULT_PER_HOST
+
+
+def test_broken_limits_file_is_ignored(tmp_path, monkeypatch):
+    path = tmp_path / "limits.json"
+    path.write_text('{"a.example": {"limit": "x"}, "b.example": {"limit": 3}}', encoding="utf-8")
+    monkeypatch.setenv("FEED_FETCH_LIMITS", str(path))
+    monkeypatch.setattr(fetch.atexit, "register", lambda fn: None)
+    monkeypatch.setattr(fetch, "_limits", {})
+    monkeypatch.setattr(fetch, "_limits_loaded", False)
+    assert fetch.host_limit("https://a.example/").limit == fetch.DEFAULT_PER_HOST
+    assert fetch.host_limit("https://b.example/").limit == 3
+
+
+@pytest.fixture
+def slow_server(tmp_path, monkeypatch):
+    """ヘッダを返すまで3秒かかるローカルサーバ（後始末で待ちを打ち切る）。"""
+    import threading
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    pytest.importorskip("requests")
+    monkeypatch.setenv("FEED_FETCH_LIMITS", str(tmp_path / "limits.json"))
+    monkeypatch.setattr(fetch.atexit, "register", lambda fn: None)
+    monkeypatch.setattr(fetch, "_limits", {})
+    monkeypatch.setattr(fetch, "_limits_loaded", False)
+
+    done = threading.Event()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if done.wait(3):
+                return  # 後始末中。クライアントはもういない
+            self.send_response(200)
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    httpd.daemon_threads = True
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    try:
+        yield f"http://127.0.0.1:{httpd.server_address[1]}/"
+    finally:
+        done.set()
+        httpd.shutdown()
+        httpd.server_close()
+
+
+@pytest.mark.parametrize("mode", ["sync", "async"])
+def test_deadline_bounds_requests_in_flight(slow_server, monkeypatch, mode):
+    import threading
+    import time
+
+    monkeypatch.setenv("FEED_FETCH", mode)
+    t0 = time.monotonic()
+    out = fetch.fetch_many([slow_server + "a", slow_server + "b"], timeout=30, deadline=0.5)
+    assert [type(r) for r in out] == [fetch.DeadlineExceeded] * 2
+    assert time.monotonic() - t0 < 1.5
+
+    # 実行スレッドも締め切りで止まっている（終了時に TIMEOUT まで join されない）
+    for th in threading.enumerate():
+        if th.name.startswith("fetch"):
+            th.join(1.0)
+            assert not th.is_alive()
+    # 締め切りによる打ち切りはホストの混雑として学習しない
+    assert fetch.host_limit(slow_server).limit == fetch.DEFAULT_PER_HOST
@@ -0,0 +1,53 @@
+import imagemirror
+from feeditem import FeedItem
+
+PNG = b"\x89PNG\r\n\x1a\n" + b"\0" * 32
+
+
+def test_src_and_data_src_are_mirrored_separately(tmp_path, monkeypatch):
+    monkeypatch.setenv("FEED_IMAGE_DIR", str(tmp_path / "images"))
+    monkeypatch.setenv("FEED_IMAGE_BASE_URL", "https://m.example")
+    asked = []
+
+    def download(urls, referer):
+        asked.extend(urls)
+        return {u: PNG + u.encode() for u in urls}
+
+    monkeypatch.setattr(imagemirror, "_download", download)
+    it = FeedItem(
+        guid="1",
+        title="t",
+        description='<img data-src="https://o.example/a.png" src="https://o.example/b.png" alt="src=x">',
+    )
+    imagemirror.mirror_items([it])
+
+    assert asked == ["https://o.example/a.png", "https://o.example/b.png"]
+    assert "o.example" not in it.description
+    assert it.description.count('="https://m.example/') == 2
+    assert 'alt="src=x"' in it.description
+
+
+def test_src_inside_another_attribute_is_ignored(tmp_path, monkeypatch):
+    monkeypatch.setenv("FEED_IMAGE_DIR", str(tmp_path / "images"))
+    monkeypatch.setenv("FEED_IMAGE_BASE_URL", "https://m.example")
+    asked = []
+    monkeypatch.setattr(
+        imagemirror, "_download", lambda urls, referer: asked.extend(urls) or {u: PNG for u in urls}
+    )
+    it = FeedItem(
+        guid="1",
+        title="t",
+        description="<img alt=\"see src='https://evil.example/x.jpg'\" src=\"https://ok.example/y.jpg\">",
+    )
+    imagemirror.mirror_items([it])
+    assert asked == ["https://ok.example/y.jpg"]
+    assert "alt=\"see src='https://evil.example/x.jpg'\"" in it.description
+    assert 'src="https://m.example/' in it.description
+
+
+def test_missing_pillow_is_reported(tmp_path, monkeypatch, capsys):
+    monkeypatch.setenv("FEED_IMAGE_DIR", str(tmp_path / "images"))
+    monkeypatch.setattr(imagemirror, "has_pillow", lambda: False)
+    monkeypatch.setattr(imagemirror, "_download", lambda urls, referer: {u: PNG for u in urls})
+    imagemirror.mirror_items([FeedItem(guid="1", title="t", image="https://o.example/a.png")])
+    assert "Pillow is not installed" in capsys.readouterr().out
@@ -0,0 +1,47 @@
+import json
+
+import pytest
+
+import jsonstream
+
+
+def chunked(doc, size=1):
+    data = json.dumps(doc, ensure_ascii=False).encode("utf-8")
+    return [data[i : i + size] for i in range(0, len(data), size)]
+
+
+@pytest.mark.parametrize("size", [1, 3, 7, 4096])
+def test_top_level_array_in_any_chunking(size):
+    doc = [{"id": 1, "title": "日本語"}, 12345, -0.5e3, 1.5e-07, True, None, "x,]"]
+    assert list(jsonstream.iter_array(chunked(doc, size))) == doc
+
+
+def test_nested_path_and_captured_siblings():
+    doc = {
+        "extensions": {"cost": 1},
+        "data": {"meta": [1, 2], "productSearch": {"total": 2, "items": [{"a": 1}, {"a": 2}], "x": 0}},
+        "errors": [{"message": "late"}],
+    }
+    captured = {}
+    out = list(jsonstream.iter_array(chunked(doc, 5), ("data", "productSearch", "items"), captured))
+    assert out == [{"a": 1}, {"a": 2}]
+    assert captured == {"extensions": {"cost": 1}, "errors": [{"message": "late"}]}
+
+
+def test_empty_array():
+    assert list(jsonstream.iter_array(chunked({"items": []}), ("items",))) == []
+
+
+@pytest.mark.parametrize("doc", [{"data": None, "errors": ["e"]}, {"other": []}, {"data": {"items": 1}}])
+def test_missing_path(doc):
+    captured = {}
+    with pytest.raises(jsonstream.PathNotFound):
+        list(jsonstream.iter_array(chunked(doc), ("data", "items"), captured))
+    if "errors" in doc:
+        assert captured["errors"] == ["e"]
+
+
+def test_truncated_input_raises():
+    data = b'[{"a": 1}, {"a": '
+    with pytest.raises(json.JSONDecodeError):
+        list(jsonstream.iter_array([data]))
@@ -0,0 +1,34 @@
+import json
+
+import kemono_api_31357565 as kemono
+
+
+def test_read_page_keeps_only_usable_posts():
+    posts = [
+        {"id": "2", "title": " two ", "published": "2026-01-02T00:00:00", "file": {"path": "/a.jpg"}},
+        {"title": "no id"},
+        "not a post",
+        {"id": "1", "published": "2026-01-01T00:00:00"},
+    ]
+    body = json.dumps(posts).encode()
+    n, out = kemono.read_page([body[:7], body[7:]])
+    assert n == 4
+    assert [p.post_id for p in out] == ["2", "1"]
+    assert out[0].title == "two" and out[1].title == "post 1"
+    assert out[0].link.startswith("https://")
+
+
+def test_read_page_non_array_is_empty():
+    assert kemono.read_page([b'{"error": "x"}']) == (0, [])
+
+
+def test_items_from_posts_newest_first(monkeypatch):
+    monkeypatch.delenv("FEED_ARCHIVE", raising=False)
+    raw = [
+        {"id": "1", "published": "2026-01-01T00:00:00"},
+        {"id": "3"},
+        {"id": "2", "published": "2026-01-02T00:00:00"},
+    ]
+    _, posts = kemono.read_page([json.dumps(raw).encode()])
+    items = kemono.items_from_posts(posts)
+    assert [it.link.rsplit("/", 1)[-1] for it in items] == ["2", "1", "3"]
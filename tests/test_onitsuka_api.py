@@ -0,0 +1,18 @@
+import json
+
+import pytest
+
+import onitsuka_api
+
+
+def test_graphql_errors_after_null_data_are_reported():
+    body = json.dumps({"data": None, "errors": [{"message": "bad store"}]}).encode()
+    with pytest.raises(RuntimeError, match="bad store"):
+        onitsuka_api.read_products([body[:10], body[10:]])
+
+
+def test_missing_secrets_are_reported_before_fetching(monkeypatch):
+    for k in onitsuka_api.REQUIRED_ENVS:
+        monkeypatch.delenv(k, raising=False)
+    with pytest.raises(RuntimeError, match="Missing required env vars"):
+        onitsuka_api.main()
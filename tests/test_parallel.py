@@ -0,0 +1,26 @@
+import metrics
+import parallel
+
+
+@metrics.timed("square")
+def square(x):
+    return x * x
+
+
+def test_pmap_keeps_order_and_worker_timings(monkeypatch):
+    monkeypatch.setenv("FEED_PARSE_WORKERS", "2")
+    metrics.reset()
+    out = parallel.pmap(square, [(i,) for i in range(40)], min_batch=1)
+    assert out == [i * i for i in range(40)]
+    assert metrics.METRICS.report()["stages"]["square"]["calls"] == 40
+
+
+def test_pmap_in_process(monkeypatch):
+    monkeypatch.setenv("FEED_PARSE_WORKERS", "1")
+    metrics.reset()
+    assert parallel.pmap(square, [(3,)]) == [9]
+    assert metrics.METRICS.report()["stages"]["square"]["calls"] == 1
+
+
+def test_pool_does_not_fork():
+    assert parallel.mp_context().get_start_method() in ("forkserver", "spawn")
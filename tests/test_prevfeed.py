@@ -0,0 +1,76 @@
+from datetime import datetime
+
+import pytest
+
+import feedrender
+import prevfeed
+from feeditem import FeedItem, FeedMeta
+from timestamps import JST
+
+pytest.importorskip("feedgen")
+
+META = FeedMeta(title="x", link="https://example.com/", description="d")
+
+
+def items(n=3):
+    return [
+        FeedItem(
+            guid=f"g{i}",
+            title=f"t{i} & co",
+            link=f"https://example.com/{i}",
+            description=f'<p>{i}<img src="https://example.com/{i}.jpg"></p>',
+            published=datetime(2026, 1, i + 1, tzinfo=JST),
+            content="<p>full</p>" if i == 0 else "",
+        )
+        for i in range(n)
+    ]
+
+
+@pytest.fixture
+def out(tmp_path, monkeypatch):
+    for k in ("FEED_ARCHIVE", "FEED_IMAGE_MIRROR", "FEED_FORMATS", "FEED_WEBSUB_HUB", "FEED_BASE_URL"):
+        monkeypatch.delenv(k, raising=False)
+    return tmp_path / "feed_x.xml"
+
+
+def test_read_matches_rendered_items(out):
+    feedrender.publish(out, META, items())
+    for path in (out, feedrender.format_path(out, "atom")):
+        prev = prevfeed.read(path)
+        assert [(p.guid, p.digest) for p in prev] == [(it.guid, it.digest()) for it in items()]
+        assert prev[1].published == datetime(2026, 1, 2, tzinfo=JST)
+    assert prevfeed.guids(out, limit=2) == ["g0", "g1"]
+    assert [p.guid for p in prevfeed.read(out, until_guid="g1")] == ["g0", "g1"]
+
+
+def test_missing_or_broken_file_reads_as_empty(out):
+    assert prevfeed.read(out) == []
+    out.write_text("<rss><channel><item>")
+    assert prevfeed.read(out) == [] and prevfeed.channel_links(out) == []
+
+
+def test_unchanged_compares_digests_outputs_and_hub_links(out, monkeypatch):
+    assert not feedrender.unchanged(out, items())
+    feedrender.publish(out, META, items())
+    assert feedrender.unchanged(out, items())
+
+    edited = items()
+    edited[2].description += "!"
+    assert not feedrender.unchanged(out, edited)
+    assert not feedrender.unchanged(out, items(4))
+
+    feedrender.format_path(out, "json").unlink()
+    assert not feedrender.unchanged(out, items())
+    feedrender.publish(out, META, items())
+    assert feedrender.unchanged(out, items())
+
+    monkeypatch.setenv("FEED_BASE_URL", "https://feeds.example")
+    monkeypatch.setenv("FEED_WEBSUB_HUB", "https://hub.example/")
+    monkeypatch.setenv("FEED_WEBSUB_DEFER", "1")
+    assert not feedrender.unchanged(out, items())
+    feedrender.publish(out, META, items())
+    assert prevfeed.channel_links(out) == [
+        ("hub", "https://hub.example/"),
+        ("self", "https://feeds.example/feed_x.xml"),
+    ]
+    assert feedrender.unchanged(out, items())
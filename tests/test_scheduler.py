@@ -0,0 +1,128 @@
+import json
+import sys
+import types
+from datetime import datetime, timezone
+
+import pytest
+
+import nextrun
+import scheduler
+from sources import Source
+
+MIN = 100.0
+MAX = 1000.0
+NOW = 1_800_000_000.0
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """scheduler の時計とゆらぎを固定する（t[0] を進めれば時刻が進む）。"""
+    t = [NOW]
+    monkeypatch.setattr(scheduler.time, "time", lambda: t[0])
+    monkeypatch.setattr(scheduler.random, "uniform", lambda a, b: (a + b) / 2)
+    return t
+
+
+@pytest.fixture
+def src(tmp_path, monkeypatch):
+    """main() の振る舞いを差し替えられるダミーのソース。"""
+    mod = types.ModuleType("fake_source")
+    mod.main = lambda: None
+    monkeypatch.setitem(sys.modules, "fake_source", mod)
+    monkeypatch.delenv("FEED_METRICS", raising=False)
+    return Source("fake", "fake_source", tmp_path / "feed_fake.xml", 400.0, MIN, MAX)
+
+
+def test_next_interval_shrinks_on_change_and_grows_otherwise(src):
+    st = scheduler.SourceState(interval=400.0)
+    assert scheduler.next_interval(src, st, changed=True) == 400.0 * scheduler.SHRINK
+    assert scheduler.next_interval(src, st, changed=False) == 400.0 * scheduler.GROW
+    assert scheduler.next_interval(src, scheduler.SourceState(interval=MIN), True) == MIN
+    assert scheduler.next_interval(src, scheduler.SourceState(interval=MAX), False) == MAX
+
+
+def test_error_delay_doubles_up_to_max(src):
+    assert [scheduler.error_delay(src, n) for n in range(0, 6)] == [MIN, MIN, 200.0, 400.0, 800.0, MAX]
+
+
+def test_load_state_clamps_and_spreads_new_sources(tmp_path, src, clock):
+    other = Source("other", "fake_source", tmp_path / "feed_other.xml", 400.0, MIN, MAX)
+    path = tmp_path / "state.json"
+    path.write_text(json.dumps({"fake": {"interval": 99999.0, "next_run": 5.0, "runs": 3}}), encoding="utf-8")
+
+    states = scheduler.load_state(path, [src, other])
+    assert states["fake"].interval == MAX
+    assert states["fake"].next_run == 5.0 and states["fake"].runs == 3
+    assert states["other"].interval == 400.0
+    assert states["other"].next_run == NOW + scheduler.STARTUP_SPREAD / 2
+
+
+@pytest.mark.parametrize("content", ["{broken", json.dumps({"fake": {"interval": 1, "unknown": 2}})])
+def test_load_state_ignores_broken_entries(tmp_path, src, clock, content):
+    path = tmp_path / "state.json"
+    path.write_text(content, encoding="utf-8")
+    assert scheduler.load_state(path, [src])["fake"].interval == 400.0
+
+
+def test_save_state_keeps_other_sources(tmp_path, src, clock):
+    path = tmp_path / "state.json"
+    path.write_text(json.dumps({"other": {"interval": 1.0}}), encoding="utf-8")
+    scheduler.save_state(path, {"fake": scheduler.SourceState(interval=200.0, next_run=NOW)})
+    saved = json.loads(path.read_text(encoding="utf-8"))
+    assert saved["other"] == {"interval": 1.0}
+    assert saved["fake"]["interval"] == 200.0 and saved["fake"]["next_run"] == NOW
+
+    assert scheduler.load_state(path, [src])["fake"] == scheduler.SourceState(interval=200.0, next_run=NOW)
+
+
+def test_tick_changed_and_unchanged(src, clock):
+    st = scheduler.SourceState(interval=400.0)
+
+    def write():
+        clock[0] += 1
+        src.out.write_text(str(clock[0]), encoding="utf-8")
+
+    sys.modules["fake_source"].main = write
+    scheduler.tick(src, st)
+    assert (st.runs, st.changes, st.interval) == (1, 1, 200.0)
+    assert st.last_change == NOW
+    assert st.next_run == NOW + 1 + 200.0
+
+    sys.modules["fake_source"].main = lambda: None
+    scheduler.tick(src, st)
+    assert (st.runs, st.changes, st.interval) == (2, 1, 300.0)
+
+
+def test_tick_backs_off_on_failure_without_touching_interval(src, clock):
+    st = scheduler.SourceState(interval=400.0)
+
+    def boom():
+        raise RuntimeError("down")
+
+    sys.modules["fake_source"].main = boom
+    for expected in (MIN, 200.0, 400.0):
+        scheduler.tick(src, st)
+        assert st.next_run == NOW + expected
+    assert st.failures == 3 and st.interval == 400.0 and st.runs == 0
+
+    sys.modules["fake_source"].main = lambda: 1  # 0 以外の終了コードも失敗
+    scheduler.tick(src, st)
+    assert st.failures == 4
+
+    sys.modules["fake_source"].main = lambda: None
+    scheduler.tick(src, st)
+    assert st.failures == 0
+
+
+def test_tick_moves_next_run_to_release_hint(src, clock):
+    st = scheduler.SourceState(interval=MAX)
+    release = datetime.fromtimestamp(NOW + 300, timezone.utc)
+    nextrun.record(src.out, release)
+    scheduler.tick(src, st)
+    assert st.next_run == (release + nextrun.RELEASE_GRACE).timestamp()
+
+    # 予定が通常の次回より後、またはもう過ぎているなら使わない
+    for at in (NOW + 5 * MAX, NOW - 3600):
+        nextrun.record(src.out, datetime.fromtimestamp(at, timezone.utc))
+        scheduler.tick(src, st)
+        assert st.next_run == NOW + st.interval
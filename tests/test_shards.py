@@ -0,0 +1,65 @@
+import json
+
+import pytest
+
+import shards
+from sources import SOURCES, in_shard, parse_shard, shard_of
+
+
+def test_assignment_is_stable_and_covers_every_source():
+    assert shard_of("azmanga", 3) == shard_of("azmanga", 3)
+    for n in (1, 2, 3, 5):
+        parts = [in_shard(i, n) for i in range(n)]
+        names = [s.name for part in parts for s in part]
+        assert sorted(names) == sorted(s.name for s in SOURCES)
+
+
+def test_parse_shard():
+    assert parse_shard("1/3") == (1, 3)
+    for bad in ("3/3", "-1/2", "x", "1"):
+        with pytest.raises(ValueError):
+            parse_shard(bad)
+
+
+def test_merge_state_takes_each_source_from_its_owner():
+    base = {"a": 1, "b": 1, "c": 1}
+    parts = [({"a": 2, "b": 9}, ["a"]), ({"a": 9, "b": 3}, ["b"])]
+    assert shards.merge_state(base, parts) == {"a": 2, "b": 3, "c": 1}
+
+
+def test_merge_limits_takes_changed_hosts_and_the_smaller_limit():
+    base = {"h1": {"limit": 8}, "h2": {"limit": 8}}
+    parts = [
+        {"h1": {"limit": 8}, "h2": {"limit": 4}},
+        {"h1": {"limit": 6}, "h2": {"limit": 2}, "h3": {"limit": 5}},
+    ]
+    assert shards.merge_limits(base, parts) == {
+        "h1": {"limit": 6},
+        "h2": {"limit": 2},
+        "h3": {"limit": 5},
+    }
+
+
+def test_merge_mirrors_owner_outputs(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    for k in ("FEED_SCHED_STATE", "FEED_FETCH_LIMITS", "FEED_IMAGE_DIR"):
+        monkeypatch.delenv(k, raising=False)
+    src = SOURCES[0]
+    stem = src.out.stem
+    dest = tmp_path / "dest"
+    dest.mkdir()
+    (dest / f"{stem}.xml").write_text("old")
+    (dest / f"{stem}.xml.breaker.json").write_text("{}")
+    (dest / "scheduler.state.json").write_text(json.dumps({"other": {"x": 1}}))
+
+    part = tmp_path / "shard-0"
+    part.mkdir()
+    (part / f"{stem}.xml").write_text("new")
+    (part / "scheduler.state.json").write_text(json.dumps({src.name: {"x": 2}}))
+    (part / shards.MARKER).write_text(json.dumps({"index": shard_of(src.name, 1), "shards": 1}))
+
+    assert shards.cmd_merge([part], dest) == 0
+    assert (dest / f"{stem}.xml").read_text() == "new"
+    assert not (dest / f"{stem}.xml.breaker.json").exists()
+    state = json.loads((dest / "scheduler.state.json").read_text())
+    assert state == {"other": {"x": 1}, src.name: {"x": 2}}
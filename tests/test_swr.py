@@ -0,0 +1,134 @@
+import pytest
+
+import fetch
+import metrics
+import swr
+from feeditem import FeedItem
+
+ITEMS = [FeedItem(guid="1", title="one", link="https://example.com/1")]
+
+
+def down():
+    raise ConnectionError("down")
+
+
+@pytest.fixture
+def out(tmp_path, monkeypatch):
+    monkeypatch.delenv("FEED_SWR", raising=False)
+    return tmp_path / "feed_x.xml"
+
+
+def test_breaker_opens_after_threshold_and_doubles_on_half_open(out):
+    b = swr.Breaker(out)
+    for _ in range(swr.FAIL_THRESHOLD - 1):
+        b.failure(ConnectionError("x"), now=100.0)
+    assert not b.is_open(100.0)
+
+    b.failure(ConnectionError("x"), now=100.0)
+    assert b.is_open(100.0 + swr.COOLDOWN - 1)
+    assert not b.is_open(100.0 + swr.COOLDOWN)
+
+    # 永続化されている
+    b = swr.Breaker(out)
+    assert b.open_until == 100.0 + swr.COOLDOWN
+
+    # half-open の1回が失敗したら倍の時間開く
+    t = 100.0 + swr.COOLDOWN
+    b.failure(ConnectionError("x"), now=t)
+    assert b.cooldown == swr.COOLDOWN * 2
+    assert b.is_open(t + swr.COOLDOWN * 2 - 1)
+
+    b.success()
+    assert not b.is_open(t) and b.cooldown == swr.COOLDOWN
+    assert not swr.breaker_path(out).exists()
+
+
+def test_run_serves_cache_on_outage(out):
+    assert swr.run(out, lambda: ITEMS) == ITEMS
+    assert swr.run(out, down) == ITEMS
+    assert swr.Breaker(out).failures == 1
+
+
+def test_run_treats_empty_result_as_outage_when_cache_exists(out):
+    swr.run(out, lambda: ITEMS)
+    assert swr.run(out, lambda: []) == ITEMS
+
+
+def test_run_opens_circuit_without_calling_build(out):
+    swr.run(out, lambda: ITEMS)
+    for _ in range(swr.FAIL_THRESHOLD):
+        swr.run(out, down)
+
+    def must_not_run():
+        raise AssertionError("build called while circuit is open")
+
+    assert swr.run(out, must_not_run) == ITEMS
+
+
+def test_run_counts_stale_serves_as_cache_hits(out, monkeypatch):
+    m = metrics.Metrics()
+    monkeypatch.setattr(swr, "metrics", m)
+    swr.run(out, lambda: ITEMS)
+    for _ in range(swr.FAIL_THRESHOLD + 1):
+        swr.run(out, down)
+    hits = m.report()["cache_hits"]
+    assert hits["by_kind"] == {"stale_served": swr.FAIL_THRESHOLD, "breaker_open": 1}
+    assert hits["total"] == swr.FAIL_THRESHOLD + 1
+
+
+def test_run_raises_outage_without_cache(out):
+    with pytest.raises(ConnectionError):
+        swr.run(out, down)
+
+
+@pytest.mark.parametrize("err", [RuntimeError("Missing required env vars"), KeyError("x"), TypeError("x")])
+def test_run_does_not_hide_config_or_code_errors(out, err):
+    swr.run(out, lambda: ITEMS)
+
+    def broken():
+        raise err
+
+    with pytest.raises(type(err)):
+        swr.run(out, broken)
+    assert not swr.breaker_path(out).exists()
+
+
+def http_error(requests, status):
+    r = requests.Response()
+    r.status_code = status
+    return requests.HTTPError(f"{status}", response=r)
+
+
+def test_is_outage():
+    requests = pytest.importorskip("requests")
+    assert swr.is_outage(fetch.DeadlineExceeded("u"))
+    assert swr.is_outage(fetch.HostDown("h"))
+    assert swr.is_outage(requests.ConnectionError("x"))
+    assert swr.is_outage(requests.Timeout("x"))
+    assert swr.is_outage(http_error(requests, 503))
+    assert swr.is_outage(http_error(requests, 429))
+    assert swr.is_outage(swr.SourceError("x"))
+    assert not swr.is_outage(RuntimeError("x"))
+    assert not swr.is_outage(ValueError("x"))
+
+
+@pytest.mark.parametrize("status", [401, 403, 404])
+def test_client_errors_are_not_outages(out, status):
+    requests = pytest.importorskip("requests")
+    assert not swr.is_outage(http_error(requests, status))
+    assert not swr.is_outage(requests.HTTPError("no response"))
+
+    swr.run(out, lambda: ITEMS)
+
+    def revoked():
+        raise http_error(requests, status)
+
+    with pytest.raises(requests.HTTPError):
+        swr.run(out, revoked)
+    assert not swr.breaker_path(out).exists()
+
+
+def test_decode_errors_are_not_outages():
+    requests = pytest.importorskip("requests")
+    assert not swr.is_outage(requests.exceptions.JSONDecodeError("x", "doc", 0))
+    assert not swr.is_outage(requests.exceptions.InvalidJSONError("x"))
@@ -0,0 +1,43 @@
+from datetime import datetime
+
+import pytest
+
+from timestamps import JST, UTC, parse_en_datetime, parse_jp_schedule, parse_rfc2822
+
+NOW = datetime(2026, 2, 10, 9, 0, tzinfo=JST)
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ("次回更新は2026年2月16日 12:00予定", datetime(2026, 2, 16, 12, 0, tzinfo=JST)),
+        ("次回更新は2月16日 12:00予定", datetime(2026, 2, 16, 12, 0, tzinfo=JST)),
+        ("2月16日(月)更新予定", datetime(2026, 2, 16, tzinfo=JST)),
+        ("2月16日(月) 12時更新", datetime(2026, 2, 16, 12, 0, tzinfo=JST)),
+        ("2月16日 12時30分", datetime(2026, 2, 16, 12, 30, tzinfo=JST)),
+        ("2026/3/1 0:00", datetime(2026, 3, 1, tzinfo=JST)),
+        # 年の省略で少し前の日付は今年のまま（半年以上前なら翌年）
+        ("1月5日更新予定", datetime(2026, 1, 5, tzinfo=JST)),
+    ],
+)
+def test_parse_jp_schedule(text, expected):
+    assert parse_jp_schedule(text, NOW) == expected
+
+
+def test_parse_jp_schedule_rolls_over_the_year():
+    now = datetime(2026, 12, 20, tzinfo=JST)
+    assert parse_jp_schedule("1月5日更新予定", now) == datetime(2027, 1, 5, tzinfo=JST)
+
+
+@pytest.mark.parametrize("text", ["", "近日更新予定", "2月30日更新", "13月1日"])
+def test_parse_jp_schedule_rejects(text):
+    assert parse_jp_schedule(text, NOW) is None
+
+
+def test_parse_en_datetime_and_rfc2822():
+    assert parse_en_datetime("January 29, 2026 12:05 am") == datetime(2026, 1, 29, 0, 5, tzinfo=JST)
+    assert parse_en_datetime("January 29, 2026 12:05 pm") == datetime(2026, 1, 29, 12, 5, tzinfo=JST)
+    with pytest.raises(ValueError):
+        parse_en_datetime("Foo 29, 2026 8:24 am")
+    assert parse_rfc2822("Thu, 29 Jan 2026 08:24:00 +0900") == datetime(2026, 1, 28, 23, 24, tzinfo=UTC)
+    assert parse_rfc2822("not a date") is None
@@ -0,0 +1,43 @@
+from urlrewrite import absolute, rewrite_html, sub_attrs
+
+BASE = "https://example.com/archives/1"
+
+
+def test_relative_urls_become_absolute():
+    out = rewrite_html('<a href="x.html"><img src="/img/a.jpg"></a>', BASE)
+    assert out == '<a href="https://example.com/archives/x.html"><img src="https://example.com/img/a.jpg"></a>'
+
+
+def test_attribute_text_inside_other_values_is_left_alone():
+    out = rewrite_html('<a href="x.html" title="see src=y">t</a>', BASE)
+    assert out == '<a href="https://example.com/archives/x.html" title="see src=y">t</a>'
+
+
+def test_quoted_value_containing_another_quote_style():
+    out = rewrite_html("<img alt='a \"src=b\" c' src=y.jpg>", BASE)
+    assert out == "<img alt='a \"src=b\" c' src=\"https://example.com/archives/y.jpg\">"
+
+
+def test_absolute_and_untargeted_attributes_are_untouched():
+    src = '<a href="https://other.example/p" data-x="rel/y" download>t</a>'
+    assert rewrite_html(src, BASE) == src
+
+
+def test_srcset_and_lazy_attributes():
+    out = rewrite_html('<img data-src="a.jpg" srcset="a.jpg 1x, //cdn.example/b.jpg 2x">', BASE)
+    assert 'data-src="https://example.com/archives/a.jpg"' in out
+    assert 'srcset="https://example.com/archives/a.jpg 1x, https://cdn.example/b.jpg 2x"' in out
+
+
+def test_absolute_matches_urljoin_shortcuts():
+    assert absolute(BASE, "//cdn.example/a") == "https://cdn.example/a"
+    assert absolute(BASE, "/a/../b") == "https://example.com/b"
+    assert absolute(BASE, "mailto:x@example.com") == "mailto:x@example.com"
+
+
+def test_sub_attrs_limits_to_tags_and_names():
+    src = "<img alt='a src=\"b\"' src='x&amp;y' data-src=z><a src=q>"
+    seen = []
+    out = sub_attrs(src, ("src", "data-src"), lambda n, v: seen.append((n, v)) or v.upper(), ("img",))
+    assert seen == [("src", "x&y"), ("data-src", "z")]
+    assert out == "<img alt='a src=\"b\"' src='X&amp;Y' data-src=\"Z\"><a src=q>"
@@ -0,0 +1,56 @@
+import threading
+
+import pytest
+
+import fetch
+import websub
+
+pytest.importorskip("requests")
+
+
+@pytest.fixture
+def hub(tmp_path, monkeypatch):
+    """空いているポートで立てたローカルのハブ。受け取った topics と返すステータスを持つ。"""
+    # ping が fetch の学習値を作業ディレクトリに保存しないように
+    monkeypatch.setenv("FEED_FETCH_LIMITS", str(tmp_path / "limits.json"))
+    monkeypatch.setattr(fetch.atexit, "register", lambda fn: None)
+    monkeypatch.setattr(fetch, "_limits", {})
+    monkeypatch.setattr(fetch, "_limits_loaded", False)
+
+    state = {"topics": [], "status": 204}
+
+    def on_publish(topics):
+        state["topics"].extend(topics)
+        return state["status"]
+
+    httpd = websub._hub_server(0, on_publish)
+    t = threading.Thread(target=httpd.serve_forever, daemon=True)
+    t.start()
+    url = f"http://127.0.0.1:{httpd.server_address[1]}/"
+    monkeypatch.setenv("FEED_BASE_URL", "https://feeds.example/")
+    monkeypatch.setenv("FEED_WEBSUB_HUB", url)
+    try:
+        yield state
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
+
+
+def test_ping_sends_publish_form(hub, tmp_path):
+    paths = [tmp_path / "feed_x.xml", tmp_path / "feed_x.json"]
+    assert websub.ping(paths) == 2
+    assert hub["topics"] == ["https://feeds.example/feed_x.xml", "https://feeds.example/feed_x.json"]
+
+
+@pytest.mark.parametrize("status", [404, 500])
+def test_ping_failure_is_reported_not_raised(hub, tmp_path, status, capsys):
+    hub["status"] = status
+    assert websub.ping([tmp_path / "feed_x.xml"]) == 0
+    assert hub["topics"] == ["https://feeds.example/feed_x.xml"]
+    assert "WebSub ping to" in capsys.readouterr().out
+
+
+def test_ping_needs_base_url(hub, tmp_path, monkeypatch):
+    monkeypatch.delenv("FEED_BASE_URL")
+    assert websub.ping([tmp_path / "feed_x.xml"]) == 0
+    assert hub["topics"] == []
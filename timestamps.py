@@ -0,0 +1,129 @@
+"""
+各ソースの日時表記を datetime にする共通パーサ。
+
+ソースごとの書式に合わせた固定のパーサ（strptime のロケール依存や汎用正規表現を避ける）と、
+生文字列をキーにしたメモ化（同じ実行内で同じ文字列は1回しかパースしない）を持つ。
+
+  parse_en_datetime("January 29, 2026 8:24 am")  # a-zmanga（JST）
+  parse_iso("2026-01-29T08:24:00Z")              # kemono など
+  parse_rfc2822("Thu, 29 Jan 2026 08:24:00 +0900")  # 前回出力した RSS の pubDate（prevfeed）
+  parse_epoch(1738454400) / from_epoch_ms(...)   # kemono（数値）/ pixiv
+  parse_jp_schedule("次回更新は2月16日 12:00予定", now)  # pixiv の更新予定（年の省略可）
+"""
+from __future__ import annotations
+
+import re
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from typing import Any, Optional
+
+JST = timezone(timedelta(hours=9))
+UTC = timezone.utc
+
+_MONTHS = {
+    m: i
+    for i, m in enumerate(
+        (
+            "january", "february", "march", "april", "may", "june",
+            "july", "august", "september", "october", "november", "december",
+        ),
+        start=1,
+    )
+}
+_EN_RE = re.compile(
+    r"^\s*([A-Za-z]+)\s+(\d{1,2}),\s*(\d{4})\s+(\d{1,2}):(\d{2})\s*([AaPp][Mm])\s*$"
+)
+_JP_SCHEDULE_RE = re.compile(
+    r"(?:(\d{4})[年/])?(\d{1,2})[月/](\d{1,2})日?(?:\D{0,8}?(\d{1,2})(?::|時)(\d{2})?)?"
+)
+
+_CACHE = 4096
+
+
+@lru_cache(maxsize=_CACHE)
+def parse_en_datetime(s: str, tz: timezone = JST) -> datetime:
+    """"January 29, 2026 8:24 am" 形式（英語の月名固定、ロケール非依存）。失敗は ValueError。"""
+    m = _EN_RE.match(s)
+    if not m:
+        raise ValueError(f"unexpected datetime: {s!r}")
+    mon, day, year, hour, minute, ampm = m.groups()
+    month = _MONTHS.get(mon.lower())
+    if month is None:
+        raise ValueError(f"unexpected month: {s!r}")
+    h = int(hour) % 12
+    if ampm.lower() == "pm":
+        h += 12
+    return datetime(int(year), month, int(day), h, int(minute), tzinfo=tz)
+
+
+@lru_cache(maxsize=_CACHE)
+def parse_iso(s: str) -> Optional[datetime]:
+    """ISO 8601（末尾 Z 可）。UTC に揃えて返す。タイムゾーン無しはローカル時刻扱い。"""
+    try:
+        return datetime.fromisoformat(s.strip().replace("Z", "+00:00")).astimezone(UTC)
+    except ValueError:
+        return None
+
+
+@lru_cache(maxsize=_CACHE)
+def parse_rfc2822(s: str) -> Optional[datetime]:
+    """RSS の pubDate（"Thu, 29 Jan 2026 08:24:00 +0900"）。UTC に揃えて返す。"""
+    from email.utils import parsedate_to_datetime
+
+    try:
+        dt = parsedate_to_datetime(s.strip())
+    except (TypeError, ValueError):
+        return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=UTC)
+    return dt.astimezone(UTC)
+
+
+@lru_cache(maxsize=_CACHE)
+def parse_epoch(sec: float) -> datetime:
+    return datetime.fromtimestamp(float(sec), tz=UTC)
+
+
+def from_epoch_ms(ms: int) -> datetime:
+    return parse_epoch(ms / 1000)
+
+
+def parse_any(v: Any) -> Optional[datetime]:
+    """数値（unix 秒）か ISO 文字列を受け付ける。型が揺れる API 用。"""
+    if v is None or isinstance(v, bool):
+        return None
+    if isinstance(v, (int, float)):
+        return parse_epoch(float(v))
+    if isinstance(v, str):
+        return parse_iso(v)
+    return None
+
+
+def parse_jp_schedule(s: str, now: datetime, tz: timezone = JST) -> Optional[datetime]:
+    """
+    更新予定の文言（"2026年2月16日 12:00" / "2月16日(月)更新予定" など）を日時にする。
+    時刻が無ければその日の 00:00、年が無ければ now から見て次に来るその日付。
+    """
+    m = _JP_SCHEDULE_RE.search(s)
+    if not m:
+        return None
+    y, mo, d, hh, mm = m.groups()
+    local_now = now.astimezone(tz)
+    year = int(y) if y else local_now.year
+    try:
+        dt = datetime(year, int(mo), int(d), int(hh or 0), int(mm or 0), tzinfo=tz)
+    except ValueError:
+        return None
+    # 年の省略で、半年以上前になってしまうなら翌年の話
+    if not y and dt < local_now - timedelta(days=183):
+        try:
+            dt = dt.replace(year=year + 1)
+        except ValueError:
+            return None
+    return dt
+
+
+def jp_date(dt: datetime, tz: timezone = JST) -> str:
+    """表示用: 2026年2月2日"""
+    d = dt.astimezone(tz)
+    return f"{d.year}年{d.month}月{d.day}日"
@@ -0,0 +1,138 @@
+"""
+HTML中のリンク/画像URLを絶対URLに補正する軽量パス。
+
+BeautifulSoup の木を歩かず、シリアライズ済みHTMLの開始タグだけを正規表現で走査する。
+属性は先頭から順に「名前=値（引用符付き or 裸）」で切り出すので、別の属性の値の中
+（title="see src=y" など）を属性と取り違えることはない。
+  - すでに絶対URL（スキーム付き）の値は触らない（a-zmanga のリンクはほぼこれ）
+  - base の分解結果はメモ化
+  - href/src に加えて srcset, data-src などの遅延読み込み属性も対象
+"""
+from __future__ import annotations
+
+import html
+import re
+from functools import lru_cache
+from typing import Callable, Iterable, Optional, Tuple
+from urllib.parse import urljoin, urlsplit
+
+URL_ATTRS = (
+    "href",
+    "src",
+    "poster",
+    "data-src",
+    "data-lazy-src",
+    "data-original",
+    "data-url",
+)
+SRCSET_ATTRS = ("srcset", "data-srcset", "data-lazy-srcset")
+
+_TARGETS = frozenset(URL_ATTRS + SRCSET_ATTRS)
+
+_TAG_RE = re.compile(r"(<[a-zA-Z][^\s/>]*)(\s[^>]*>)")
+# 1属性ぶん（値なしの属性も含む）。値は引用符の中まで丸ごと消費する
+_ATTR_RE = re.compile(
+    r"(?P<pre>\s+(?P<name>[^\s\"'>/=]+))"
+    r"(?:(?P<eq>\s*=\s*)(?:\"(?P<dq>[^\"]*)\"|'(?P<sq>[^']*)'|(?P<uq>[^\s>]+)))?"
+)
+_SCHEME_RE = re.compile(r"^[a-zA-Z][a-zA-Z0-9+.\-]*:")
+
+
+@lru_cache(maxsize=256)
+def _split_base(base: str) -> Tuple[str, str]:
+    """base -> (scheme, "scheme://netloc")"""
+    p = urlsplit(base)
+    return p.scheme, f"{p.scheme}://{p.netloc}"
+
+
+def absolute(base: str, url: str) -> str:
+    """urljoin と同じ結果を、よくあるケースだけ安く返す。"""
+    if not url or _SCHEME_RE.match(url):
+        return url
+    scheme, origin = _split_base(base)
+    if url.startswith("//"):
+        return f"{scheme}:{url}"
+    if url.startswith("/") and "/." not in url:
+        return origin + url
+    return urljoin(base, url)
+
+
+def _rewrite_value(base: str, raw: str, is_srcset: bool) -> str:
+    value = html.unescape(raw) if "&" in raw else raw
+    if is_srcset:
+        parts = []
+        for cand in value.split(","):
+            bits = cand.strip().split(None, 1)
+            if not bits:
+                continue
+            bits[0] = absolute(base, bits[0])
+            parts.append(" ".join(bits))
+        new = ", ".join(parts)
+    else:
+        new = absolute(base, value.strip())
+    if new == value:
+        return raw
+    return html.escape(new, quote=True)
+
+
+def sub_attrs(
+    fragment: str,
+    names: Iterable[str],
+    fn: Callable[[str, str], Optional[str]],
+    tags: Iterable[str] = (),
+) -> str:
+    """
+    fragment の開始タグ（tags を渡せばそのタグだけ）にある、名前が names の属性の値を
+    fn(属性名, 値) の戻り値で置き換える。値は実体参照をデコードして渡す。
+    fn が None か同じ値を返した属性は元の表記のまま残す。rewrite_html と同じ属性の切り出し方なので
+    別の属性の値の中（alt="see src='x'" など）には当たらない。
+    """
+    names = frozenset(n.lower() for n in names)
+    tags = frozenset(t.lower() for t in tags)
+
+    def attr_sub(m: re.Match) -> str:
+        name = m.group("name").lower()
+        if name not in names or m.group("eq") is None:
+            return m.group(0)
+        raw = next(v for v in (m.group("dq"), m.group("sq"), m.group("uq")) if v is not None)
+        q = "'" if m.group("sq") is not None else '"'
+        value = html.unescape(raw)
+        new = fn(name, value)
+        if new is None or new == value:
+            return m.group(0)
+        return f"{m.group('pre')}{m.group('eq')}{q}{html.escape(new, quote=True)}{q}"
+
+    def tag_sub(m: re.Match) -> str:
+        if tags and m.group(1)[1:].lower() not in tags:
+            return m.group(0)
+        return m.group(1) + _ATTR_RE.sub(attr_sub, m.group(2))
+
+    return _TAG_RE.sub(tag_sub, fragment)
+
+
+def rewrite_html(fragment: str, base: str) -> str:
+    """fragment 内の URL 属性を base 基準の絶対URLに書き換えて返す。"""
+
+    def attr_sub(m: re.Match) -> str:
+        name = m.group("name").lower()
+        if name not in _TARGETS or m.group("eq") is None:
+            return m.group(0)
+        if m.group("dq") is not None:
+            raw, q = m.group("dq"), '"'
+        elif m.group("sq") is not None:
+            raw, q = m.group("sq"), "'"
+        else:
+            raw, q = m.group("uq"), '"'
+        if not raw:
+            return m.group(0)
+        if name not in SRCSET_ATTRS and _SCHEME_RE.match(raw):
+            return m.group(0)
+        new = _rewrite_value(base, raw, name in SRCSET_ATTRS)
+        if new is raw and q == '"' and m.group("uq") is None:
+            return m.group(0)
+        return f"{m.group('pre')}{m.group('eq')}{q}{new}{q}"
+
+    def tag_sub(m: re.Match) -> str:
+        return m.group(1) + _ATTR_RE.sub(attr_sub, m.group(2))
+
+    return _TAG_RE.sub(tag_sub, fragment)
@@ -0,0 +1,130 @@
+"""
+WebSub（旧 PubSubHubbub）での更新通知。購読側がポーリングしなくても push で受け取れるようにする。
+
+FEED_WEBSUB_HUB にハブのURL（カンマ区切りで複数可）を指定すると:
+  - head の feed の channel に <atom:link rel="hub"> と <atom:link rel="self"> を入れる
+    （JSON Feed は hubs と feed_url）。購読側はこれを見てハブに subscribe する
+  - feed が書き換わったときだけ、各形式の self URL についてハブに publish ping
+    （hub.mode=publish, hub.url=<self>）を送る
+self の URL は archive.href と同じく FEED_BASE_URL から作る。topic は絶対URLでないと
+ハブが扱えないので、FEED_BASE_URL が無いときは何もしない。
+ping に失敗しても feed は書けているので例外にはしない（次に変化したときにまた送る）。
+
+GitHub Actions のように書いた feed を後で push して公開する場合は、書いた時点で ping すると
+ハブが古い内容を取りに行ってしまう。FEED_WEBSUB_DEFER=1 で書き込み時の ping を止め、
+公開後に `python websub.py feed_x.xml ...` で送る。
+
+ローカルで確かめるときは、受け取った ping を表示するだけのハブを立てる:
+
+    python websub.py --serve 8001
+    FEED_BASE_URL=http://localhost:8000 FEED_WEBSUB_HUB=http://localhost:8001/ python azmanga.py
+"""
+from __future__ import annotations
+
+import argparse
+import os
+from pathlib import Path
+from typing import Any, Callable, List, Sequence
+
+import archive
+import fetch
+import metrics
+
+PING_TIMEOUT = 10
+
+
+def hubs() -> List[str]:
+    """通知先のハブ。FEED_BASE_URL が無ければ空（self を絶対URLにできない）。"""
+    if not os.getenv("FEED_BASE_URL", "").strip():
+        return []
+    raw = os.getenv("FEED_WEBSUB_HUB", "")
+    return [h.strip() for h in raw.split(",") if h.strip()]
+
+
+def deferred() -> bool:
+    return os.getenv("FEED_WEBSUB_DEFER", "").strip().lower() in ("1", "true", "yes", "on")
+
+
+def ping(paths: Sequence[Path]) -> int:
+    """paths（書き換わった feed）の self URL をハブに通知し、成功した数を返す。"""
+    sent = 0
+    with metrics.stage("websub"):
+        for hub in hubs():
+            for p in paths:
+                topic = archive.href(p)
+                try:
+                    fetch.post(
+                        hub,
+                        data={"hub.mode": "publish", "hub.url": topic},
+                        timeout=PING_TIMEOUT,
+                    )
+                except Exception as e:
+                    metrics.count("websub_ping_failed")
+                    print(f"WebSub ping to {hub} failed for {topic}: {e!r}")
+                    continue
+                sent += 1
+    metrics.count("websub_pings", sent)
+    return sent
+
+
+def _hub_server(port: int, on_publish: Callable[[List[str]], int]) -> Any:
+    """
+    publish ping を受けるだけのハブ（ThreadingHTTPServer）。port=0 なら空いているポート。
+    on_publish(topics) の戻り値をステータスとして返す。呼び出し側が serve_forever() する。
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    from urllib.parse import parse_qs
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self) -> None:
+            n = int(self.headers.get("Content-Length") or 0)
+            form = parse_qs(self.rfile.read(n).decode("utf-8"))
+            mode = (form.get("hub.mode") or [""])[0]
+            if mode != "publish" or not form.get("hub.url"):
+                self.send_error(400, "expected hub.mode=publish and hub.url")
+                return
+            status = on_publish(form["hub.url"])
+            if status >= 300:
+                self.send_error(status)
+                return
+            self.send_response(status)
+            self.end_headers()
+
+        def log_message(self, format: str, *args) -> None:
+            pass
+
+    return ThreadingHTTPServer(("", port), Handler)
+
+
+def _serve(port: int) -> None:
+    """受け取った publish ping を表示して 204 を返すだけのハブ（動作確認用）。"""
+
+    def show(topics: List[str]) -> int:
+        for topic in topics:
+            print(f"publish {topic}", flush=True)
+        return 204
+
+    httpd = _hub_server(port, show)
+    print(f"Local WebSub hub on :{port}", flush=True)
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="WebSub publish ping / local stand-in hub")
+    ap.add_argument("feeds", nargs="*", type=Path, help="ping を送る feed（既定: 送らない）")
+    ap.add_argument("--serve", type=int, metavar="PORT", help="ping を表示するだけのハブを立てる")
+    args = ap.parse_args()
+
+    if args.serve:
+        _serve(args.serve)
+        return 0
+    if not hubs():
+        ap.error("FEED_WEBSUB_HUB and FEED_BASE_URL must be set")
+    return 0 if ping(args.feeds) == len(args.feeds) * len(hubs()) else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())